@@ -14,6 +14,7 @@ MANUAL_DATA_DIR = Path(config("MANUAL_DATA_DIR"))
 DATA_DIR = Path(config("DATA_DIR"))
 OUTPUT_DIR = Path(config("OUTPUT_DIR"))
 OS_TYPE = config("OS_TYPE")
+CDS_REGIONS = [region.strip() for region in config("CDS_REGIONS", default="US").split(",") if region.strip()]
 
 # ==================================================
 # Jupyter Notebook Execution Helpers
@@ -70,8 +71,9 @@ def task_pull_markit():
     """
     return {
         "actions": ["python src/pull_markit.py"],
-        "file_dep": ["src/pull_markit.py"],  # Depend on script
-        "targets": [DATA_DIR / f"markit_cds{year}.parquet" for year in range(2001, 2025 + 1)],
+        "file_dep": ["src/pull_markit.py", "src/data_sources.py"],  # Depend on script
+        "targets": [DATA_DIR / f"markit_cds{year}.parquet" for year in range(2001, 2025 + 1)]
+        + [DATA_DIR / "markit_extract_manifest.json"],
         "clean": [],
     }
 
@@ -79,7 +81,7 @@ def task_pull_interest_rates_data():
     """Gather and process risk-free rate data for calculations."""
     return {
         "actions": ["python src/pull_interest_rates_data.py"],
-        "file_dep": ["src/pull_interest_rates_data.py"],
+        "file_dep": ["src/pull_interest_rates_data.py", "src/data_sources.py"],
         "targets": [Path(DATA_DIR) / "fed_yield_curve.parquet",
                     Path(DATA_DIR) / "swap_rates.parquet"],
         "clean": [],
@@ -91,10 +93,16 @@ def task_calc_cds_daily_return():
         "actions": ["python src/calc_cds_daily_return.py"],
         "file_dep": [
             "src/calc_cds_daily_return.py",
+            "src/panel_layout.py",
             "src/pull_markit.py",
-            "src/pull_interest_rates_data.py"
+            "src/pull_interest_rates_data.py",
+            "src/run_diff.py"
         ],
-        "targets": [DATA_DIR / "CDS_daily_return.parquet"],
+        "targets": [DATA_DIR / "CDS_daily_return.parquet",
+                    DATA_DIR / "CDS_daily_return.offsets.parquet",
+                    DATA_DIR / "CDS_daily_return.manifest.parquet",
+                    DATA_DIR / "CDS_daily_return.arrow",
+                    DATA_DIR / "discount_curve.npz"],
         "clean": True,
     }
 
@@ -109,8 +117,10 @@ def task_create_portfolio():
             "src/create_portfolio.py",
             "src/calc_cds_daily_return.py",
             "src/misc_tools.py",
+            "src/streaming_stats.py",
+            "src/run_diff.py",
         ],
-        "targets": ["_data/portfolio_return.parquet"], 
+        "targets": ["_data/portfolio_return.parquet", "_data/portfolio_return.manifest.parquet"], 
         "clean": True,
     }
 
@@ -123,7 +133,9 @@ def task_summary_stats():
                      "src/misc_tools.py",
                      "src/pull_cds_return_data.py",
                      "src/create_portfolio.py",
-                     "src/pull_markit.py"],
+                     "src/pull_markit.py",
+                     "src/streaming_stats.py",
+                     "src/artifacts.py"],
         "targets": [OUTPUT_DIR / "latex_cds_by_sector_stats.tex",
                     OUTPUT_DIR / "monthly_returns_over_time.png"],
         "clean": True,
@@ -147,6 +159,70 @@ def task_actual_cds_data():
     }
 
 
+def task_bootstrap_inference():
+    """Bootstrap confidence intervals for portfolio means, Sharpe ratios and replication correlations."""
+    return {
+        "actions": ["python src/bootstrap.py"],
+        "file_dep": [
+            "src/bootstrap.py",
+            "src/rolling_correlation.py",
+            DATA_DIR / "portfolio_return.parquet",
+            DATA_DIR / "actual_cds_return.parquet",
+        ],
+        "targets": [DATA_DIR / "bootstrap_portfolio_statistics.parquet"],
+        "clean": True,
+    }
+
+
+def task_factor_pricing():
+    """Regress replicated and original CDS portfolios on the He-Kelly-Manela factors."""
+    return {
+        "actions": ["python src/factor_pricing.py"],
+        "file_dep": [
+            "src/factor_pricing.py",
+            "src/rolling_correlation.py",
+            DATA_DIR / "portfolio_return.parquet",
+            MANUAL_DATA_DIR / "He_Kelly_Manela_Factors_And_Test_Assets_monthly.csv",
+        ],
+        "targets": [DATA_DIR / "factor_regressions.parquet", DATA_DIR / "he_kelly_manela_monthly.parquet"],
+        "clean": True,
+    }
+
+
+def task_scenarios():
+    """Scenario P&L under curve and spread shocks, and CS01/DV01 for every ticker-date."""
+    return {
+        "actions": ["python src/scenarios.py"],
+        "file_dep": [
+            "src/scenarios.py",
+            DATA_DIR / "CDS_daily_return.parquet",
+            DATA_DIR / "discount_curve.npz",
+        ],
+        "targets": [DATA_DIR / "cds_sensitivities.parquet", DATA_DIR / "scenario_pnl.parquet"],
+        "clean": True,
+    }
+
+
+def task_regional():
+    """Daily returns and portfolios for every region in CDS_REGIONS, as region-partitioned datasets."""
+    return {
+        "actions": ["python src/regional.py"],
+        "file_dep": [
+            "src/regional.py",
+            "src/calc_cds_daily_return.py",
+            "src/create_portfolio.py",
+            "src/pull_markit.py",
+            DATA_DIR / "markit_extract_manifest.json",
+            DATA_DIR / "fed_yield_curve.parquet",
+            DATA_DIR / "swap_rates.parquet",
+        ]
+        + [MANUAL_DATA_DIR / f"discount_curve_{region}.csv" for region in CDS_REGIONS if region != "US"],
+        "targets": [DATA_DIR / "CDS_daily_return_by_region", DATA_DIR / "portfolio_return_by_region"]
+        + [DATA_DIR / f"discount_curve_{region}.npz" for region in CDS_REGIONS],
+        "clean": True,
+    }
+
+
 # ==================================================
 # Task for Running Tests
 # ==================================================
@@ -164,6 +240,22 @@ def task_run_tests_validate():
         "src/test_replication_results.py",
         "src/test_create_portfolio.py", 
         "src/test_misc_tools.py",
+        "src/test_streaming_stats.py",
+        "src/test_rolling_correlation.py",
+        "src/test_import_time.py",
+        "src/test_artifacts.py",
+        "src/test_query_service.py",
+        "src/test_panel_layout.py",
+        "src/test_regional.py",
+        "src/test_data_sources.py",
+        "src/test_bootstrap.py",
+        "src/test_factor_pricing.py",
+        "src/test_dask_backend.py",
+        "src/test_intraday.py",
+        "src/test_scenarios.py",
+        "src/test_isda.py",
+        "src/test_pipeline.py",
+        "src/test_run_diff.py",
     ]
 
     def execute_tests():
@@ -191,12 +283,15 @@ def task_generate_latex_outputs():
             "src/generate_latex_files.py",
             "src/misc_tools.py",
             "src/create_portfolio.py",
+            "src/rolling_correlation.py",
+            "src/artifacts.py",
         ],
         "targets": [
             OUTPUT_DIR / "latex_table1_replicated_cds.csv",
             OUTPUT_DIR / "latex_table2_replicated_summary.csv",
             OUTPUT_DIR / "cds_portfolio_returns.png",
             OUTPUT_DIR / "cds_comparison_CDS_10.png",
+            OUTPUT_DIR / "cds_rolling_correlation.png",
         ],
         "clean": True,
     }
@@ -0,0 +1,176 @@
+"""
+This module renders report artifacts (LaTeX tables and figures) as independent, cache-aware units.
+
+Each `ArtifactUnit` declares the slice of the shared data it depends on and a module-level
+render function. The shared data is loaded once by the caller; `render_artifacts` then
+- hashes every unit's input slice together with its rendering code: the source of the render
+  function's module and of the project modules it imports from (see `code_sources`),
+- skips units whose hash matches the manifest from the previous run and whose outputs exist,
+- renders the remaining units in parallel worker processes with a non-interactive
+  matplotlib backend, and
+- records the new hashes in the manifest.
+
+A change that only touches one portfolio therefore re-renders only the tables and figures
+whose input slice contains that portfolio.
+
+Functions and classes include:
+- `ArtifactUnit`: Declaration of one table or figure and its inputs.
+- `code_sources`: Source files whose changes invalidate a unit.
+- `hash_inputs`: Content hash of a unit's input slice and rendering code.
+- `render_artifacts`: Renders stale units in a process pool and updates the manifest.
+"""
+
+import hashlib
+import inspect
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable
+
+import numpy as np
+import pandas as pd
+
+from settings import config
+
+OUTPUT_DIR = Path(config("OUTPUT_DIR"))
+MANIFEST_NAME = ".artifact_manifest.json"
+
+
+@dataclass
+class ArtifactUnit:
+    """
+    One rendered output of a report.
+
+    `select` maps the shared data dictionary to the tuple of positional arguments passed
+    to `render`; only that slice is hashed and shipped to the worker. `render` must be a
+    module-level function accepting those arguments and an `output_dir` keyword.
+    `code_deps` lists further functions or modules whose source the output depends on,
+    beyond those found by `code_sources`.
+    """
+
+    name: str
+    render: Callable
+    select: Callable
+    outputs: list
+    kwargs: dict = field(default_factory=dict)
+    code_deps: list = field(default_factory=list)
+
+
+def _update_hash(digest, obj):
+    if isinstance(obj, pd.DataFrame):
+        digest.update(repr((list(obj.columns), [str(t) for t in obj.dtypes])).encode())
+        digest.update(pd.util.hash_pandas_object(obj, index=True).values.tobytes())
+    elif isinstance(obj, pd.Series):
+        digest.update(repr((obj.name, str(obj.dtype))).encode())
+        digest.update(pd.util.hash_pandas_object(obj, index=True).values.tobytes())
+    elif isinstance(obj, np.ndarray):
+        digest.update(obj.tobytes())
+    elif isinstance(obj, (tuple, list)):
+        for item in obj:
+            _update_hash(digest, item)
+    else:
+        digest.update(repr(obj).encode())
+
+
+def _source_file(obj):
+    module = obj if inspect.ismodule(obj) else inspect.getmodule(obj)
+    path = getattr(module, "__file__", None)
+    return Path(path).resolve() if path and path.endswith(".py") else None
+
+
+def code_sources(unit):
+    """
+    Source files of a unit's rendering code: the module defining `render`, every project module
+    (one in the same directory) it imports functions or modules from, and `code_deps`.
+
+    Helpers such as `pivot_table` are thereby covered without listing them; dependencies further
+    down the import chain need `code_deps`.
+    """
+    module = inspect.getmodule(unit.render)
+    home = _source_file(module)
+    paths = {home}
+    for value in vars(module).values():
+        if inspect.ismodule(value) or inspect.isfunction(value) or inspect.isclass(value):
+            path = _source_file(value)
+            if path is not None and path.parent == home.parent:
+                paths.add(path)
+    paths.update(_source_file(dep) for dep in unit.code_deps)
+    return sorted(paths)
+
+
+def hash_inputs(unit, args):
+    """
+    Hash a unit's input slice together with its rendering code and options.
+    """
+    digest = hashlib.sha256()
+    for path in code_sources(unit):
+        digest.update(path.name.encode())
+        digest.update(path.read_bytes())
+    digest.update(repr(sorted(unit.kwargs.items())).encode())
+    _update_hash(digest, args)
+    return digest.hexdigest()
+
+
+def _init_worker():
+    import matplotlib
+
+    matplotlib.use("Agg")
+
+
+def _render_unit(render, args, kwargs):
+    render(*args, **kwargs)
+
+
+def _load_manifest(path):
+    if path.exists():
+        with open(path) as f:
+            return json.load(f)
+    return {}
+
+
+def render_artifacts(units, data, output_dir=OUTPUT_DIR, max_workers=None, force=False):
+    """
+    Render every stale unit in parallel and return a `{name: "rendered" | "skipped"}` status map.
+    """
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    manifest_path = output_dir / MANIFEST_NAME
+    manifest = _load_manifest(manifest_path)
+
+    status, pending, errors = {}, [], []
+    for unit in units:
+        args = tuple(unit.select(data))
+        key = hash_inputs(unit, args)
+        outputs_exist = all((output_dir / output).exists() for output in unit.outputs)
+        if not force and manifest.get(unit.name) == key and outputs_exist:
+            status[unit.name] = "skipped"
+            continue
+        pending.append((unit, args, key))
+
+    if pending:
+        max_workers = max_workers or min(len(pending), os.cpu_count() or 1)
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker) as pool:
+            futures = [
+                (unit, key, pool.submit(_render_unit, unit.render, args, {**unit.kwargs, "output_dir": output_dir}))
+                for unit, args, key in pending
+            ]
+            for unit, key, future in futures:
+                try:
+                    future.result()
+                except Exception as error:
+                    errors.append(error)
+                    manifest.pop(unit.name, None)
+                    continue
+                manifest[unit.name] = key
+                status[unit.name] = "rendered"
+
+    # Record the units that did render even if another one failed
+    tmp_path = manifest_path.with_suffix(".tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, manifest_path)
+    if errors:
+        raise errors[0]
+    return status
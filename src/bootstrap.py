@@ -0,0 +1,172 @@
+"""
+This module computes bootstrap confidence intervals for the monthly returns of the 20 CDS portfolios:
+mean returns, annualized Sharpe ratios, and the correlation of each replicated portfolio (and of the
+portfolio average, as checked in `test_replication_results`) with the original He-Kelly-Manela series.
+
+Monthly returns are serially dependent, so resamples are drawn in blocks: a circular moving-block
+bootstrap with fixed block length, or the Politis-Romano stationary bootstrap with geometric block
+lengths. Indices are drawn for a whole batch of resamples at once as an (R, T) array, and every
+statistic for every portfolio is computed from the (R, T, N) resampled panel with array operations.
+Batches are spread across a process pool; each batch gets its own child of one `SeedSequence`, so
+results are reproducible and do not depend on the number of workers.
+
+Functions include:
+- `block_bootstrap_indices`, `stationary_bootstrap_indices`: Batched resampling indices.
+- `resample_statistics`: Mean, Sharpe ratio and correlations for a batch of resamples.
+- `bootstrap_portfolio_statistics`: Point estimates, standard errors and percentile intervals for all portfolios.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from settings import config
+
+DATA_DIR = Path(config("DATA_DIR"))
+OUTPUT_DIR = Path(config("OUTPUT_DIR"))
+
+METHODS = ("block", "stationary")
+
+
+def block_bootstrap_indices(rng, n_obs, n_resamples, block_length):
+    """
+    Circular moving-block bootstrap: each resample concatenates blocks of `block_length`
+    consecutive observations (wrapping around the end) starting at uniform random positions.
+    Returns an integer array of shape (n_resamples, n_obs).
+    """
+    n_blocks = -(-n_obs // block_length)
+    starts = rng.integers(0, n_obs, size=(n_resamples, n_blocks))
+    indices = starts[:, :, None] + np.arange(block_length)
+    return indices.reshape(n_resamples, -1)[:, :n_obs] % n_obs
+
+
+def stationary_bootstrap_indices(rng, n_obs, n_resamples, mean_block_length):
+    """
+    Stationary bootstrap (Politis and Romano, 1994): a new block starts at each step with
+    probability 1 / `mean_block_length` at a uniform random position; otherwise the next
+    observation (wrapping around the end) is taken. Returns an array of shape (n_resamples, n_obs).
+    """
+    steps = np.arange(n_obs)
+    new_block = rng.random((n_resamples, n_obs)) < 1 / mean_block_length
+    new_block[:, 0] = True
+    starts = rng.integers(0, n_obs, size=(n_resamples, n_obs))
+    # Position of the most recent block start at every step
+    block_start = np.maximum.accumulate(np.where(new_block, steps, 0), axis=1)
+    offset = np.take_along_axis(starts, block_start, axis=1)
+    return (offset + steps - block_start) % n_obs
+
+
+def _row_correlation(x, y):
+    """
+    Correlation along axis 1 between `x` and `y`, arrays of shape (R, T, ...).
+    """
+    x = x - x.mean(axis=1, keepdims=True)
+    y = y - y.mean(axis=1, keepdims=True)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return (x * y).sum(axis=1) / np.sqrt((x * x).sum(axis=1) * (y * y).sum(axis=1))
+
+
+def resample_statistics(returns, indices, benchmark=None, periods_per_year=12):
+    """
+    Statistics of `returns` (T x N) for each row of `indices` (R x T).
+
+    Returns a dictionary of arrays: `"mean"` and `"sharpe"` of shape (R, N) and, with a
+    `benchmark` (T x N, aligned with `returns`), `"correlation"` of shape (R, N) and
+    `"average_correlation"` of shape (R,) for the cross-portfolio averages.
+    """
+    sample = returns[indices]
+    mean = sample.mean(axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        sharpe = mean / sample.std(axis=1, ddof=1) * np.sqrt(periods_per_year)
+    stats = {"mean": mean, "sharpe": sharpe}
+    if benchmark is not None:
+        benchmark_sample = benchmark[indices]
+        stats["correlation"] = _row_correlation(sample, benchmark_sample)
+        stats["average_correlation"] = _row_correlation(sample.mean(axis=2), benchmark_sample.mean(axis=2))
+    return stats
+
+
+def _bootstrap_batch(returns, benchmark, n_resamples, method, block_length, seed, periods_per_year):
+    rng = np.random.default_rng(seed)
+    n_obs = len(returns)
+    if method == "block":
+        indices = block_bootstrap_indices(rng, n_obs, n_resamples, block_length)
+    elif method == "stationary":
+        indices = stationary_bootstrap_indices(rng, n_obs, n_resamples, block_length)
+    else:
+        raise ValueError(f"Unknown bootstrap method {method!r}; expected one of {METHODS}")
+    return resample_statistics(returns, indices, benchmark, periods_per_year)
+
+
+def bootstrap_portfolio_statistics(
+    returns,
+    benchmark=None,
+    n_resamples=10_000,
+    method="stationary",
+    block_length=6,
+    confidence=0.95,
+    batch_size=1_000,
+    max_workers=None,
+    seed=0,
+    periods_per_year=12,
+):
+    """
+    Bootstrap confidence intervals for every portfolio (column) of `returns`.
+
+    `returns` and the optional `benchmark` are DataFrames on the same dates and columns
+    (e.g. the output of `rolling_correlation.align_portfolio_returns`). Returns a tidy table
+    with one row per statistic and portfolio (`"average"` for the average correlation) and
+    columns `estimate`, `std_error`, `lower` and `upper` (percentile interval at `confidence`).
+    Results depend only on `seed`, not on `max_workers`.
+    """
+    if method not in METHODS:
+        raise ValueError(f"Unknown bootstrap method {method!r}; expected one of {METHODS}")
+    columns = list(returns.columns)
+    returns_array = returns.to_numpy(dtype=float)
+    benchmark_array = benchmark[columns].to_numpy(dtype=float) if benchmark is not None else None
+
+    batch_sizes = [batch_size] * (n_resamples // batch_size)
+    if n_resamples % batch_size:
+        batch_sizes.append(n_resamples % batch_size)
+    seeds = np.random.SeedSequence(seed).spawn(len(batch_sizes))
+    tasks = [
+        (returns_array, benchmark_array, size, method, block_length, batch_seed, periods_per_year)
+        for size, batch_seed in zip(batch_sizes, seeds)
+    ]
+    if max_workers == 1:
+        batches = [_bootstrap_batch(*task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            batches = list(executor.map(_bootstrap_batch, *zip(*tasks)))
+    draws = {name: np.concatenate([batch[name] for batch in batches]) for name in batches[0]}
+
+    everything = np.arange(len(returns_array))[None, :]
+    estimates = resample_statistics(returns_array, everything, benchmark_array, periods_per_year)
+    alpha = (1 - confidence) / 2
+    rows = []
+    for name, values in draws.items():
+        labels = columns if values.ndim == 2 else ["average"]
+        values = values.reshape(len(values), -1)
+        estimate = estimates[name].reshape(-1)
+        lower, upper = np.nanquantile(values, [alpha, 1 - alpha], axis=0)
+        std_error = np.nanstd(values, axis=0, ddof=1)
+        for k, label in enumerate(labels):
+            rows.append((name, label, estimate[k], std_error[k], lower[k], upper[k]))
+    return pd.DataFrame(rows, columns=["statistic", "portfolio", "estimate", "std_error", "lower", "upper"])
+
+
+def main():
+    from create_portfolio import load_portfolio, pivot_table
+    from pull_cds_return_data import load_real_cds_return
+    from rolling_correlation import align_portfolio_returns
+
+    replicated, actual = align_portfolio_returns(pivot_table(load_portfolio()), load_real_cds_return())
+    intervals = bootstrap_portfolio_statistics(replicated, actual)
+    intervals.to_parquet(DATA_DIR / "bootstrap_portfolio_statistics.parquet")
+    print(intervals[intervals["statistic"] == "average_correlation"].to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
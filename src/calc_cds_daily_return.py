@@ -1,27 +1,64 @@
 """
-This script processes CDS and risk-free rate data to compute daily CDS returns and default probabilities. It merges Federal Reserve and FRED risk-free rate data with Markit CDS data, applies cubic spline interpolation to yield curves, and calculates risk-free rates and discount factors. The script then computes default probabilities (RD) using CDS spreads and risk-free rates, and finally calculates daily CDS returns based on spread changes and RD. The results are saved in a Parquet file for further use.
+This script processes CDS and risk-free rate data to compute daily CDS returns and default probabilities. It merges Federal Reserve and FRED risk-free rate data with Markit CDS data, applies cubic spline interpolation to yield curves, and calculates risk-free rates and discount factors. The script then computes default probabilities (RD) using CDS spreads and risk-free rates, and finally calculates daily CDS returns based on spread changes and RD. The results are saved in a Parquet file, with an uncompressed Arrow IPC sidecar for memory-mapped loading, for further use.
 
 Functions include:
 - Merging risk-free rate data with CDS data
-- Interpolating yield curves for multiple maturities
+- Interpolating yield curves for multiple maturities (`DiscountCurve`)
 - Calculating default intensities, default probabilities, and CDS daily returns
+- Calculating default probabilities for several CDS tenors in one pass (`calc_RD_by_tenor`)
+- Computing returns for a Markit panel against its region's curve (`region_rf_data`, `compute_daily_returns`)
+- Writing the daily return panel and loading it (optionally memory-mapped)
+
+When the Markit panel carries a `tenor` column (see `CDS_TENORS` in `pull_markit.py`), returns
+are computed for every tenor against one discount table that reaches the longest maturity,
+and saved as a tenor-partitioned dataset (`CDS_daily_return_by_tenor/tenor=<tenor>/`). Each
+tenor is discounted off the curve knots up to its own maturity (never under 5 years, see
+`knot_limit`), so the 5Y slice, also written to `CDS_daily_return.parquet` for the portfolio
+step, does not depend on which longer tenors were pulled.
+
+With `CDS_COMPUTE_DTYPE=float32`, the discount table, hazard terms and RD sum are computed in
+float32, which halves the memory traffic of the RD stage; RD is widened back to float64 before
+the daily returns and compounding. Every such run recomputes a sample of tickers in float64 and
+fails if the daily or monthly returns deviate by more than `CDS_FLOAT32_TOLERANCE`.
+
+With `CDS_RD_ENGINE=isda`, RD is instead the ISDA standard model risky annuity (IMM schedule,
+accrual on default, hazard calibrated to each spread) computed by `isda.calc_RD_isda`.
+
+`calc_RD`, `calc_RD_by_tenor` and `compute_daily_returns` take an optional `start`/`end` date window:
+the panel then holds the window plus each ticker's previous observation (see `load_markit_data`),
+lags are computed over both and only the window's rows are returned. `write_cds_return_window`
+replaces that slice of the saved daily returns and keeps the rest.
 """
 
 
+import os
+import shutil
+
 import numpy as np
 import pandas as pd
-from scipy.interpolate import CubicSpline
 
 from pathlib import Path
 from settings import config
 
 DATA_DIR = Path(config("DATA_DIR"))
+MANUAL_DATA_DIR = Path(config("MANUAL_DATA_DIR"))
 WRDS_USERNAME = config("WRDS_USERNAME")
 START_YEAR = config("START_YEAR")
 END_YEAR = config("END_YEAR")
+CDS_COMPUTE_DTYPE = np.dtype(config("CDS_COMPUTE_DTYPE", default="float64"))
+CDS_FLOAT32_TOLERANCE = config("CDS_FLOAT32_TOLERANCE", default=1e-6, cast=float)
+CDS_FLOAT32_SAMPLE = config("CDS_FLOAT32_SAMPLE", default=50, cast=int)
+CDS_RD_ENGINE = config("CDS_RD_ENGINE", default="approx")
+
+RD_ENGINES = ("approx", "isda")
 
-from pull_markit import load_markit_data, load_multiple_data, load_sector_data
-from pull_interest_rates_data import load_fed_yield_curve, load_fred_data
+from pull_markit import load_markit_data, load_multiple_data, load_sector_data, parse_tenor
+from pull_interest_rates_data import load_fed_yield_curve, load_fred_data, load_region_curve
+from panel_layout import lag_within_ticker, load_offsets, offsets_path, row_group_ranges, sort_panel, ticker_offsets, write_offsets
+from run_diff import manifest_path, write_manifest
+
+# Rows per Parquet row group of the daily return file; small groups keep single-name reads cheap
+ROW_GROUP_SIZE = 8192
 
 
 def merge_rf_data(fed_data, fred_data, markit):
@@ -36,6 +73,30 @@ def merge_rf_data(fed_data, fred_data, markit):
     return rf_data
 
 
+def region_rf_data(markit, region="US", data_dir=DATA_DIR, manual_data_dir=MANUAL_DATA_DIR, tenors=None):
+    """
+    Rates table for `region` on the Markit trade dates: the Fed/FRED curves for the US, the
+    local `discount_curve_<region>.csv` stand-in for every other region.
+
+    The saved Fed table reaches the longest tenor in `CDS_TENORS`, but only the zero rates up to
+    the longest of `tenors` (the panel's `tenor` column, or 5Y without one; never less than 5
+    years) are kept as spline knots, so a 5Y panel is always priced off `SVENY01`-`SVENY05`.
+    """
+    if region == "US":
+        # Only the rate dates the (possibly windowed) panel can use
+        start, end = markit["trade_date"].min(), markit["trade_date"].max()
+        if tenors is None:
+            tenors = markit["tenor"].unique() if "tenor" in markit.columns else ["5Y"]
+        max_knot = max(knot_limit(parse_tenor(tenor)) for tenor in tenors)
+        fed_data = load_fed_yield_curve(data_dir, start, end)
+        fed_data = fed_data[[col for col in fed_data.columns if tenor_in_years(col) <= max_knot]]
+        return merge_rf_data(fed_data, load_fred_data(data_dir, start, end), markit)
+    rf_data = load_region_curve(region, manual_data_dir)
+    rf_data = rf_data[rf_data.index.isin(markit["trade_date"].unique())]
+    rf_data.index.name = "Date"
+    return rf_data
+
+
 def filter_sector(markit, sector_df):
     """
     (optional, the paper didn't mention such filtering)
@@ -50,20 +111,165 @@ def interpolate_row(y):
     """
     Apply cubic spline interpolation to yield curve data.
     """
+    from scipy.interpolate import CubicSpline
+
     x = [0.25, 0.5, 1, 2, 3, 4, 5]
     xvals = np.linspace(1 / 12, 5, 60)
     f = CubicSpline(x, y, bc_type="natural")  
     return pd.Series(f(xvals), index=xvals)  
 
 
+def tenor_in_years(label):
+    """
+    Map a curve column label (`DGS3MO`, `DGS6MO`, `SVENY05`, or a number of years, possibly as a
+    string like `"0.25"`) to its tenor in years.
+    """
+    if isinstance(label, (int, float, np.number)):
+        return float(label)
+    try:
+        return float(label)
+    except ValueError:
+        pass
+    if label.startswith("SVENY"):
+        return float(label[len("SVENY"):])
+    if label.startswith("DGS") and label.endswith("MO"):
+        return float(label[len("DGS"):-len("MO")]) / 12
+    raise ValueError(f"Cannot infer the tenor of curve column {label!r}")
+
+
+def knot_limit(maturity):
+    """
+    Longest curve knot, in years, that prices a CDS of `maturity` years: the maturity rounded up,
+    never under 5 years, so every tenor up to 5Y is priced off the 1-5 year Fed rates.
+    """
+    return float(np.ceil(max(5.0, maturity)))
+
+
+class DiscountCurve:
+    """
+    Natural cubic spline zero curves for many dates, stored as contiguous per-date
+    piecewise-cubic coefficients.
+
+    All dates share the same knots, so the spline's second derivatives are a fixed linear
+    map of the knot rates and every date's coefficients are built in one matrix product.
+    Dates are located through a hash index, and zero rates or discount factors for any
+    batch of `(dates, tenors)` are evaluated in one vectorized call. Tenors outside the
+    knot range are extrapolated with the first/last cubic piece, like `scipy`'s
+    `CubicSpline(..., bc_type="natural")`.
+    """
+
+    def __init__(self, dates, knots, coefficients):
+        self.dates = pd.DatetimeIndex(dates)
+        self.knots = np.asarray(knots, dtype=float)
+        # Shape (n_dates, n_knots - 1, 4): constant, linear, quadratic and cubic terms per interval
+        self.coefficients = np.ascontiguousarray(coefficients, dtype=float)
+
+    @classmethod
+    def from_rf_data(cls, rf_data, knots=None):
+        """
+        Build the curve from a rates table with one row per date and one column per knot tenor.
+        """
+        if knots is None:
+            knots = [tenor_in_years(col) for col in rf_data.columns]
+        knots = np.asarray(knots, dtype=float)
+        y = rf_data.to_numpy(dtype=float)
+        h = np.diff(knots)
+
+        # Natural spline: second derivatives M solve A @ M = B @ y with M[0] = M[-1] = 0
+        n = len(knots)
+        A = np.zeros((n, n))
+        B = np.zeros((n, n))
+        A[0, 0] = A[-1, -1] = 1
+        for i in range(1, n - 1):
+            A[i, i - 1], A[i, i], A[i, i + 1] = h[i - 1], 2 * (h[i - 1] + h[i]), h[i]
+            B[i, i - 1], B[i, i], B[i, i + 1] = 6 / h[i - 1], -6 / h[i - 1] - 6 / h[i], 6 / h[i]
+        M = y @ np.linalg.solve(A, B).T
+
+        coefficients = np.empty((len(y), n - 1, 4))
+        coefficients[:, :, 0] = y[:, :-1]
+        coefficients[:, :, 1] = np.diff(y, axis=1) / h - h * (2 * M[:, :-1] + M[:, 1:]) / 6
+        coefficients[:, :, 2] = M[:, :-1] / 2
+        coefficients[:, :, 3] = np.diff(M, axis=1) / (6 * h)
+        return cls(rf_data.index, knots, coefficients)
+
+    def date_positions(self, dates):
+        positions = self.dates.get_indexer(pd.DatetimeIndex(np.atleast_1d(dates)))
+        if (positions < 0).any():
+            raise KeyError("Some dates are not on the discount curve.")
+        return positions
+
+    def zero_rate(self, dates, tenors):
+        """
+        Zero rates for `dates` (length k) at `tenors` in years, either shape (m,) shared by
+        all dates or shape (k, m) per date. Returns an array of shape (k, m).
+        """
+        positions = self.date_positions(dates)
+        tenors = np.broadcast_to(np.asarray(tenors, dtype=float), (len(positions), np.shape(tenors)[-1]))
+        interval = np.clip(np.searchsorted(self.knots, tenors, side="right") - 1, 0, len(self.knots) - 2)
+        coef = self.coefficients[positions[:, None], interval]
+        dx = tenors - self.knots[interval]
+        return coef[..., 0] + dx * (coef[..., 1] + dx * (coef[..., 2] + dx * coef[..., 3]))
+
+    def discount_factor(self, dates, tenors):
+        """
+        Discount factors exp(-r * t / 12), the same convention as `calc_risk_free_term`.
+        """
+        tenors = np.asarray(tenors, dtype=float)
+        return np.exp(-self.zero_rate(dates, tenors) * tenors / 12)
+
+    def truncate(self, max_knot):
+        """
+        This curve rebuilt on its knots up to `max_knot` years only, exactly as `from_rf_data` would
+        build it from those columns: each kept knot's rate is the constant term of the interval it
+        starts.
+        """
+        n_knots = int(np.searchsorted(self.knots, max_knot, side="right"))
+        if n_knots >= len(self.knots):
+            return self
+        rates = pd.DataFrame(self.coefficients[:, :n_knots, 0], index=self.dates)
+        return DiscountCurve.from_rf_data(rates, knots=self.knots[:n_knots])
+
+    def zero_rate_table(self, tenors):
+        return pd.DataFrame(self.zero_rate(self.dates, tenors), index=self.dates, columns=tenors)
+
+    def discount_table(self, tenors):
+        return pd.DataFrame(self.discount_factor(self.dates, tenors), index=self.dates, columns=tenors)
+
+    def merge(self, other):
+        """
+        This curve with the dates of `other` added, replacing any dates the two share.
+        """
+        keep = ~self.dates.isin(other.dates)
+        dates = self.dates[keep].append(other.dates)
+        order = np.argsort(dates.asi8, kind="stable")
+        coefficients = np.concatenate([self.coefficients[keep], other.coefficients])
+        return DiscountCurve(dates[order].rename(self.dates.name), self.knots, coefficients[order])
+
+    def save(self, path):
+        """
+        Serialize the curve compactly, so it is built once per curve vintage.
+        """
+        np.savez_compressed(
+            path,
+            dates=self.dates.asi8,
+            knots=self.knots,
+            coefficients=self.coefficients,
+            name=np.array(self.dates.name or ""),
+        )
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            dates = pd.DatetimeIndex(data["dates"].astype("datetime64[ns]"), name=str(data["name"]) or None)
+            return cls(dates, data["knots"], data["coefficients"])
+
+
 def calc_risk_free_rate(rf_data):
     """
     Calculate interpolated risk-free rates for multiple maturities.
     """
     xvals = np.linspace(1 / 12, 5, 60)
-    r_t_df = pd.DataFrame(index=rf_data.index, columns=xvals)
-    r_t_df.loc[:, :] = rf_data.apply(interpolate_row, axis=1)
-    return r_t_df.astype(float)
+    return DiscountCurve.from_rf_data(rf_data).zero_rate_table(xvals)
 
 
 def calc_lambda(cds_df, L=0.6):
@@ -78,39 +284,111 @@ def calc_risk_free_term(rf_data):
     """
     Compute risk-free discount factors.
     """
-    r_t_df = calc_risk_free_rate(rf_data)
-    maturities = np.array(r_t_df.columns, dtype=float)
-    for i in range(len(r_t_df)):
-        r_t_df.iloc[i] *= maturities
-    r_t_df = np.exp(-1 * r_t_df / 12)
-    return r_t_df
+    xvals = np.linspace(1 / 12, 5, 60)
+    return DiscountCurve.from_rf_data(rf_data).discount_table(xvals)
 
 
-def calc_RD(cds_df, r_t_df, maturity=5):
+def calc_RD(cds_df, r_t_df, maturity=5, dtype=np.float64, start=None, end=None):
     """
     Compute risk-neutral default probability RD.
+
+    The discount factors, hazard terms and the RD sum are computed in `dtype`; RD is returned
+    as float64 either way. With `start`/`end`, rows outside the window only feed the lags.
     """
     cds_df["trade_date"] = pd.to_datetime(cds_df["trade_date"])
+    # Sort once into canonical ticker-then-date order; merge and dropna preserve it
+    cds_df = sort_panel(cds_df)
 
-    rd_df = r_t_df.merge(cds_df, right_on="trade_date", left_on=r_t_df.index, how="right")
+    rd_df = r_t_df.astype(dtype).merge(cds_df, right_on="trade_date", left_on=r_t_df.index, how="right")
     rd_df = calc_lambda(rd_df)
     rd_df = rd_df.dropna(axis=0)
 
-    rd_df["RD"] = 0
+    lam = rd_df["lambda"].astype(dtype)
+    rd_df["RD"] = np.zeros(len(rd_df), dtype=dtype)
     for j in range(1, 12 * maturity + 1):  
         risk_free_col = rd_df.iloc[:, j - 1]
-        rd_df["RD"] += np.exp(-j / 12 * rd_df["lambda"]) * risk_free_col
-    rd_df["RD"] /= 12
+        rd_df["RD"] += np.exp(-j / 12 * lam) * risk_free_col
+    rd_df["RD"] = (rd_df["RD"] / 12).astype(np.float64)
 
-    rd_df = rd_df.sort_values(["ticker", "trade_date"])
-    rd_df["RD_prev"] = rd_df.groupby("ticker")["RD"].shift(1)
-    rd_df["spread_prev"] = rd_df.groupby("ticker")["spread"].shift(1)
+    offsets = ticker_offsets(rd_df)
+    rd_df["RD_prev"] = lag_within_ticker(rd_df["RD"], offsets)
+    rd_df["spread_prev"] = lag_within_ticker(rd_df["spread"], offsets)
 
     columns_available = [
         col for col in ["ticker", "trade_date", "spread_prev", "spread", "RD", "RD_prev", "sector"]
         if col in rd_df.columns
     ]
-    return rd_df[columns_available]
+    return window_rows(rd_df[columns_available], start, end)
+
+
+def calc_RD_by_tenor(cds_df, r_t_df, dtype=np.float64, start=None, end=None):
+    """
+    Compute RD for a panel with several CDS tenors over one shared discount table.
+
+    `r_t_df` is a discount table on the monthly grid `1/12, 2/12, ...` up to the longest
+    tenor. Each tenor's rows are summed over the first `12 * maturity` columns as one
+    contiguous block, so each tenor gives exactly the RD of `calc_RD(maturity=...)`, including
+    the `dtype` of the computation and the `start`/`end` window. A table with one block of
+    columns per knot limit (see `rd_discount_table`) prices each tenor off its block.
+    """
+    cds_df["trade_date"] = pd.to_datetime(cds_df["trade_date"])
+    cds_df = cds_df.sort_values(["tenor", "ticker", "trade_date"], kind="stable")
+
+    # Keep rows on curve dates with a spread, like the inner merge + dropna in calc_RD
+    positions = r_t_df.index.get_indexer(cds_df["trade_date"])
+    keep = (positions >= 0) & cds_df["spread"].notna().to_numpy()
+    rd_df = calc_lambda(cds_df[keep].reset_index(drop=True))
+    positions = positions[keep]
+
+    # Rows are grouped by tenor (codes ascending), then in ticker-then-date order within each tenor
+    tenor = rd_df["tenor"].astype("category")
+    codes = tenor.cat.codes.to_numpy()
+    split = isinstance(r_t_df.columns, pd.MultiIndex)
+    tables = {}
+
+    lam = rd_df["lambda"].to_numpy(dtype=dtype)
+    rd = np.zeros(len(rd_df), dtype=dtype)
+    for code in np.unique(codes):
+        rows = slice(*np.searchsorted(codes, [code, code + 1]))
+        label = tenor.cat.categories[code]
+        n_months = round(12 * parse_tenor(label))
+        limit = knot_limit(parse_tenor(label)) if split else None
+        if limit not in tables:
+            # One column per month, contiguous, so each step gathers one date-indexed vector
+            tables[limit] = np.ascontiguousarray((r_t_df[limit] if split else r_t_df).to_numpy(dtype=dtype).T)
+        discount = tables[limit]
+        if n_months > len(discount):
+            raise ValueError(f"The discount table covers {len(discount)} months; tenor {label} needs {n_months}.")
+
+        # Each tenor's rows form one contiguous block, summed exactly like `calc_RD`
+        tenor_lam, tenor_positions = lam[rows], positions[rows]
+        for j in range(1, n_months + 1):
+            rd[rows] += np.exp(-j / 12 * tenor_lam) * discount[j - 1][tenor_positions]
+    rd_df["RD"] = (rd / 12).astype(np.float64)
+
+    rd_df["RD_prev"] = np.nan
+    rd_df["spread_prev"] = np.nan
+    bounds = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1], True])
+    for lo, hi in zip(bounds[:-1], bounds[1:]):
+        block = rd_df.iloc[lo:hi]
+        offsets = ticker_offsets(block)
+        rd_df.iloc[lo:hi, rd_df.columns.get_loc("RD_prev")] = lag_within_ticker(block["RD"], offsets)
+        rd_df.iloc[lo:hi, rd_df.columns.get_loc("spread_prev")] = lag_within_ticker(block["spread"], offsets)
+
+    columns_available = [
+        col for col in ["ticker", "trade_date", "tenor", "spread_prev", "spread", "RD", "RD_prev", "sector"]
+        if col in rd_df.columns
+    ]
+    return window_rows(rd_df[columns_available], start, end)
+
+
+def window_rows(rd_df, start, end):
+    """
+    Rows of `rd_df` from `start` to `end` (inclusive); all rows, untouched, without a window.
+    """
+    if start is None and end is None:
+        return rd_df
+    return _select_rows(rd_df, None, start, end).reset_index(drop=True)
 
 
 def calc_cds_daily_return(rd_df):
@@ -124,12 +402,347 @@ def calc_cds_daily_return(rd_df):
     return rd_df
 
 
-def load_cds_return(data_dir=DATA_DIR):
+def write_cds_return(df, data_dir=DATA_DIR):
     """
-    Load precomputed CDS daily returns.
+    Save CDS daily returns as Parquet in canonical ticker-then-date order, together with
+    the per-ticker offsets index and an uncompressed Arrow IPC (Feather v2) sidecar that
+    `load_cds_return(memory_map=True)` can map into memory without copying.
+
+    The Parquet file is written in row groups of `ROW_GROUP_SIZE` rows with min/max
+    statistics, and the offsets index records each ticker's row-group range, so
+    `load_cds_return(tickers=...)` reads only the row groups holding those tickers. A content
+    manifest of per-ticker-year hashes is written for `run_diff.py`.
+
+    All four files are written under temporary names and then moved into place, so a failed
+    write leaves the previous files intact.
     """
+    import pyarrow as pa
+    from pyarrow import feather
+
+    df = sort_panel(df)
     path = data_dir / "CDS_daily_return.parquet"
-    return pd.read_parquet(path)
+    sidecar = data_dir / "CDS_daily_return.arrow"
+    tmp_path = data_dir / "CDS_daily_return.tmp.parquet"
+    tmp_sidecar = sidecar.with_suffix(".arrow.tmp")
+    df.to_parquet(tmp_path, row_group_size=ROW_GROUP_SIZE, write_statistics=True)
+    offsets = row_group_ranges(ticker_offsets(df), ROW_GROUP_SIZE)
+    write_offsets(offsets, tmp_path)
+    write_manifest(df, tmp_path, "ticker")
+    feather.write_feather(pa.Table.from_pandas(df, preserve_index=False), tmp_sidecar, compression="uncompressed")
+
+    # The Parquet file goes first: until the index, manifest and sidecar follow, the old ones are
+    # older than it, so readers treat them as stale and use the Parquet file alone. New ones next
+    # to the old Parquet file would instead pass as current.
+    os.replace(tmp_path, path)
+    os.replace(offsets_path(tmp_path), offsets_path(path))
+    os.replace(manifest_path(tmp_path), manifest_path(path))
+    os.replace(tmp_sidecar, sidecar)
+
+
+def _fresh(path, source):
+    return path.exists() and path.stat().st_mtime_ns >= source.stat().st_mtime_ns
+
+
+def cds_return_row_groups(data_dir=DATA_DIR, tickers=None, start=None, end=None):
+    """
+    Row groups of `CDS_daily_return.parquet` that can hold rows of `tickers` between `start`
+    and `end`: the tickers' row-group ranges from the offsets index, pruned with the
+    `trade_date` min/max statistics. Returns None when the index is missing or stale.
+    """
+    import pyarrow.parquet as pq
+
+    path = data_dir / "CDS_daily_return.parquet"
+    if not _fresh(offsets_path(path), path):
+        return None
+    metadata = pq.ParquetFile(path).metadata
+    if tickers is None:
+        groups = range(metadata.num_row_groups)
+    else:
+        offsets = load_offsets(path)
+        if "first_row_group" not in offsets.columns:
+            return None
+        offsets = offsets[offsets["ticker"].isin(list(tickers))]
+        groups = sorted(
+            {g for first, last in zip(offsets["first_row_group"], offsets["last_row_group"]) for g in range(first, last + 1)}
+        )
+
+    date_column = metadata.schema.names.index("trade_date")
+    start = pd.Timestamp(start) if start is not None else None
+    end = pd.Timestamp(end) if end is not None else None
+    selected = []
+    for group in groups:
+        stats = metadata.row_group(group).column(date_column).statistics
+        if stats is not None and stats.has_min_max:
+            if (start is not None and pd.Timestamp(stats.max) < start) or (end is not None and pd.Timestamp(stats.min) > end):
+                continue
+        selected.append(group)
+    return selected
+
+
+def _select_rows(df, tickers, start, end):
+    mask = np.ones(len(df), dtype=bool)
+    if tickers is not None:
+        mask &= df["ticker"].isin(list(tickers)).to_numpy()
+    if start is not None:
+        mask &= (df["trade_date"] >= pd.Timestamp(start)).to_numpy()
+    if end is not None:
+        mask &= (df["trade_date"] <= pd.Timestamp(end)).to_numpy()
+    return df[mask]
+
+
+def relag_after(df, end):
+    """
+    Recompute the lags and daily return of each (tenor,) ticker's first row after `end` from its
+    previous row in `df`, after the rows up to `end` were replaced. Returns `df` in canonical
+    (tenor-then-)ticker-then-date order.
+    """
+    keys = ["tenor", "ticker"] if "tenor" in df.columns else ["ticker"]
+    df = df.sort_values([*keys, "trade_date"], kind="stable").reset_index(drop=True)
+    if not {"spread", "RD", "spread_prev", "RD_prev"} <= set(df.columns):
+        return df
+    after = (df["trade_date"] > pd.Timestamp(end)).to_numpy()
+    same_series = np.r_[False, (df[keys].iloc[1:].to_numpy() == df[keys].iloc[:-1].to_numpy()).all(axis=1)]
+    first_after = after & same_series & ~np.r_[False, after[:-1]]
+    if first_after.any():
+        rows = np.flatnonzero(first_after)
+        df.loc[rows, "spread_prev"] = df["spread"].to_numpy()[rows - 1]
+        df.loc[rows, "RD_prev"] = df["RD"].to_numpy()[rows - 1]
+        df.loc[rows, "daily_return"] = calc_cds_daily_return(df.loc[rows].copy())["daily_return"]
+    return df
+
+
+def write_cds_return_window(df, start, end, data_dir=DATA_DIR):
+    """
+    Replace the rows from `start` to `end` (inclusive) of the saved daily returns with `df` and
+    rewrite the file, its offsets index and sidecar; rows outside the window are kept. With a
+    `tenor` column the tenor-partitioned dataset is updated the same way, and its 5Y slice
+    replaces the window of `CDS_daily_return.parquet`.
+
+    The first row after `end` of each series lags the window's last row, so its `spread_prev`,
+    `RD_prev` and `daily_return` are recomputed from the replaced rows (see `relag_after`).
+    """
+    def replace(existing, df):
+        outside = (existing["trade_date"] < pd.Timestamp(start)) | (existing["trade_date"] > pd.Timestamp(end))
+        return relag_after(pd.concat([existing[outside], df], ignore_index=True), end)
+
+    if "tenor" in df.columns:
+        if (data_dir / "CDS_daily_return_by_tenor").exists():
+            write_cds_return_by_tenor(replace(load_cds_return_by_tenor(data_dir), df), data_dir)
+        else:
+            write_cds_return_by_tenor(df, data_dir)
+        df = df[df["tenor"] == "5Y"].drop(columns="tenor")
+        if df.empty:
+            return
+    path = data_dir / "CDS_daily_return.parquet"
+    if path.exists():
+        df = replace(pd.read_parquet(path), df)
+    write_cds_return(df.reset_index(drop=True), data_dir)
+
+
+def load_cds_return(data_dir=DATA_DIR, columns=None, memory_map=False, tickers=None, start=None, end=None):
+    """
+    Load precomputed CDS daily returns, optionally only the given columns.
+
+    With `memory_map=True` the Arrow IPC sidecar is memory-mapped and returned as an
+    Arrow-backed DataFrame (`pd.ArrowDtype` columns) that shares the file's page-cache
+    pages instead of copying them. If the sidecar is missing or older than the Parquet
+    file, this falls back to reading the Parquet file.
+
+    `tickers`, `start` and `end` (inclusive) select a slice of the panel. The mapped sidecar
+    is sliced with the per-ticker offsets; the Parquet file is read only in the row groups
+    returned by `cds_return_row_groups`. Without a current offsets index the whole file is
+    read and filtered.
+    """
+    path = data_dir / "CDS_daily_return.parquet"
+    sidecar = data_dir / "CDS_daily_return.arrow"
+    point_lookup = tickers is not None or start is not None or end is not None
+    read_columns = columns
+    if point_lookup and columns is not None:
+        read_columns = list(dict.fromkeys(["ticker", "trade_date", *columns]))
+
+    if memory_map and _fresh(sidecar, path):
+        import pyarrow as pa
+
+        with pa.memory_map(str(sidecar), "r") as source:
+            table = pa.ipc.open_file(source).read_all()
+        if tickers is not None and _fresh(offsets_path(path), path):
+            offsets = load_offsets(path)
+            offsets = offsets[offsets["ticker"].isin(list(tickers))]
+            # Zero-copy slices of each ticker's contiguous run
+            slices = [table.slice(run_start, run_stop - run_start) for run_start, run_stop in zip(offsets["start"], offsets["stop"])]
+            table = pa.concat_tables(slices) if slices else table.slice(0, 0)
+        if read_columns is not None:
+            table = table.select(read_columns)
+        df = table.to_pandas(types_mapper=pd.ArrowDtype)
+        if point_lookup:
+            df = _select_rows(df, tickers, start, end).reset_index(drop=True)
+        return df[columns] if columns is not None else df
+
+    if not point_lookup:
+        return pd.read_parquet(path, columns=columns)
+
+    groups = cds_return_row_groups(data_dir, tickers, start, end)
+    if groups is None:
+        df = pd.read_parquet(path, columns=read_columns)
+    else:
+        import pyarrow.parquet as pq
+
+        parquet_file = pq.ParquetFile(path)
+        df = parquet_file.read_row_groups(groups, columns=read_columns, use_pandas_metadata=True).to_pandas()
+    df = _select_rows(df, tickers, start, end)
+    return df[columns] if columns is not None else df
+
+
+def write_cds_return_by_tenor(df, data_dir=DATA_DIR):
+    """
+    Save multi-tenor CDS daily returns as a Parquet dataset partitioned by tenor, each
+    partition in ticker-then-date order. The previous dataset is replaced as a whole.
+    """
+    path = data_dir / "CDS_daily_return_by_tenor"
+    tmp_path = path.with_name(path.name + ".tmp")
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    df = df.sort_values(["tenor", "ticker", "trade_date"], kind="stable")
+    df.to_parquet(tmp_path, partition_cols=["tenor"], index=False)
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(tmp_path, path)
+
+
+def load_cds_return_by_tenor(data_dir=DATA_DIR, tenors=None, columns=None):
+    """
+    Load multi-tenor CDS daily returns, reading only the partitions of `tenors` (all when None).
+    """
+    filters = [("tenor", "in", list(tenors))] if tenors is not None else None
+    df = pd.read_parquet(data_dir / "CDS_daily_return_by_tenor", columns=columns, filters=filters)
+    if "tenor" in df.columns:
+        df["tenor"] = df["tenor"].cat.remove_unused_categories()
+    return df
+
+
+def load_cds_return_offsets(data_dir=DATA_DIR):
+    """
+    Load the per-ticker `start`/`stop` row offsets persisted next to the daily returns.
+    """
+    return load_offsets(data_dir / "CDS_daily_return.parquet")
+
+
+def rd_discount_table(curve, tenors=None):
+    """
+    Discount table on the monthly grid `1/12, 2/12, ...` up to the longest of `tenors`
+    (5 years when None), shared by every tenor of the panel.
+
+    Each tenor is discounted off `curve` truncated to its `knot_limit`, so longer tenors in the
+    panel do not move the shorter tenors' RD. When the tenors need different knot limits, the
+    table holds one such grid per limit, under an outer `knots` column level.
+    """
+    maturities = [parse_tenor(tenor) for tenor in tenors] if tenors is not None else [5]
+    blocks = {}
+    for limit in sorted({knot_limit(maturity) for maturity in maturities}):
+        n_months = round(12 * max(maturity for maturity in maturities if knot_limit(maturity) == limit))
+        blocks[limit] = curve.truncate(limit).discount_table(np.linspace(1 / 12, n_months / 12, n_months))
+    if len(blocks) == 1:
+        return blocks[limit]
+    return pd.concat(blocks, axis=1, names=["knots", None])
+
+
+def calc_panel_RD(markit, risk_free_term_df, dtype=np.float64, start=None, end=None):
+    """
+    RD for a Markit panel: per tenor when it has a `tenor` column, at 5Y otherwise.
+    """
+    if "tenor" in markit.columns:
+        return calc_RD_by_tenor(markit, risk_free_term_df, dtype=dtype, start=start, end=end)
+    return calc_RD(markit, risk_free_term_df, dtype=dtype, start=start, end=end)
+
+
+def check_reduced_precision(
+    markit,
+    risk_free_term_df,
+    daily,
+    tolerance=CDS_FLOAT32_TOLERANCE,
+    sample_size=CDS_FLOAT32_SAMPLE,
+    seed=0,
+    spread_max=None,
+    start=None,
+    end=None,
+):
+    """
+    Recompute the daily returns of a random sample of tickers in float64 and compare them,
+    and their compounded monthly returns, with `daily` from a reduced-precision run
+    (restricted to `spread < spread_max` and the `start`/`end` window when `daily` was).
+
+    Portfolio assignments depend only on spreads, so a portfolio return (an average of monthly
+    returns) deviates by at most the largest monthly deviation. Returns the maximum absolute
+    deviations and raises `ValueError` when one exceeds `tolerance`.
+    """
+    tickers = pd.unique(daily["ticker"])
+    rng = np.random.default_rng(seed)
+    sample = rng.choice(tickers, size=min(sample_size, len(tickers)), replace=False)
+
+    keys = ["tenor", "ticker"] if "tenor" in daily.columns else ["ticker"]
+    sample_markit = markit[markit["ticker"].isin(sample)].copy()
+    expected = calc_cds_daily_return(calc_panel_RD(sample_markit, risk_free_term_df, start=start, end=end))
+    if spread_max is not None:
+        expected = expected[expected["spread"] < spread_max]
+    actual = daily[daily["ticker"].isin(sample)]
+    expected = expected.sort_values([*keys, "trade_date"])
+    actual = actual.sort_values([*keys, "trade_date"])
+
+    def monthly(df):
+        month = pd.DatetimeIndex(df["trade_date"]).to_period("M")
+        groups = [df[key].astype(str).to_numpy() for key in keys] + [month]
+        return (1 + df["daily_return"]).groupby(groups).prod().to_numpy() - 1
+
+    deviations = {
+        "daily_return": np.abs(actual["daily_return"].to_numpy() - expected["daily_return"].to_numpy()).max(initial=0),
+        "monthly_return": np.abs(monthly(actual) - monthly(expected)).max(initial=0),
+    }
+    for name, deviation in deviations.items():
+        if deviation > tolerance:
+            raise ValueError(
+                f"Reduced-precision {name} deviates from float64 by {deviation:.3g} on {len(sample)} sampled "
+                f"tickers, above the tolerance {tolerance:.3g}; rerun with CDS_COMPUTE_DTYPE=float64."
+            )
+    return deviations
+
+
+def check_rd_engine(engine, dtype):
+    """
+    Raise `ValueError` for an unknown RD engine, or a reduced `dtype` with the ISDA engine,
+    which calibrates in float64 only.
+    """
+    if engine not in RD_ENGINES:
+        raise ValueError(f"Unknown RD engine {engine!r}; expected one of {RD_ENGINES}")
+    if engine == "isda" and np.dtype(dtype) != np.float64:
+        raise ValueError(f"The isda RD engine computes in float64 only; got dtype {np.dtype(dtype)}.")
+
+
+def compute_daily_returns(
+    markit, rf_data, dtype=CDS_COMPUTE_DTYPE, tolerance=CDS_FLOAT32_TOLERANCE, engine=CDS_RD_ENGINE, start=None, end=None
+):
+    """
+    Build the discount curve from `rf_data` and compute daily CDS returns for `markit`,
+    per tenor when the panel has a `tenor` column. Returns `(curve, daily_returns)`.
+
+    With a `dtype` other than float64, RD is computed in that precision and the result is
+    checked against float64 on a sample of tickers (see `check_reduced_precision`). With
+    `engine="isda"`, RD comes from the ISDA standard model instead of the approximation; it
+    computes in float64 only and rejects any other `dtype`. With `start`/`end`, only the
+    returns of that window are computed (see `calc_RD`).
+    """
+    check_rd_engine(engine, dtype)
+    curve = DiscountCurve.from_rf_data(rf_data)
+    if engine == "isda":
+        from isda import calc_RD_isda
+
+        return curve, calc_cds_daily_return(calc_RD_isda(markit, curve, start=start, end=end))
+
+    tenors = markit["tenor"].astype("category").cat.categories if "tenor" in markit.columns else None
+    risk_free_term_df = rd_discount_table(curve, tenors)
+    if np.dtype(dtype) == np.float64:
+        return curve, calc_cds_daily_return(calc_panel_RD(markit, risk_free_term_df, start=start, end=end))
+
+    daily = calc_cds_daily_return(calc_panel_RD(markit, risk_free_term_df, dtype=dtype, start=start, end=end))
+    check_reduced_precision(markit, risk_free_term_df, daily, tolerance=tolerance, start=start, end=end)
+    return curve, daily
 
 
 if __name__ == "__main__":
@@ -138,16 +751,19 @@ if __name__ == "__main__":
         markit = load_markit_data()
     else:
         markit = load_multiple_data()
+    if "region" in markit.columns:
+        # Region-tagged pulls are processed per region by regional.py; this script keeps the US panel
+        markit = markit[markit["region"] == "US"].drop(columns="region")
 
     sector_df = load_sector_data()
 
-    fed_data = load_fed_yield_curve()
-    fred_data = load_fred_data()
+    rf_data = region_rf_data(markit, "US")
+    curve, final_df = compute_daily_returns(markit, rf_data)
+    curve.save(DATA_DIR / "discount_curve.npz")
 
-    rf_data = merge_rf_data(fed_data, fred_data, markit)
-    risk_free_term_df = calc_risk_free_term(rf_data)
-
-    rd_df = calc_RD(markit, risk_free_term_df)
-    final_df = calc_cds_daily_return(rd_df)
-
-    final_df.to_parquet(DATA_DIR / "CDS_daily_return.parquet")
+    if "tenor" in final_df.columns:
+        write_cds_return_by_tenor(final_df)
+        if (final_df["tenor"] == "5Y").any():
+            write_cds_return(final_df[final_df["tenor"] == "5Y"].drop(columns="tenor").reset_index(drop=True))
+    else:
+        write_cds_return(final_df)
@@ -0,0 +1,36 @@
+"""
+Shared pytest configuration.
+
+Tests marked `external_source` pull through the configured data source (see `data_sources.py`).
+They run whenever `DATA_SOURCE_MODE` is set: CI replays the fixtures committed under
+`data_manual/fixtures`, while `live`/`record` need WRDS credentials and network access.
+Without the setting they are skipped, so a plain `pytest` stays offline.
+
+Tests marked `live_source` check properties of the full WRDS extract that the small replay
+fixtures cannot reproduce, and only run in `live` or `record` mode.
+"""
+
+import pytest
+
+from data_sources import MODES
+from settings import config
+
+DATA_SOURCE_MODE = config("DATA_SOURCE_MODE", default="")
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "external_source: pulls from WRDS or the web through the configured data source")
+    config.addinivalue_line("markers", "live_source: needs the full WRDS extract, not the replay fixtures")
+
+
+def pytest_collection_modifyitems(config, items):
+    if DATA_SOURCE_MODE not in MODES:
+        skip = pytest.mark.skip(reason="pulls from WRDS or the web; set DATA_SOURCE_MODE to live, record or replay")
+        for item in items:
+            if "external_source" in item.keywords or "live_source" in item.keywords:
+                item.add_marker(skip)
+    elif DATA_SOURCE_MODE == "replay":
+        skip = pytest.mark.skip(reason="checks the full WRDS extract; replay fixtures are samples")
+        for item in items:
+            if "live_source" in item.keywords:
+                item.add_marker(skip)
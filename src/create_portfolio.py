@@ -4,8 +4,14 @@ This script processes daily CDS returns and constructs monthly CDS portfolio ret
 Functions include:
 - `create_yyyymm_col`: Adds a column for the month and year (yyyymm) based on the trade date.
 - `calc_cds_monthly_return`: Computes the compounded monthly return from daily returns.
+- `calc_monthly_panel`: Fused one-pass kernel computing monthly return, first-day spread, observation count and coverage per ticker-month.
+- `load_monthly_panel`: Runs the fused kernel over the daily return file one year at a time.
 - `filter_tickers_by_min_months`: Filters out tickers with fewer than a specified number of months of data.
 - `construct_cds_portfolios`: Constructs portfolios sorted by the first trading day's CDS spread and computes portfolio returns.
+- `quantile_buckets`: `pd.qcut` bucket numbers for many sorted groups at once.
+- `construct_rebalanced_portfolios`: Daily, weekly or monthly rebalanced spread-sorted portfolios with a lagged signal, ranked in one vectorized pass.
+- `month_window`, `in_months`: Widen a date window to whole calendar months, and select those months.
+- `write_portfolio`, `write_portfolio_window`: Save the portfolio returns, or replace the months of a date window in them.
 - `pivot_table`: Pivots the portfolio data for easier analysis.
 - `load_portfolio`: Loads precomputed portfolio returns from a Parquet file.
 """
@@ -22,9 +28,18 @@ DATA_DIR = Path(config("DATA_DIR"))
 WRDS_USERNAME = config("WRDS_USERNAME")
 START_YEAR = config("START_YEAR")
 END_YEAR = config("END_YEAR")
+PORTFOLIO_FREQUENCIES = [
+    frequency.strip() for frequency in config("PORTFOLIO_FREQUENCIES", default="").split(",") if frequency.strip()
+]
+PORTFOLIO_SIGNAL_LAG = config("PORTFOLIO_SIGNAL_LAG", default=1, cast=int)
+
+REBALANCE_FREQUENCIES = ("daily", "weekly", "monthly")
 
 from calc_cds_daily_return import load_cds_return
 from misc_tools import generate_month_code
+from panel_layout import lag_within_ticker, sort_panel, ticker_offsets
+from streaming_stats import iter_year_partitions
+from run_diff import write_manifest
     
 
 def create_yyyymm_col(daily_rd_df):
@@ -46,6 +61,85 @@ def calc_cds_monthly_return(daily_rd_df):
 
     return monthly_returns
 
+def calc_monthly_panel(daily_df, spread_max=None):
+    """
+    Fused daily-to-monthly kernel: one pass over the ticker-sorted daily panel that emits
+    only the compact ticker-month table.
+
+    For every ticker-month it computes, in the same pass,
+    - `daily_return`: the compounded monthly return, (1 + Monthly Return) = Π (1 + Daily Return)
+      (the column name is kept so the table plugs into `construct_cds_portfolios`),
+    - `spread`: the spread on the first trading day of the month (the portfolio sort signal),
+    - `n_obs`: the number of daily observations,
+    - `coverage`: `n_obs` divided by the number of trading days in that month in the panel.
+
+    Daily returns are computed from `spread`, `spread_prev` and `RD_prev` when the
+    `daily_return` column is absent. Rows with `spread >= spread_max` are skipped.
+    """
+    ticker = daily_df["ticker"].to_numpy()
+    trade_date = pd.DatetimeIndex(daily_df["trade_date"])
+    spread = daily_df["spread"].to_numpy(dtype=float)
+    if "daily_return" in daily_df.columns:
+        daily_return = daily_df["daily_return"].to_numpy(dtype=float)
+    else:
+        spread_prev = daily_df["spread_prev"].to_numpy(dtype=float)
+        daily_return = -(spread_prev / 250 + (spread - spread_prev) * daily_df["RD_prev"].to_numpy(dtype=float))
+
+    keep = ~np.isnan(daily_return)
+    if spread_max is not None:
+        keep &= spread < spread_max
+    yyyymm = trade_date.year.to_numpy() * 100.0 + trade_date.month.to_numpy()
+
+    # Trading days per month, counted over the whole panel before filtering
+    month_dates = pd.DataFrame({"yyyymm": yyyymm, "trade_date": trade_date})
+    trading_days = month_dates.drop_duplicates().groupby("yyyymm").size()
+
+    ticker, trade_date, spread, daily_return, yyyymm = (
+        ticker[keep], trade_date[keep], spread[keep], daily_return[keep], yyyymm[keep]
+    )
+    ticker_codes, ticker_labels = pd.factorize(ticker, sort=True)
+    # Sort only if the input is not already in ticker-then-date order
+    ticker_step, date_step = np.diff(ticker_codes), np.diff(trade_date.asi8)
+    if not ((ticker_step > 0) | ((ticker_step == 0) & (date_step >= 0))).all():
+        order = np.lexsort((trade_date.asi8, ticker_codes))
+        ticker_codes, spread, daily_return, yyyymm = (
+            ticker_codes[order], spread[order], daily_return[order], yyyymm[order]
+        )
+
+    if len(ticker_codes) == 0:
+        return pd.DataFrame(columns=["ticker", "yyyymm", "daily_return", "spread", "n_obs", "coverage"])
+
+    new_run = np.r_[True, (np.diff(ticker_codes) != 0) | (np.diff(yyyymm) != 0)]
+    starts = np.flatnonzero(new_run)
+    n_obs = np.diff(np.r_[starts, len(ticker_codes)])
+    run_yyyymm = yyyymm[starts]
+
+    return pd.DataFrame(
+        {
+            "ticker": ticker_labels[ticker_codes[starts]],
+            "yyyymm": run_yyyymm,
+            "daily_return": np.multiply.reduceat(1 + daily_return, starts) - 1,
+            "spread": spread[starts],
+            "n_obs": n_obs,
+            "coverage": n_obs / trading_days.reindex(run_yyyymm).to_numpy(),
+        }
+    )
+
+
+def load_monthly_panel(data_dir=DATA_DIR, spread_max=0.5, start_year=START_YEAR, end_year=END_YEAR):
+    """
+    Build the ticker-month table one calendar year at a time, reading only the columns the
+    fused kernel needs, so memory scales with ticker-months rather than ticker-days.
+    """
+    path = data_dir / "CDS_daily_return.parquet"
+    columns = ["ticker", "trade_date", "spread", "daily_return"]
+    monthly = [
+        calc_monthly_panel(daily_df, spread_max=spread_max)
+        for _, daily_df in iter_year_partitions(path, columns, start_year, end_year)
+    ]
+    return pd.concat(monthly, ignore_index=True)
+
+
 def filter_tickers_by_min_months(monthly_rd_df, min_months=6):
     """
     Filters out tickers that have fewer than `min_months` of records.
@@ -65,10 +159,16 @@ def filter_tickers_by_min_months(monthly_rd_df, min_months=6):
     return monthly_rd_df[monthly_rd_df["ticker"].isin(valid_tickers)]
 
 
-def construct_cds_portfolios(monthly_returns, rd_df):
+def construct_cds_portfolios(monthly_returns, rd_df, start=None, end=None):
     """
-    Construct 20 portfolios sorted by the first trading day's CDS spread.
+    Construct 20 portfolios sorted by the first trading day's CDS spread, for the months from
+    `start` to `end` (all months when None).
     """
+    if start is not None or end is not None:
+        # Breakpoints are formed month by month, so other months can be dropped up front
+        monthly_returns = monthly_returns[in_months(monthly_returns["yyyymm"], start, end)]
+        rd_df = rd_df[in_months(rd_df["yyyymm"], start, end)]
+
     # Get the first trading day of each month
     first_day_spread = rd_df.groupby(["ticker", "yyyymm"]).first()["spread"].reset_index()
 
@@ -86,6 +186,158 @@ def construct_cds_portfolios(monthly_returns, rd_df):
     return final_portfolio_returns
 
 
+def quantile_buckets(values, starts, n_buckets=20):
+    """
+    Bucket numbers `1..n_buckets` of `values`, sorted ascending within each group of rows
+    beginning at `starts`, equal to `pd.qcut(group, n_buckets, labels=False) + 1` per group.
+
+    The breakpoints replicate numpy's linear percentile (which `pd.qcut` calls) operation by
+    operation, so ties at a breakpoint land in the same bucket. Where `pd.qcut` would raise on
+    duplicate breakpoints the affected buckets are simply left empty.
+    """
+    values = np.asarray(values, dtype=float)
+    starts = np.asarray(starts)
+    sizes = np.diff(np.r_[starts, len(values)])
+    group = np.repeat(np.arange(len(starts)), sizes)
+    # pd.qcut asks np.percentile for `quantiles * 100`, which divides by 100 again
+    quantiles = np.linspace(0, 1, n_buckets + 1) * 100 / 100
+
+    buckets = np.ones(len(values), dtype=np.int64)
+    for q in quantiles[1:-1]:
+        position = (sizes - 1) * q
+        below = np.floor(position)
+        lower = values[starts + below.astype(np.int64)]
+        upper = values[starts + np.minimum(below.astype(np.int64) + 1, sizes - 1)]
+        gamma = position - below
+        step = upper - lower
+        edge = np.where(gamma >= 0.5, upper - step * (1 - gamma), lower + step * gamma)
+        # Bins are closed on the right: a value equal to a breakpoint stays below it
+        buckets += values > edge[group]
+    return buckets
+
+
+def construct_rebalanced_portfolios(
+    daily_df, frequency="daily", signal_lag=PORTFOLIO_SIGNAL_LAG, n_portfolios=20, spread_max=None, tickers=None
+):
+    """
+    Equal-weighted spread-sorted portfolios rebalanced every trading day, week (Monday to
+    Sunday) or calendar month.
+
+    At the first trading day of each period, tickers are ranked into `n_portfolios` quantiles
+    of the spread quoted `signal_lag` observations earlier (0 uses that day's spread, which for
+    daily rebalancing overlaps the return it sorts), and held for the rest of the period with
+    their compounded daily returns. Rows with a missing return or `spread >= spread_max` are
+    dropped first. Every ticker enters the ranking; only `tickers` (all when None) enter the
+    portfolio returns, as with the minimum-months screen in `construct_cds_portfolios`.
+
+    All periods are ranked at once over the date-sorted table of ticker-periods with
+    `quantile_buckets`, so the cost is a few sorts of the panel rather than one `pd.qcut` per
+    date. Returns `trade_date` (the period's first trading day) or, for monthly rebalancing,
+    `yyyymm`, with `portfolio` and the period return in `daily_return`. With `signal_lag=0`
+    the monthly output equals `construct_cds_portfolios` on `calc_monthly_panel`.
+    """
+    if frequency not in REBALANCE_FREQUENCIES:
+        raise ValueError(f"Unknown rebalancing frequency {frequency!r}; expected one of {REBALANCE_FREQUENCIES}")
+
+    keep = daily_df["daily_return"].notna().to_numpy()
+    if spread_max is not None:
+        keep &= (daily_df["spread"] < spread_max).to_numpy()
+    panel = sort_panel(daily_df.loc[keep, ["ticker", "trade_date", "spread", "daily_return"]].reset_index(drop=True))
+    offsets = ticker_offsets(panel)
+    signal = lag_within_ticker(panel["spread"].to_numpy(), offsets, periods=signal_lag)
+
+    trade_date = pd.DatetimeIndex(panel["trade_date"])
+    days = trade_date.asi8 // (86_400 * 10**9)
+    if frequency == "daily":
+        period = days
+    elif frequency == "weekly":
+        # 1970-01-01 was a Thursday
+        period = days - (days + 3) % 7
+    else:
+        period = trade_date.year.to_numpy() * 100.0 + trade_date.month.to_numpy()
+
+    # One run per ticker-period: the holding period of one position
+    new_run = np.zeros(len(panel), dtype=bool)
+    new_run[offsets["start"].to_numpy()] = True
+    new_run[1:] |= np.diff(period) != 0
+    starts = np.flatnonzero(new_run)
+    runs = pd.DataFrame(
+        {
+            "ticker": panel["ticker"].to_numpy()[starts],
+            "period": period[starts],
+            "first_day": days[starts],
+            "signal": signal[starts],
+            "daily_return": np.multiply.reduceat(1 + panel["daily_return"].to_numpy(dtype=float), starts) - 1,
+        }
+    )
+    runs = runs[~np.isnan(runs["signal"].to_numpy())]
+
+    order = np.lexsort((runs["signal"].to_numpy(), runs["period"].to_numpy()))
+    runs = runs.iloc[order].reset_index(drop=True)
+    period = runs["period"].to_numpy()
+    period_starts = np.flatnonzero(np.r_[True, np.diff(period) != 0])
+    runs["portfolio"] = quantile_buckets(runs["signal"].to_numpy(), period_starts, n_portfolios)
+
+    if frequency == "monthly":
+        key = "yyyymm"
+        runs = runs.rename(columns={"period": key})
+    else:
+        key = "trade_date"
+        first_day = np.minimum.reduceat(runs["first_day"].to_numpy(), period_starts)
+        runs[key] = np.repeat(first_day, np.diff(np.r_[period_starts, len(runs)])).astype("datetime64[D]").astype(
+            "datetime64[ns]"
+        )
+
+    if tickers is not None:
+        runs = runs[runs["ticker"].isin(tickers)]
+    return runs.groupby([key, "portfolio"])["daily_return"].mean().reset_index()
+
+
+def in_months(yyyymm, start=None, end=None):
+    """
+    Boolean mask of the `yyyymm` month codes from the month of `start` to the month of `end`.
+    """
+    keep = np.ones(len(yyyymm), dtype=bool)
+    if start is not None:
+        keep &= (yyyymm >= generate_month_code(pd.Timestamp(start))).to_numpy()
+    if end is not None:
+        keep &= (yyyymm <= generate_month_code(pd.Timestamp(end))).to_numpy()
+    return keep
+
+
+def month_window(start, end):
+    """
+    The whole calendar months covering `start` to `end`: monthly returns and portfolios are only
+    defined for complete months.
+    """
+    start = pd.Timestamp(start).to_period("M").start_time if start is not None else None
+    end = pd.Timestamp(end).to_period("M").end_time.normalize() if end is not None else None
+    return start, end
+
+
+def write_portfolio(portfolio, data_dir=DATA_DIR):
+    """
+    Save portfolio returns with their content manifest (see `run_diff.py`).
+    """
+    path = data_dir / "portfolio_return.parquet"
+    portfolio.to_parquet(path)
+    write_manifest(portfolio, path, "portfolio")
+
+
+def write_portfolio_window(portfolio, start, end, data_dir=DATA_DIR):
+    """
+    Replace the months from `start` to `end` of `portfolio_return.parquet` with `portfolio`,
+    keeping the other months.
+    """
+    path = data_dir / "portfolio_return.parquet"
+    if path.exists():
+        existing = pd.read_parquet(path)
+        existing = existing[~in_months(existing["yyyymm"], start, end)]
+        portfolio = pd.concat([existing, portfolio], ignore_index=True)
+        portfolio = portfolio.sort_values(["yyyymm", "portfolio"], kind="stable").reset_index(drop=True)
+    write_portfolio(portfolio, data_dir)
+
+
 def pivot_table(portfolio):
     df_pivot = portfolio.pivot(index='yyyymm', columns='portfolio', values='daily_return')
     df_pivot.columns = [f"CDS_{str(col).zfill(2)}" for col in df_pivot.columns]
@@ -99,19 +351,22 @@ def load_portfolio(data_dir=DATA_DIR):
 
 
 if __name__ == "__main__":
-    daily_return_df = load_cds_return()
+    # Only the compact ticker-month table is ever held in memory
+    monthly_return_df = load_monthly_panel(spread_max=0.5)
 
-    daily_return_df = daily_return_df[daily_return_df["spread"] < 0.5]
-
-    daily_return_df = create_yyyymm_col(daily_return_df)
-
-    monthly_return_df = calc_cds_monthly_return(daily_return_df)
-    
     #optional
-    monthly_return_df = filter_tickers_by_min_months(monthly_return_df, min_months=6)
-
-    portfolio = construct_cds_portfolios(monthly_return_df,daily_return_df)
+    filtered_monthly_df = filter_tickers_by_min_months(monthly_return_df, min_months=6)
 
-    portfolio.to_parquet(DATA_DIR / "portfolio_return.parquet")
+    # Portfolio breakpoints use every ticker's first-day spread, as before the filter
+    portfolio = construct_cds_portfolios(filtered_monthly_df, monthly_return_df)
 
+    write_portfolio(portfolio)
 
+    # Higher-frequency rebalancing, ranked on the daily panel
+    if PORTFOLIO_FREQUENCIES:
+        daily_df = load_cds_return(columns=["ticker", "trade_date", "spread", "daily_return"])
+        for frequency in PORTFOLIO_FREQUENCIES:
+            rebalanced = construct_rebalanced_portfolios(
+                daily_df, frequency, spread_max=0.5, tickers=filtered_monthly_df["ticker"].unique()
+            )
+            rebalanced.to_parquet(DATA_DIR / f"portfolio_return_{frequency}.parquet")
@@ -0,0 +1,278 @@
+"""
+This script runs the return pipeline (RD, daily returns, monthly compounding and the 20 spread-sorted
+portfolios) as a Dask task graph, on a local cluster or on a cluster scheduler.
+
+The Markit panel is split into partitions of contiguous ticker ranges ("buckets") and calendar years.
+The discount table is small (one row per trade date), so it is built once and broadcast to every
+worker. Each partition computes RD and lags on its own rows; the one value a partition cannot see,
+the previous observation of each ticker before January, is carried forward from the preceding years
+of the same bucket. Monthly panels are formed per partition, tickers are screened per bucket, and
+portfolios are sorted per year across buckets. Workers hold their results in memory and spill them to
+`DASK_LOCAL_DIR` under memory pressure (Dask's spill threshold is 70% of each worker's memory limit).
+
+Dask is optional: it is imported only when a client is created. With `DASK_SCHEDULER_ADDRESS` unset a
+`LocalCluster` is started; set it to a scheduler address (e.g. one started by `dask-jobqueue` under
+SLURM) to run the same graph on a cluster, with this `src` directory on the workers' `PYTHONPATH`.
+
+Functions include:
+- `get_client`: Connects to a scheduler or starts a `LocalCluster`.
+- `ticker_ranges`: Splits the sorted tickers into contiguous buckets.
+- `split_markit`, `markit_read_specs`: Partition an in-memory panel, or the Markit files, by bucket and year.
+- `compute_returns_distributed`: Builds and runs the task graph; returns daily, monthly and portfolio tables.
+"""
+
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from settings import config
+from calc_cds_daily_return import calc_cds_daily_return, calc_panel_RD, rd_discount_table
+from create_portfolio import calc_monthly_panel, construct_cds_portfolios, filter_tickers_by_min_months, write_portfolio
+from panel_layout import sort_panel
+
+DATA_DIR = Path(config("DATA_DIR"))
+START_YEAR = config("START_YEAR")
+END_YEAR = config("END_YEAR")
+DASK_SCHEDULER_ADDRESS = config("DASK_SCHEDULER_ADDRESS", default="")
+DASK_LOCAL_DIR = Path(config("DASK_LOCAL_DIR", default=DATA_DIR / "dask-worker-space"))
+DASK_TICKER_BUCKETS = config("DASK_TICKER_BUCKETS", default=16, cast=int)
+
+
+def get_client(address=DASK_SCHEDULER_ADDRESS, n_workers=None, memory_limit="auto", local_directory=DASK_LOCAL_DIR, processes=True):
+    """
+    Connect to the scheduler at `address`, or start a `LocalCluster` (one thread per worker) when it is
+    empty. Closing the client also shuts down a cluster it started.
+    """
+    from dask.distributed import Client
+
+    if address:
+        return Client(address)
+    Path(local_directory).mkdir(parents=True, exist_ok=True)
+    return Client(
+        n_workers=n_workers,
+        threads_per_worker=1,
+        processes=processes,
+        memory_limit=memory_limit,
+        local_directory=str(local_directory),
+    )
+
+
+def ticker_ranges(tickers, n_buckets=DASK_TICKER_BUCKETS):
+    """
+    Split the distinct `tickers` in sorted order into at most `n_buckets` contiguous `(first, last)` ranges.
+    """
+    tickers = np.unique(np.asarray(tickers, dtype=str))
+    return [(chunk[0], chunk[-1]) for chunk in np.array_split(tickers, min(n_buckets, len(tickers))) if len(chunk)]
+
+
+def split_markit(markit, n_buckets=DASK_TICKER_BUCKETS):
+    """
+    Partition an in-memory Markit panel into `{(bucket, year): DataFrame}`.
+    """
+    ticker = markit["ticker"].astype(str)
+    year = pd.DatetimeIndex(markit["trade_date"]).year
+    partitions = {}
+    for bucket, (first, last) in enumerate(ticker_ranges(ticker, n_buckets)):
+        in_bucket = ((ticker >= first) & (ticker <= last)).to_numpy()
+        for value in np.unique(year[in_bucket]):
+            partitions[(bucket, int(value))] = markit[in_bucket & (year == value)]
+    return partitions
+
+
+def _markit_paths(data_dir, start_year, end_year):
+    """
+    Markit files and the year each holds (None for the single-file pull), in the order `calc_cds_daily_return` prefers.
+    """
+    path = data_dir / "Markit_CDS.parquet"
+    if path.exists():
+        return [(path, None)]
+    return [(data_dir / f"markit_cds{year}.parquet", year) for year in range(int(start_year), int(end_year) + 1)]
+
+
+def markit_read_specs(data_dir=DATA_DIR, n_buckets=DASK_TICKER_BUCKETS, start_year=START_YEAR, end_year=END_YEAR, region=None):
+    """
+    Partition the Markit files into `{(bucket, year): (path, filters)}` read specs, so every worker
+    reads only its own ticker range and year (and `region`, when given) straight from Parquet.
+    """
+    paths = _markit_paths(data_dir, start_year, end_year)
+    tickers = np.concatenate([pd.read_parquet(path, columns=["ticker"])["ticker"].to_numpy() for path, _ in paths])
+    region_filter = [("region", "==", region)] if region is not None else []
+
+    specs = {}
+    for bucket, (first, last) in enumerate(ticker_ranges(tickers, n_buckets)):
+        ticker_filter = [("ticker", ">=", first), ("ticker", "<=", last)]
+        for path, year in paths:
+            years = [year] if year is not None else range(int(start_year), int(end_year) + 1)
+            for value in years:
+                date_filter = [] if year is not None else [
+                    ("trade_date", ">=", pd.Timestamp(value, 1, 1)),
+                    ("trade_date", "<", pd.Timestamp(value + 1, 1, 1)),
+                ]
+                specs[(bucket, value)] = (path, ticker_filter + date_filter + region_filter)
+    return specs
+
+
+def _lag_keys(df):
+    return ["tenor", "ticker"] if "tenor" in df.columns else ["ticker"]
+
+
+def _partition_rd(source, discount):
+    """
+    RD for one partition, with lags computed within the partition.
+    """
+    if isinstance(source, pd.DataFrame):
+        part = source.copy()
+    else:
+        path, filters = source
+        part = pd.read_parquet(path, filters=filters)
+    if "region" in part.columns:
+        part = part.drop(columns="region")
+    return calc_panel_RD(part.reset_index(drop=True), discount)
+
+
+def _partition_tail(rd_df):
+    """
+    Last RD and spread of every ticker (and tenor) in a partition.
+    """
+    keys = _lag_keys(rd_df)
+    tail = rd_df.drop_duplicates(keys, keep="last")[[*keys, "RD", "spread"]]
+    return tail.astype({key: str for key in keys}).reset_index(drop=True)
+
+
+def _carry_forward(carry, tail):
+    """
+    Last observation per ticker up to the end of the partition that produced `tail`.
+    """
+    if carry is None:
+        return tail
+    keys = [col for col in ["tenor", "ticker"] if col in tail.columns]
+    return pd.concat([carry, tail], ignore_index=True).drop_duplicates(keys, keep="last").reset_index(drop=True)
+
+
+def _partition_returns(rd_df, carry):
+    """
+    Daily returns of one partition, filling the first lag of each ticker from the previous years.
+    """
+    if carry is not None and len(rd_df):
+        keys = _lag_keys(rd_df)
+        first = ~rd_df.duplicated(keys).to_numpy()
+        previous = rd_df.loc[first, keys].astype(str).merge(carry, on=keys, how="left")
+        rd_df.loc[first, "RD_prev"] = previous["RD"].to_numpy()
+        rd_df.loc[first, "spread_prev"] = previous["spread"].to_numpy()
+    return calc_cds_daily_return(rd_df)
+
+
+def _partition_monthly(daily, spread_max):
+    """
+    Monthly panel of one partition on the 5Y tenor, and the trade dates it covers.
+    """
+    if "tenor" in daily.columns:
+        daily = daily[daily["tenor"] == "5Y"].drop(columns="tenor")
+    return calc_monthly_panel(daily, spread_max=spread_max), pd.unique(daily["trade_date"])
+
+
+def _valid_tickers(monthly_parts, min_months):
+    """
+    Tickers of one bucket with at least `min_months` months; a ticker never spans two buckets.
+    """
+    monthly = pd.concat([part for part, _ in monthly_parts], ignore_index=True)
+    return filter_tickers_by_min_months(monthly, min_months=min_months)["ticker"].unique()
+
+
+def _year_portfolios(monthly_parts, valid_tickers):
+    """
+    Monthly panel and portfolio returns of one year across all buckets.
+    """
+    monthly = pd.concat([part for part, _ in monthly_parts], ignore_index=True)
+    # Coverage is relative to the trading days of the whole panel, not of one bucket
+    dates = pd.DatetimeIndex(np.unique(np.concatenate([dates for _, dates in monthly_parts])))
+    trading_days = pd.Series(dates.year * 100.0 + dates.month).value_counts()
+    monthly["coverage"] = monthly["n_obs"] / trading_days.reindex(monthly["yyyymm"]).to_numpy()
+
+    filtered = monthly[monthly["ticker"].isin(np.concatenate(valid_tickers))]
+    return monthly, construct_cds_portfolios(filtered, monthly)
+
+
+def compute_returns_distributed(client, partitions, curve, tenors=None, spread_max=0.5, min_months=6, return_daily=True):
+    """
+    Run the return pipeline over `partitions` (from `split_markit` or `markit_read_specs`) on `client`.
+
+    `curve` is the `DiscountCurve` of the panel's trade dates and `tenors` the panel's tenors (None for
+    the single 5Y panel). Returns a dictionary with the `daily` returns (canonical order; only when
+    `return_daily`), the `monthly` ticker-month panel and the `portfolio` returns, equal to running
+    `compute_daily_returns` and the `create_portfolio` steps in a single process.
+    """
+    [discount] = client.scatter([rd_discount_table(curve, tenors)], broadcast=True)
+    buckets = sorted({bucket for bucket, _ in partitions})
+    years = sorted({year for _, year in partitions})
+
+    daily, monthly = {}, {}
+    for bucket in buckets:
+        carry = None
+        for year in years:
+            if (bucket, year) not in partitions:
+                continue
+            source = partitions[(bucket, year)]
+            if isinstance(source, pd.DataFrame):
+                source = client.scatter(source)
+            rd = client.submit(_partition_rd, source, discount)
+            daily[(bucket, year)] = client.submit(_partition_returns, rd, carry)
+            monthly[(bucket, year)] = client.submit(_partition_monthly, daily[(bucket, year)], spread_max)
+            carry = client.submit(_carry_forward, carry, client.submit(_partition_tail, rd))
+
+    valid = [
+        client.submit(_valid_tickers, [monthly[key] for key in monthly if key[0] == bucket], min_months)
+        for bucket in buckets
+    ]
+    by_year = [
+        client.submit(_year_portfolios, [monthly[key] for key in monthly if key[1] == year], valid)
+        for year in years
+        if any(key[1] == year for key in monthly)
+    ]
+
+    results = client.gather(by_year)
+    output = {
+        "monthly": pd.concat([panel for panel, _ in results], ignore_index=True),
+        "portfolio": pd.concat([portfolio for _, portfolio in results], ignore_index=True),
+    }
+    if return_daily:
+        output["daily"] = sort_panel(pd.concat(client.gather(list(daily.values())), ignore_index=True))
+    return output
+
+
+def main():
+    import pyarrow.parquet as pq
+
+    from calc_cds_daily_return import DiscountCurve, region_rf_data, write_cds_return, write_cds_return_by_tenor
+    from pull_markit import CDS_TENORS
+
+    paths = _markit_paths(DATA_DIR, START_YEAR, END_YEAR)
+    schema = pq.read_schema(paths[0][0]).names
+    # Like calc_cds_daily_return.py, this script computes the US panel
+    region = "US" if "region" in schema else None
+    tenors = CDS_TENORS if "tenor" in schema else None
+
+    trade_dates = pd.concat(
+        [pd.read_parquet(path, columns=["trade_date"], filters=[("region", "==", region)] if region else None) for path, _ in paths],
+        ignore_index=True,
+    )
+    curve = DiscountCurve.from_rf_data(region_rf_data(trade_dates, "US", tenors=tenors))
+    curve.save(DATA_DIR / "discount_curve.npz")
+
+    with get_client() as client:
+        specs = markit_read_specs(DATA_DIR, region=region)
+        result = compute_returns_distributed(client, specs, curve, tenors)
+
+    daily = result["daily"]
+    if "tenor" in daily.columns:
+        write_cds_return_by_tenor(daily)
+        if (daily["tenor"] == "5Y").any():
+            write_cds_return(daily[daily["tenor"] == "5Y"].drop(columns="tenor").reset_index(drop=True))
+    else:
+        write_cds_return(daily)
+    write_portfolio(result["portfolio"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+"""
+This module puts the pipeline's external inputs (WRDS SQL queries and HTTP downloads from the
+Federal Reserve and FRED) behind one pluggable data-source interface with three backends:
+
+- `live`: Talks to WRDS and the web, as the pull scripts always did.
+- `record`: Same as `live`, but also captures every query/response pair into compressed local fixtures.
+- `replay`: Serves previously recorded fixtures and never touches the network.
+
+The backend is chosen with `DATA_SOURCE_MODE` (`live` by default) and fixtures live in
+`DATA_SOURCE_FIXTURE_DIR` (`MANUAL_DATA_DIR/fixtures` by default). Each request is keyed by a hash
+of its whitespace-normalized SQL text or its URL; SQL results are stored as zstd-compressed Parquet,
+HTTP bodies as gzip, each with a small JSON file holding the original request for inspection.
+
+Record once with network access, for example
+`DATA_SOURCE_MODE=record python src/pull_markit.py`, then run the pipeline and the test suite
+hermetically with `DATA_SOURCE_MODE=replay`.
+
+Functions and classes include:
+- `LiveSource`, `RecordingSource`, `ReplaySource`: The three backends.
+- `get_data_source`: Builds the backend for a mode (defaults from the configuration).
+- `request_key`: The fixture key of a SQL query or URL.
+
+Tests that pull through the configured source run only when `DATA_SOURCE_MODE` is set explicitly
+(see `src/conftest.py`); CI replays the small fixtures committed under `data_manual/fixtures`.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+from pathlib import Path
+
+import pandas as pd
+
+from settings import config
+
+MANUAL_DATA_DIR = Path(config("MANUAL_DATA_DIR"))
+DATA_SOURCE_MODE = config("DATA_SOURCE_MODE", default="live")
+DATA_SOURCE_FIXTURE_DIR = Path(config("DATA_SOURCE_FIXTURE_DIR", default=MANUAL_DATA_DIR / "fixtures"))
+
+MODES = ("live", "record", "replay")
+
+
+def request_key(kind, request):
+    """
+    Fixture key of a request: `kind` (`sql` or `http`) and a hash of the request text.
+    SQL whitespace is normalized so reindenting a query does not invalidate its fixture.
+    """
+    if kind == "sql":
+        request = " ".join(request.split())
+    return hashlib.sha256(f"{kind}\n{request}".encode()).hexdigest()[:32]
+
+
+def _atomic_write_bytes(path, payload):
+    tmp_path = path.with_name(path.name + ".tmp")
+    tmp_path.write_bytes(payload)
+    os.replace(tmp_path, path)
+
+
+class LiveSource:
+    """
+    Backend that queries WRDS and downloads over HTTP.
+    """
+
+    mode = "live"
+
+    def connect_wrds(self, wrds_username):
+        import wrds
+
+        return wrds.Connection(wrds_username=wrds_username)
+
+    def http_get(self, url):
+        import requests
+
+        response = requests.get(url)
+        response.raise_for_status()
+        return response.content
+
+
+class _RecordingConnection:
+    def __init__(self, source, connection):
+        self.source = source
+        self.connection = connection
+
+    def raw_sql(self, query, **kwargs):
+        df = self.connection.raw_sql(query, **kwargs)
+        self.source.save_sql(query, df)
+        return df
+
+    def close(self):
+        self.connection.close()
+
+
+class RecordingSource:
+    """
+    Backend that forwards to another source (live by default) and records each response.
+    """
+
+    mode = "record"
+
+    def __init__(self, fixture_dir=DATA_SOURCE_FIXTURE_DIR, inner=None):
+        self.fixture_dir = Path(fixture_dir)
+        self.inner = inner or LiveSource()
+
+    def _paths(self, kind, request):
+        key = request_key(kind, request)
+        suffix = ".parquet" if kind == "sql" else ".bin.gz"
+        directory = self.fixture_dir / kind
+        return directory / f"{key}{suffix}", directory / f"{key}.json"
+
+    def save_sql(self, query, df):
+        path, meta_path = self._paths("sql", query)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.name + ".tmp")
+        df.to_parquet(tmp_path, compression="zstd")
+        os.replace(tmp_path, path)
+        _atomic_write_bytes(meta_path, json.dumps({"kind": "sql", "request": query, "rows": len(df)}).encode())
+
+    def save_http(self, url, payload):
+        path, meta_path = self._paths("http", url)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        _atomic_write_bytes(path, gzip.compress(payload))
+        _atomic_write_bytes(meta_path, json.dumps({"kind": "http", "request": url, "bytes": len(payload)}).encode())
+
+    def connect_wrds(self, wrds_username):
+        return _RecordingConnection(self, self.inner.connect_wrds(wrds_username))
+
+    def http_get(self, url):
+        payload = self.inner.http_get(url)
+        self.save_http(url, payload)
+        return payload
+
+
+class _ReplayConnection:
+    def __init__(self, source):
+        self.source = source
+
+    def raw_sql(self, query, **kwargs):
+        return self.source.load_sql(query)
+
+    def close(self):
+        pass
+
+
+class ReplaySource(RecordingSource):
+    """
+    Backend that serves recorded fixtures without any network access.
+    """
+
+    mode = "replay"
+
+    def __init__(self, fixture_dir=DATA_SOURCE_FIXTURE_DIR):
+        self.fixture_dir = Path(fixture_dir)
+
+    def _fixture(self, kind, request):
+        path, _ = self._paths(kind, request)
+        if not path.exists():
+            raise FileNotFoundError(
+                f"No recorded {kind} fixture for {request[:200]!r} in {self.fixture_dir}; "
+                "run once with DATA_SOURCE_MODE=record to capture it."
+            )
+        return path
+
+    def load_sql(self, query):
+        return pd.read_parquet(self._fixture("sql", query))
+
+    def connect_wrds(self, wrds_username):
+        return _ReplayConnection(self)
+
+    def http_get(self, url):
+        return gzip.decompress(self._fixture("http", url).read_bytes())
+
+
+def get_data_source(mode=None, fixture_dir=None):
+    """
+    Build the data source for `mode` (`live`, `record` or `replay`; `DATA_SOURCE_MODE` when None).
+    """
+    mode = mode or DATA_SOURCE_MODE
+    fixture_dir = fixture_dir or DATA_SOURCE_FIXTURE_DIR
+    if mode == "live":
+        return LiveSource()
+    if mode == "record":
+        return RecordingSource(fixture_dir)
+    if mode == "replay":
+        return ReplaySource(fixture_dir)
+    raise ValueError(f"Unknown DATA_SOURCE_MODE {mode!r}; expected one of {MODES}")
@@ -0,0 +1,168 @@
+"""
+This module runs time-series factor regressions of the CDS portfolios on the He-Kelly-Manela factors.
+
+The wide He-Kelly-Manela CSV (factors plus hundreds of test-asset columns) is converted once into a
+columnar Parquet cache in `DATA_DIR`, rebuilt whenever the CSV changes, so each consumer reads only
+the columns it projects. Regressions of all 20 replicated and 20 original portfolios on a factor set
+are solved as one multi-target least-squares problem. Rolling and expanding betas are served from
+prefix sums of the cross-products x x' and x y': every window and every factor subset is a difference
+of two prefix sums followed by a small batched solve, so hundreds of window/factor combinations cost
+one pass over the data.
+
+Functions include:
+- `load_hkm_columns`: Reads projected columns of the He-Kelly-Manela data from the Parquet cache.
+- `load_factor_panel`: Aligns replicated and original CDS portfolios with a set of factors.
+- `ols`: Multi-target OLS with coefficients, t-statistics and R-squared for every target.
+- `rolling_betas`: Rolling and expanding regression coefficients for many windows and factor sets.
+"""
+
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from settings import config
+from misc_tools import month_code_to_date
+
+DATA_DIR = Path(config("DATA_DIR"))
+MANUAL_DATA_DIR = Path(config("MANUAL_DATA_DIR"))
+
+HKM_FILE = "He_Kelly_Manela_Factors_And_Test_Assets_monthly.csv"
+HKM_CACHE = "he_kelly_manela_monthly.parquet"
+HKM_FACTORS = ["intermediary_capital_risk_factor", "mkt_rf", "smb", "hml"]
+CDS_COLUMNS = [f"CDS_{i:02d}" for i in range(1, 21)]
+
+# Factor sets reported by `main`
+FACTOR_SETS = {
+    "intermediary": ["mkt_rf", "intermediary_capital_risk_factor"],
+    "ff3": ["mkt_rf", "smb", "hml"],
+}
+
+
+def hkm_cache(data_dir=DATA_DIR, manual_data_dir=MANUAL_DATA_DIR):
+    """
+    Path of the Parquet cache of the He-Kelly-Manela CSV, (re)built if missing or older than the CSV.
+    """
+    source = manual_data_dir / HKM_FILE
+    path = data_dir / HKM_CACHE
+    if not path.exists() or path.stat().st_mtime_ns < source.stat().st_mtime_ns:
+        tmp_path = path.with_name(path.name + ".tmp")
+        pd.read_csv(source).to_parquet(tmp_path, index=False)
+        tmp_path.replace(path)
+    return path
+
+
+def load_hkm_columns(columns, data_dir=DATA_DIR, manual_data_dir=MANUAL_DATA_DIR):
+    """
+    Read `columns` of the He-Kelly-Manela data indexed by month, only rows where all are present.
+    """
+    df = pd.read_parquet(hkm_cache(data_dir, manual_data_dir), columns=["yyyymm", *columns]).dropna()
+    df.index = pd.to_datetime([month_code_to_date(code) for code in df.pop("yyyymm")])
+    df.index.name = "yyyymm"
+    return df
+
+
+def load_factor_panel(replicated, factors, data_dir=DATA_DIR, manual_data_dir=MANUAL_DATA_DIR):
+    """
+    Align the replicated pivot table (yyyymm-coded index, `CDS_<k>` columns) with the original
+    CDS portfolios and `factors` on common months. Returns `(targets, factor_returns)` where the
+    targets carry `replicated_CDS_<k>` and `actual_CDS_<k>` columns.
+    """
+    from rolling_correlation import align_portfolio_returns
+
+    hkm = load_hkm_columns([*CDS_COLUMNS, *factors], data_dir, manual_data_dir)
+    replicated, actual = align_portfolio_returns(replicated, hkm[CDS_COLUMNS])
+    targets = pd.concat([replicated.add_prefix("replicated_"), actual.add_prefix("actual_")], axis=1)
+    return targets, hkm.loc[targets.index, list(factors)]
+
+
+def _design(x, add_constant):
+    x = np.asarray(x, dtype=float)
+    if add_constant:
+        x = np.column_stack([np.ones(len(x)), x])
+    return x
+
+
+def ols(targets, factors, add_constant=True):
+    """
+    Regress every column of `targets` (T x K) on `factors` (T x F) in one least-squares solve.
+
+    Returns a dictionary of DataFrames indexed by target: `"params"` and `"tvalues"` (columns
+    `const` and the factor names) and `"fit"` (`r2` and `n_obs`). Standard errors assume
+    homoskedastic errors, like `statsmodels.OLS` without a covariance option.
+    """
+    y = targets.to_numpy(dtype=float)
+    x = _design(factors, add_constant)
+    names = (["const"] if add_constant else []) + list(factors.columns)
+    n_obs, n_params = x.shape
+
+    coefficients, _, _, _ = np.linalg.lstsq(x, y, rcond=None)
+    residuals = y - x @ coefficients
+    sigma2 = (residuals ** 2).sum(axis=0) / (n_obs - n_params)
+    xtx_inv_diag = np.diag(np.linalg.inv(x.T @ x))
+    tvalues = coefficients / np.sqrt(xtx_inv_diag[:, None] * sigma2[None, :])
+    total = ((y - y.mean(axis=0)) ** 2).sum(axis=0)
+    r2 = 1 - (residuals ** 2).sum(axis=0) / total
+
+    index = pd.Index(targets.columns, name="target")
+    return {
+        "params": pd.DataFrame(coefficients.T, index=index, columns=names),
+        "tvalues": pd.DataFrame(tvalues.T, index=index, columns=names),
+        "fit": pd.DataFrame({"r2": r2, "n_obs": n_obs}, index=index),
+    }
+
+
+def rolling_betas(targets, factors, windows, factor_sets=None, add_constant=True, min_periods=None):
+    """
+    Rolling (and expanding, for a window of `None`) OLS coefficients of every target on every
+    factor set, from one set of prefix sums of the cross-products.
+
+    `factor_sets` is a list of lists of factor names (all factors together when None). Returns a
+    dictionary keyed by `(tuple(factor_set), window)` with arrays of shape (T, 1 + F, K) (without
+    the leading constant when `add_constant=False`); row t uses the window ending at t, and rows
+    before the first full window (or `min_periods` observations when expanding) are NaN.
+    """
+    y = targets.to_numpy(dtype=float)
+    x = _design(factors, add_constant)
+    n_obs = len(x)
+    offset = 1 if add_constant else 0
+    factor_sets = factor_sets or [list(factors.columns)]
+    positions = {name: k + offset for k, name in enumerate(factors.columns)}
+
+    # Prefix sums with a leading zero row: sums over rows [a, b) are S[b] - S[a]
+    sxx = np.concatenate([np.zeros((1, x.shape[1], x.shape[1])), np.cumsum(x[:, :, None] * x[:, None, :], axis=0)])
+    sxy = np.concatenate([np.zeros((1, x.shape[1], y.shape[1])), np.cumsum(x[:, :, None] * y[:, None, :], axis=0)])
+
+    results = {}
+    for factor_set in factor_sets:
+        columns = ([0] if add_constant else []) + [positions[name] for name in factor_set]
+        xx = sxx[:, columns][:, :, columns]
+        xy = sxy[:, columns]
+        for window in windows:
+            first = window if window is not None else (min_periods or len(columns))
+            betas = np.full((n_obs, len(columns), y.shape[1]), np.nan)
+            if first <= n_obs:
+                ends = np.arange(first, n_obs + 1)
+                starts = ends - window if window is not None else np.zeros_like(ends)
+                betas[ends - 1] = np.linalg.solve(xx[ends] - xx[starts], xy[ends] - xy[starts])
+            results[(tuple(factor_set), window)] = betas
+    return results
+
+
+def main():
+    from create_portfolio import load_portfolio, pivot_table
+
+    all_factors = sorted({factor for factors in FACTOR_SETS.values() for factor in factors})
+    targets, factor_returns = load_factor_panel(pivot_table(load_portfolio()), all_factors)
+    tables = []
+    for name, factors in FACTOR_SETS.items():
+        result = ols(targets, factor_returns[factors])
+        table = result["params"].join(result["tvalues"], rsuffix="_t").join(result["fit"])
+        tables.append(table.assign(factor_set=name).reset_index())
+    regressions = pd.concat(tables, ignore_index=True)
+    regressions.to_parquet(DATA_DIR / "factor_regressions.parquet", index=False)
+    print(regressions[["factor_set", "target", "const", "mkt_rf", "r2"]].to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -7,115 +7,127 @@ This script processes CDS return data, generates LaTeX tables, and creates plots
 3. Graph 1: Plot of all CDS portfolio returns over time.
 4. Graph 2: Compare specific CDS portfolio returns (e.g., "CDS_10") to actual CDS returns (2001-2012).
 5. Graph 3: Post-2012 CDS portfolio vs government bonds comparison.
-6. Graph 4: Rolling window correlations of CDS returns (future work).
+6. Graph 4: Rolling window correlations of replicated vs actual CDS portfolios.
 
 ### Outputs:
 - LaTeX tables and PNG plots for CDS portfolio returns and comparisons.
+
+Each table and figure is declared as an `ArtifactUnit` (see `artifacts.py`): shared data is
+loaded once, units render in parallel, and a unit is skipped when its input slice and
+rendering code are unchanged since the last run.
+
+Importing this module has no side effects; run it as a script or call `main()`.
 """
 
 import pandas as pd
-import numpy as np
 
-import matplotlib.pyplot as plt
-import seaborn as sns
 from misc_tools import month_code_to_date
-from pull_cds_return_data import *
+from pull_cds_return_data import load_real_cds_return
 from settings import config
 from pathlib import Path
-from create_portfolio import *
+from calc_cds_daily_return import load_cds_return
+from create_portfolio import calc_cds_monthly_return, create_yyyymm_col, load_portfolio, pivot_table
+from artifacts import ArtifactUnit, render_artifacts
+from rolling_correlation import align_portfolio_returns, ewm_cross_moments, matched_correlation, rolling_cross_moments
 import datetime
 DATA_DIR = Path(config("DATA_DIR"))
 OUTPUT_DIR = Path(config("OUTPUT_DIR"))
 
 
-## Suppress scientific notation and limit to 3 decimal places
-# Sets display, but doesn't affect formatting to LaTeX
-pd.set_option('display.float_format', lambda x: '%.5f' % x)
 # Sets format for printing to LaTeX
 float_format_func = lambda x: '{:.5f}'.format(x)
 
-### Table 1: Replicated CDS portfolios Snapshot
-df = load_portfolio()
-df = pivot_table(df).iloc[1:]
-df_subset = df.iloc[:5, :10]
-df_subset.index = df_subset.index.astype(int)
-df_subset = df_subset.reset_index()
-latex_table_string = df_subset.to_latex(float_format=float_format_func, escape=True)
 
-print(latex_table_string)
+def write_table1_replicated_cds(portfolio, output_dir=OUTPUT_DIR):
+    """
+    Table 1: Replicated CDS portfolios Snapshot
+    """
+    df = pivot_table(portfolio).iloc[1:]
+    df_subset = df.iloc[:5, :10]
+    df_subset.index = df_subset.index.astype(int)
+    df_subset = df_subset.reset_index()
+    latex_table_string = df_subset.to_latex(float_format=float_format_func, escape=True)
 
-path = OUTPUT_DIR / f'latex_table1_replicated_cds.tex'
-with open(path, "w") as text_file:
-    text_file.write(latex_table_string)
+    print(latex_table_string)
 
-## Table 2: Replicated CDS portfolios Summary Statistics 
-# the montly return of each CDS, not portfolio
-cds = load_cds_return()
-cds2012 = cds[cds["trade_date"] < "2013-01-01"]
-monthly_return = calc_cds_monthly_return(create_yyyymm_col(cds2012))
-monthly_return_summary = monthly_return.describe()["daily_return"].to_frame()
-monthly_return_summary = monthly_return_summary.rename(columns={"daily_return": "monthly_return"})[1:]
-monthly_return_summary.index = ["mean","std","min","0.25","0.5","0.75","max"]
+    path = output_dir / f'latex_table1_replicated_cds.tex'
+    with open(path, "w") as text_file:
+        text_file.write(latex_table_string)
 
-latex_table_string = monthly_return_summary .to_latex(float_format=float_format_func, escape =True)
 
+def write_table2_replicated_summary(cds, output_dir=OUTPUT_DIR):
+    """
+    Table 2: Replicated CDS portfolios Summary Statistics
+    (the monthly return of each CDS, not portfolio)
+    """
+    cds2012 = cds[cds["trade_date"] < "2013-01-01"]
+    monthly_return = calc_cds_monthly_return(create_yyyymm_col(cds2012))
+    monthly_return_summary = monthly_return.describe()["daily_return"].to_frame()
+    monthly_return_summary = monthly_return_summary.rename(columns={"daily_return": "monthly_return"})[1:]
+    monthly_return_summary.index = ["mean","std","min","0.25","0.5","0.75","max"]
 
-path = OUTPUT_DIR / f'latex_table2_replicated_summary.tex'
-with open(path, "w") as text_file:
-    text_file.write(latex_table_string)
+    latex_table_string = monthly_return_summary .to_latex(float_format=float_format_func, escape =True)
 
-## Graph1: ALL cds plot 
-df = load_portfolio()
-df = pivot_table(df).reset_index()
-df["yyyymm"] = df["yyyymm"].apply(month_code_to_date)
-df = df.set_index("yyyymm")
+    path = output_dir / f'latex_table2_replicated_summary.tex'
+    with open(path, "w") as text_file:
+        text_file.write(latex_table_string)
 
-# Remove CDS_20 before plotting
-if "CDS_20" in df.columns:
-    df = df.drop(columns=["CDS_20"])
 
-# Plot
-plt.figure(figsize=(12, 6))
-df.plot(alpha=0.7)  # Plot all CDS series with transparency
+def plot_all_cds_portfolios(portfolio, output_dir=OUTPUT_DIR):
+    """
+    Graph1: ALL cds plot
+    """
+    import matplotlib.pyplot as plt
 
-# Customize the legend to show each CDS series
-plt.legend(title="CDS Portfolios", bbox_to_anchor=(1.05, 1), loc="upper left")
+    df = pivot_table(portfolio).reset_index()
+    df["yyyymm"] = df["yyyymm"].apply(month_code_to_date)
+    df = df.set_index("yyyymm")
 
-plt.title("CDS Portfolio Returns Over Time")
-plt.xlabel("Time")
-plt.ylabel("CDS Value")
-plt.grid(True)
+    # Remove CDS_20 before plotting
+    if "CDS_20" in df.columns:
+        df = df.drop(columns=["CDS_20"])
 
-# Save the figure
-plot_path = OUTPUT_DIR / "cds_portfolio_returns.png"
-plt.savefig(plot_path, dpi=300, bbox_inches="tight")
-plt.close()
+    # Plot
+    plt.figure(figsize=(12, 6))
+    df.plot(alpha=0.7)  # Plot all CDS series with transparency
 
-print(f"Saved plot to: {plot_path}")
+    # Customize the legend to show each CDS series
+    plt.legend(title="CDS Portfolios", bbox_to_anchor=(1.05, 1), loc="upper left")
+
+    plt.title("CDS Portfolio Returns Over Time")
+    plt.xlabel("Time")
+    plt.ylabel("CDS Value")
+    plt.grid(True)
 
+    # Save the figure
+    plot_path = output_dir / "cds_portfolio_returns.png"
+    plt.savefig(plot_path, dpi=300, bbox_inches="tight")
+    plt.close()
 
+    print(f"Saved plot to: {plot_path}")
 
 
-## Graph2: Pre2012: Replicated CDS portfolios vs Actual CDS portfolios
-portfolio = load_portfolio()
-actual_cds = load_real_cds_return()
+def plot_cds_comparison(portfolio, actual_cds, column_to_compare="CDS_10", output_dir=OUTPUT_DIR):
+    """
+    Graph2: Pre2012: Replicated CDS portfolios vs Actual CDS portfolios
+    """
+    import matplotlib.pyplot as plt
 
-# Convert 'yyyymm' to proper date format
-portfolio["yyyymm"] = portfolio["yyyymm"].apply(month_code_to_date)
+    # Convert 'yyyymm' to proper date format
+    portfolio = portfolio.copy()
+    portfolio["yyyymm"] = portfolio["yyyymm"].apply(month_code_to_date)
 
-# Create pivot table
-portfolio_pivot = pivot_table(portfolio)
+    # Create pivot table
+    portfolio_pivot = pivot_table(portfolio)
 
-# Filter the date range
-portfolio_pivot = portfolio_pivot[datetime.date(2001, 1, 1) : datetime.date(2012, 12, 1)]
+    # Filter the date range
+    portfolio_pivot = portfolio_pivot[datetime.date(2001, 1, 1) : datetime.date(2012, 12, 1)]
 
-# Choose the column to compare
-column_to_compare = "CDS_10"
+    # Ensure the column exists in both dataframes
+    if column_to_compare not in actual_cds.columns or column_to_compare not in portfolio_pivot.columns:
+        print(f"Column {column_to_compare} not found in DataFrames.")
+        return
 
-# Ensure the column exists in both dataframes
-if column_to_compare not in actual_cds.columns or column_to_compare not in portfolio_pivot.columns:
-    print(f"Column {column_to_compare} not found in DataFrames.")
-else:
     # Plot comparison
     plt.figure(figsize=(10, 5))
     plt.plot(actual_cds.index, actual_cds[column_to_compare], label="Actual", linestyle='-', marker='o')
@@ -128,10 +140,109 @@ else:
     plt.grid(True)
 
     # Save the figure
-    comparison_plot_path = OUTPUT_DIR / f"cds_comparison_{column_to_compare}.png"
+    comparison_plot_path = output_dir / f"cds_comparison_{column_to_compare}.png"
     plt.savefig(comparison_plot_path, dpi=300, bbox_inches="tight")
     plt.close()
 
     print(f"Saved comparison plot to: {comparison_plot_path}")
-## Graph3: Post 2012 Graph vs Gov Bonds 
-## Graph4 (Challenges): Rolling windows Correlations
+
+
+def plot_rolling_correlation(portfolio, actual_cds, windows=(12, 24, 36), halflife=12, output_dir=OUTPUT_DIR):
+    """
+    Graph4 (Challenges): Rolling windows Correlations
+    """
+    import matplotlib.pyplot as plt
+
+    replicated, actual = align_portfolio_returns(pivot_table(portfolio), actual_cds)
+    rolling = rolling_cross_moments(replicated.values, actual.values, windows)
+    ewm = ewm_cross_moments(replicated.values, actual.values, halflife=halflife)
+
+    plt.figure(figsize=(12, 6))
+    for window in windows:
+        matched = matched_correlation(rolling[window]["corr"], index=replicated.index, columns=replicated.columns)
+        plt.plot(matched.index, matched.mean(axis=1), label=f"{window}-month window")
+    matched = matched_correlation(ewm["corr"], index=replicated.index, columns=replicated.columns)
+    plt.plot(matched.index, matched.mean(axis=1), label=f"EWM ({halflife}-month half-life)", linestyle="--")
+
+    plt.title("Rolling Correlation of Replicated vs. Actual CDS Portfolios (average over portfolios)")
+    plt.xlabel("Time")
+    plt.ylabel("Correlation")
+    plt.legend()
+    plt.grid(True)
+
+    rolling_plot_path = output_dir / "cds_rolling_correlation.png"
+    plt.savefig(rolling_plot_path, dpi=300, bbox_inches="tight")
+    plt.close()
+
+    print(f"Saved rolling correlation plot to: {rolling_plot_path}")
+
+
+def _first_portfolio_block(portfolio, n_months=6, n_portfolios=10):
+    months = sorted(portfolio["yyyymm"].unique())[:n_months]
+    portfolios = sorted(portfolio["portfolio"].unique())[:n_portfolios]
+    return portfolio[portfolio["yyyymm"].isin(months) & portfolio["portfolio"].isin(portfolios)]
+
+
+def report_units(column_to_compare="CDS_10"):
+    """
+    Declare every table and figure of this report with the slice of data it depends on.
+    """
+    portfolio_number = int(column_to_compare.split("_")[1])
+    return [
+        ArtifactUnit(
+            "table1_replicated_cds",
+            write_table1_replicated_cds,
+            lambda data: (_first_portfolio_block(data["portfolio"]),),
+            ["latex_table1_replicated_cds.tex"],
+        ),
+        ArtifactUnit(
+            "table2_replicated_summary",
+            write_table2_replicated_summary,
+            lambda data: (data["cds"],),
+            ["latex_table2_replicated_summary.tex"],
+        ),
+        ArtifactUnit(
+            "graph1_all_cds_portfolios",
+            plot_all_cds_portfolios,
+            lambda data: (data["portfolio"][data["portfolio"]["portfolio"] != 20],),
+            ["cds_portfolio_returns.png"],
+        ),
+        ArtifactUnit(
+            f"graph2_cds_comparison_{column_to_compare}",
+            plot_cds_comparison,
+            lambda data: (
+                data["portfolio"][data["portfolio"]["portfolio"] == portfolio_number],
+                data["actual_cds"][[column_to_compare]],
+            ),
+            [f"cds_comparison_{column_to_compare}.png"],
+            kwargs={"column_to_compare": column_to_compare},
+        ),
+        ## Graph3: Post 2012 Graph vs Gov Bonds
+        ArtifactUnit(
+            "graph4_rolling_correlation",
+            plot_rolling_correlation,
+            lambda data: (data["portfolio"], data["actual_cds"]),
+            ["cds_rolling_correlation.png"],
+        ),
+    ]
+
+
+def main():
+    ## Suppress scientific notation and limit to 3 decimal places
+    # Sets display, but doesn't affect formatting to LaTeX
+    pd.set_option('display.float_format', lambda x: '%.5f' % x)
+
+    # Shared inputs are loaded once; each unit only receives (and hashes) its own slice
+    cds = load_cds_return(columns=["ticker", "trade_date", "daily_return"])
+    data = {
+        "portfolio": load_portfolio(),
+        "actual_cds": load_real_cds_return(),
+        "cds": cds[cds["trade_date"] < "2013-01-01"],
+    }
+    status = render_artifacts(report_units(), data)
+    for name, state in status.items():
+        print(f"{name}: {state}")
+
+
+if __name__ == "__main__":
+    main()
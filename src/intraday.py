@@ -0,0 +1,301 @@
+"""
+This script marks CDS positions to market intraday from a stream of spread updates.
+
+An asyncio loop consumes `(ticker, timestamp, spread)` ticks from a local source (a tailed CSV file,
+a local TCP socket, or an in-process queue) and applies each one to an array-backed store of
+per-ticker state: the last close spread and RD, and the current spread, lambda, RD and running
+daily return. The discount factors are the same for every ticker on a given day, so the day's
+discount vector is computed once and cached, and each tick costs one fixed-size (60-term) RD sum:
+the same formulas as `calc_lambda`, `calc_RD` and `calc_cds_daily_return`, with the last close
+taking the place of the previous day. Snapshots are published every `INTRADAY_PUBLISH_SECONDS`
+together with tick-to-publish latency metrics.
+
+Functions and classes include:
+- `IntradayEngine`: Array-backed per-ticker state with O(1) tick updates and day rolls.
+- `tail_file`, `socket_source`, `queue_source`: Async tick sources.
+- `run_engine`: Applies ticks from a source and publishes snapshots at a fixed cadence.
+- `ParquetPublisher`: Writes each snapshot atomically to Parquet and reports latency metrics.
+"""
+
+import argparse
+import asyncio
+import math
+import os
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from settings import config
+
+DATA_DIR = Path(config("DATA_DIR"))
+INTRADAY_PUBLISH_SECONDS = config("INTRADAY_PUBLISH_SECONDS", default=1.0, cast=float)
+TAIL_BATCH_LINES = 256
+
+
+def parse_tick(line):
+    """
+    Parse a `ticker,timestamp,spread` line; returns None for blank and header lines.
+    """
+    fields = line.strip().split(",")
+    if len(fields) != 3 or fields[0] == "ticker":
+        return None
+    ticker, timestamp, spread = fields
+    return ticker, np.datetime64(timestamp, "ns"), float(spread)
+
+
+class IntradayEngine:
+    """
+    Per-ticker intraday state in parallel numpy arrays, indexed by a ticker -> slot map.
+    """
+
+    def __init__(self, curve, maturity=5, L=0.6, capacity=1024):
+        self.curve = curve
+        self.L = L
+        self.grid = np.linspace(1 / 12, maturity, 12 * maturity)
+        self.day = None
+        self.discount = None
+        self._discount_cache = {}
+        self.slots = {}
+        self.tickers = []
+        self._allocate(capacity)
+
+    def _allocate(self, capacity):
+        def grow(name, fill, dtype=float):
+            values = np.full(capacity, fill, dtype=dtype)
+            if hasattr(self, name):
+                old = getattr(self, name)
+                values[: len(old)] = old
+            setattr(self, name, values)
+
+        for name in ["close_spread", "close_rd", "spread", "lam", "rd", "daily_return"]:
+            grow(name, np.nan)
+        grow("updated", np.datetime64("NaT", "ns"), "datetime64[ns]")
+        grow("n_ticks", 0, np.int64)
+
+    @classmethod
+    def from_close(cls, daily, curve, **kwargs):
+        """
+        Start from the last close of every ticker in a daily return panel (`ticker`, `trade_date`,
+        `spread`, `RD`), as written by `calc_cds_daily_return.py`.
+        """
+        engine = cls(curve, **kwargs)
+        last = daily.sort_values(["ticker", "trade_date"]).drop_duplicates("ticker", keep="last")
+        for ticker, spread, rd in zip(last["ticker"], last["spread"], last["RD"]):
+            slot = engine.slot(ticker)
+            engine.close_spread[slot] = engine.spread[slot] = spread
+            engine.close_rd[slot] = engine.rd[slot] = rd
+            engine.lam[slot] = 12 * math.log(1 + spread / (12 * engine.L))
+        engine.day = pd.Timestamp(last["trade_date"].max()).normalize() if len(last) else None
+        return engine
+
+    def slot(self, ticker):
+        slot = self.slots.get(ticker)
+        if slot is None:
+            slot = len(self.tickers)
+            if slot == len(self.spread):
+                self._allocate(2 * slot)
+            self.slots[ticker] = slot
+            self.tickers.append(ticker)
+        return slot
+
+    def discount_vector(self, day):
+        """
+        Discount factors on the monthly grid for `day`, from the latest curve date on or before it.
+        """
+        if day not in self._discount_cache:
+            position = self.curve.dates.searchsorted(day, side="right") - 1
+            if position < 0:
+                raise KeyError(f"The discount curve starts after {day:%Y-%m-%d}.")
+            self._discount_cache[day] = self.curve.discount_factor(self.curve.dates[position], self.grid)[0]
+        return self._discount_cache[day]
+
+    def roll_day(self, day):
+        """
+        Close the current day: the latest spread and RD become the reference for returns on `day`.
+        """
+        if self.day is not None:
+            self.close_spread[:] = self.spread
+            self.close_rd[:] = self.rd
+        self.daily_return[:] = np.nan
+        self.n_ticks[:] = 0
+        self.day = day
+        self.discount = self.discount_vector(day)
+
+    def apply(self, ticker, timestamp, spread):
+        """
+        Apply one spread update in O(1): lambda, RD against the cached discount vector, and the
+        return since the last close.
+        """
+        day = pd.Timestamp(timestamp).normalize()
+        if self.discount is None or day > self.day:
+            self.roll_day(day)
+        slot = self.slot(ticker)
+        lam = 12 * math.log(1 + spread / (12 * self.L))
+        self.spread[slot] = spread
+        self.lam[slot] = lam
+        self.rd[slot] = np.exp(-self.grid * lam) @ self.discount / 12
+        close_spread = self.close_spread[slot]
+        self.daily_return[slot] = -(close_spread / 250 + (spread - close_spread) * self.close_rd[slot])
+        self.updated[slot] = timestamp
+        self.n_ticks[slot] += 1
+
+    def snapshot(self):
+        """
+        Current state of every ticker as a DataFrame.
+        """
+        n = len(self.tickers)
+        return pd.DataFrame(
+            {
+                "ticker": self.tickers,
+                "updated": self.updated[:n],
+                "spread": self.spread[:n],
+                "RD": self.rd[:n],
+                "daily_return": self.daily_return[:n],
+                "close_spread": self.close_spread[:n],
+                "close_RD": self.close_rd[:n],
+                "n_ticks": self.n_ticks[:n],
+            }
+        )
+
+
+async def queue_source(queue):
+    """
+    Yield ticks put on an `asyncio.Queue`; a `None` item ends the stream.
+    """
+    while True:
+        tick = await queue.get()
+        if tick is None:
+            return
+        yield tick
+
+
+async def tail_file(path, poll_interval=0.05, follow=True, batch_lines=TAIL_BATCH_LINES):
+    """
+    Yield ticks from a CSV file of `ticker,timestamp,spread` lines, waiting for appended lines
+    when `follow` (like `tail -f`), or stopping at the end of the file otherwise.
+
+    Reading a burst of appended lines never waits, so every `batch_lines` lines the reader
+    yields to the event loop to let the publisher and other tasks run.
+    """
+    buffer = ""
+    n_read = 0
+    with open(path) as file:
+        while True:
+            line = file.readline()
+            if line:
+                n_read += 1
+                if n_read % batch_lines == 0:
+                    await asyncio.sleep(0)
+                buffer += line
+                if not buffer.endswith("\n"):
+                    continue
+                tick = parse_tick(buffer)
+                buffer = ""
+                if tick is not None:
+                    yield tick
+            elif follow:
+                await asyncio.sleep(poll_interval)
+            else:
+                return
+
+
+async def socket_source(host="127.0.0.1", port=8766):
+    """
+    Listen on a local TCP socket and yield the ticks sent as `ticker,timestamp,spread` lines by any client.
+    """
+    queue = asyncio.Queue()
+
+    async def handle(reader, writer):
+        async for line in reader:
+            tick = parse_tick(line.decode())
+            if tick is not None:
+                await queue.put(tick)
+        writer.close()
+
+    server = await asyncio.start_server(handle, host, port)
+    async with server:
+        while True:
+            yield await queue.get()
+
+
+def latency_metrics(received, published):
+    """
+    Tick-to-publish latency in milliseconds for ticks received at `received` (perf_counter seconds).
+    """
+    if not received:
+        return {"ticks": 0, "p50_ms": np.nan, "p99_ms": np.nan, "max_ms": np.nan}
+    latency = (published - np.asarray(received)) * 1000
+    p50, p99 = np.percentile(latency, [50, 99])
+    return {"ticks": len(latency), "p50_ms": p50, "p99_ms": p99, "max_ms": latency.max()}
+
+
+async def run_engine(engine, source, publish, cadence=INTRADAY_PUBLISH_SECONDS):
+    """
+    Apply every tick from the async iterator `source` to `engine` and call `publish(snapshot, metrics)`
+    every `cadence` seconds, and once more when the source ends. `metrics` holds the latency from
+    receipt to publication of the ticks applied since the previous snapshot.
+    """
+    received = []
+
+    def flush():
+        snapshot = engine.snapshot()
+        publish(snapshot, latency_metrics(received, time.perf_counter()))
+        received.clear()
+
+    async def publisher():
+        while True:
+            await asyncio.sleep(cadence)
+            flush()
+
+    task = asyncio.create_task(publisher())
+    try:
+        async for ticker, timestamp, spread in source:
+            arrived = time.perf_counter()
+            engine.apply(ticker, timestamp, spread)
+            received.append(arrived)
+    finally:
+        task.cancel()
+    flush()
+
+
+class ParquetPublisher:
+    """
+    Publish snapshots by atomically replacing a Parquet file, and print the latency metrics.
+    """
+
+    def __init__(self, path=DATA_DIR / "intraday_snapshot.parquet", verbose=True):
+        self.path = Path(path)
+        self.verbose = verbose
+
+    def __call__(self, snapshot, metrics):
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        snapshot.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, self.path)
+        if self.verbose and metrics["ticks"]:
+            print(
+                f"{metrics['ticks']} ticks, latency p50 {metrics['p50_ms']:.2f} ms, "
+                f"p99 {metrics['p99_ms']:.2f} ms, max {metrics['max_ms']:.2f} ms"
+            )
+
+
+def main():
+    from calc_cds_daily_return import DiscountCurve, load_cds_return
+
+    parser = argparse.ArgumentParser(description="Mark CDS returns to market from streaming spread updates.")
+    parser.add_argument("--tail", default=None, help="CSV file of ticker,timestamp,spread lines to follow")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--cadence", type=float, default=INTRADAY_PUBLISH_SECONDS)
+    parser.add_argument("--output", default=DATA_DIR / "intraday_snapshot.parquet")
+    args = parser.parse_args()
+
+    daily = load_cds_return(columns=["ticker", "trade_date", "spread", "RD"])
+    engine = IntradayEngine.from_close(daily, DiscountCurve.load(DATA_DIR / "discount_curve.npz"))
+    source = tail_file(args.tail) if args.tail else socket_source(args.host, args.port)
+    asyncio.run(run_engine(engine, source, ParquetPublisher(args.output), cadence=args.cadence))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+"""
+This module prices CDS under the ISDA standard model conventions as an alternative RD engine.
+
+`calc_RD` approximates the risky duration with a flat hazard `12 * log(1 + s / (12 L))` and a monthly
+premium grid. Here each quote is instead priced on its contract's schedule: quarterly premium periods
+between IMM dates (20 March, June, September and December) with ACT/360 accruals, the first period
+starting on the last IMM date on or before the trade date, maturity `tenor` years after the next IMM
+date, and accrued premium paid on default. Within each premium period the hazard rate and the forward
+rate (log-linear in the curve's discount factors) are constant, so both legs and the accrual on default
+integrate in closed form. Discount factors are continuously compounded, `exp(-r(t) t)` with `t` in
+years, from the zero curve (see `discount_factors`). The hazard rate is calibrated so that the model par spread equals the quoted
+spread, with a Newton solve run on all rows at once (derivatives by complex step); RD is the calibrated
+clean risky annuity per unit spread: premium plus accrual on default, less the premium accrued at
+the trade date.
+
+Rows sharing a trade date and tenor share a schedule and discount factors, which are computed once
+per (date, tenor) and gathered; calibration runs in row chunks of `ISDA_CHUNK_ROWS`.
+
+Functions include:
+- `imm_dates`, `quarter_index`: IMM date arithmetic on whole arrays of dates.
+- `contract_schedules`: Padded premium period arrays for (trade date, tenor) pairs.
+- `discount_factors`: ISDA-convention discount factors from a `DiscountCurve`.
+- `calibrate_hazard`: Vectorized Newton calibration of the hazard rate to par spreads.
+- `calc_RD_isda`: Drop-in alternative to `calc_RD` / `calc_RD_by_tenor`.
+"""
+
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from settings import config
+from calc_cds_daily_return import window_rows, calc_RD, knot_limit, rd_discount_table
+from panel_layout import lag_within_ticker, ticker_offsets
+from pull_markit import parse_tenor
+
+DATA_DIR = Path(config("DATA_DIR"))
+ISDA_CHUNK_ROWS = config("ISDA_CHUNK_ROWS", default=100_000, cast=int)
+
+IMM_DAY = 20
+
+
+def quarter_index(dates, after=False):
+    """
+    Index (4 * year + quarter) of the last IMM date on or before each date, or with `after`, of the
+    first IMM date strictly after it.
+    """
+    dates = pd.DatetimeIndex(dates)
+    quarter = dates.year.to_numpy() * 4 + (dates.month.to_numpy() - 3) // 3
+    # Dates before the IMM day of a quarter month belong to the previous IMM date
+    on_or_after = (dates.month.to_numpy() % 3 > 0) | (dates.day.to_numpy() >= IMM_DAY)
+    last = quarter - 1 + on_or_after
+    return last + 1 if after else last
+
+
+def imm_dates(quarters):
+    """
+    IMM dates of quarter indices from `quarter_index`, as datetime64[D].
+    """
+    quarters = np.asarray(quarters)
+    months = (quarters // 4 - 1970) * 12 + 3 * (quarters % 4) + 2
+    return months.astype("datetime64[M]").astype("datetime64[D]") + (IMM_DAY - 1)
+
+
+def contract_schedules(trade_dates, maturities):
+    """
+    Premium periods of standard contracts traded on `trade_dates` with `maturities` in years,
+    padded to a common number of periods. Returns a dictionary of (n, P) arrays:
+    `start` and `end` (years from the trade date, ACT/365, protection starting at the trade date),
+    `accrual` (ACT/360 length of each period), `accrued` (ACT/360 accrued at the protection start
+    of the period) and a boolean `mask` of real periods.
+    """
+    trade_dates = pd.DatetimeIndex(trade_dates)
+    first = quarter_index(trade_dates)
+    last = quarter_index(trade_dates, after=True) + np.round(4 * np.asarray(maturities, dtype=float)).astype(int)
+    n_periods = last - first
+    steps = np.arange(n_periods.max(initial=1))
+    mask = steps < n_periods[:, None]
+
+    period_start = imm_dates(first[:, None] + steps)
+    period_end = imm_dates(first[:, None] + steps + 1)
+    trade_day = trade_dates.to_numpy().astype("datetime64[D]")[:, None]
+    protection_start = np.maximum(period_start, trade_day)
+
+    days = lambda later, earlier: (later - earlier).astype(float)
+    return {
+        "start": np.where(mask, days(protection_start, trade_day) / 365, 0.0),
+        "end": np.where(mask, days(period_end, trade_day) / 365, 0.0),
+        "accrual": np.where(mask, days(period_end, period_start) / 360, 0.0),
+        "accrued": np.where(mask, days(protection_start, period_start) / 360, 0.0),
+        "mask": mask,
+    }
+
+
+def _integrals(k, h):
+    """
+    (1 - exp(-k h)) / k and (1 - exp(-k h) (1 + k h)) / k^2, stable for small k h.
+    """
+    kh = k * h
+    small = np.abs(kh) < 1e-8
+    safe_k = np.where(small, 1.0, k)
+    first = np.where(small, h * (1 - kh / 2), -np.expm1(-kh) / safe_k)
+    second = np.where(small, h * h * (0.5 - kh / 3), (-np.expm1(-kh) - kh * np.exp(-kh)) / safe_k**2)
+    return first, second
+
+
+def _legs(hazard, schedule, discount_start, discount_end, L):
+    """
+    Clean risky annuity (premium plus accrual on default less the accrued premium at the trade date,
+    per unit spread) and protection leg value. Works for real or complex `hazard` of shape (n,).
+    """
+    hazard = hazard[:, None]
+    h = schedule["end"] - schedule["start"]
+    forward = np.log(discount_start / discount_end) / np.where(h > 0, h, 1)
+    k = hazard + forward
+    survival_start = np.exp(-hazard * schedule["start"])
+    survival_end = np.exp(-hazard * schedule["end"])
+    first, second = _integrals(k, h)
+
+    weight = discount_start * survival_start * hazard
+    premium = schedule["accrual"] * discount_end * survival_end
+    accrual_on_default = weight * (schedule["accrued"] * first + 365 / 360 * second)
+    protection = L * weight * first
+    mask = schedule["mask"]
+    annuity = np.where(mask, premium + accrual_on_default, 0).sum(axis=1) - schedule["accrued"][:, 0]
+    return annuity, np.where(mask, protection, 0).sum(axis=1)
+
+
+def discount_factors(curve, dates, times):
+    """
+    Continuously compounded discount factors `exp(-r(t) * t)` for `times` in years, per date.
+    `DiscountCurve.discount_factor` keeps the `exp(-r * t / 12)` convention of `calc_RD`, which
+    the ISDA model does not use.
+    """
+    times = np.asarray(times, dtype=float)
+    return np.exp(-curve.zero_rate(dates, times) * times)
+
+
+def calibrate_hazard(spread, schedule, discount_start, discount_end, L=0.6, tol=1e-13, max_iter=50):
+    """
+    Flat hazard rate per row such that protection leg = spread * risky annuity, by Newton's method
+    on all rows at once. Returns `(hazard, risky_annuity)`.
+    """
+    step = 1e-30
+    hazard = spread / L
+    for _ in range(max_iter):
+        annuity, protection = _legs(hazard + 1j * step, schedule, discount_start, discount_end, L)
+        residual = spread * annuity - protection
+        update = residual.real / (residual.imag / step)
+        hazard = hazard - update
+        if np.abs(update).max(initial=0) < tol:
+            break
+    else:
+        raise ValueError(f"ISDA hazard calibration did not converge in {max_iter} iterations.")
+    annuity, _ = _legs(hazard, schedule, discount_start, discount_end, L)
+    return hazard, annuity
+
+
+def calc_RD_isda(cds_df, curve, maturity=5, L=0.6, chunk_rows=ISDA_CHUNK_ROWS, start=None, end=None):
+    """
+    Compute RD as the ISDA standard model risky annuity, calibrated to each row's spread.
+
+    Like `calc_RD` (or `calc_RD_by_tenor` when `cds_df` has a `tenor` column, which then sets each
+    row's maturity), keeps rows on curve dates with a spread, adds `RD_prev`/`spread_prev` lags and
+    returns the rows of the `start`/`end` window.
+    """
+    cds_df["trade_date"] = pd.to_datetime(cds_df["trade_date"])
+    keys = ["tenor", "ticker"] if "tenor" in cds_df.columns else ["ticker"]
+    cds_df = cds_df.sort_values([*keys, "trade_date"], kind="stable")
+    positions = curve.dates.get_indexer(cds_df["trade_date"])
+    keep = (positions >= 0) & cds_df["spread"].notna().to_numpy()
+    rd_df = cds_df[keep].reset_index(drop=True)
+    positions = positions[keep]
+
+    # Rows are grouped by tenor; each tenor is scheduled, discounted (off the knots up to its own
+    # limit, as in `rd_discount_table`) and calibrated on its own, independent of the other tenors
+    group_keys = rd_df["tenor"].astype(str).to_numpy() if "tenor" in rd_df.columns else np.zeros(len(rd_df))
+    bounds = np.r_[np.flatnonzero(np.r_[True, group_keys[1:] != group_keys[:-1]]), len(rd_df)]
+    spread = rd_df["spread"].to_numpy(dtype=float)
+    rd = np.empty(len(rd_df))
+    for lo, hi in zip(bounds[:-1], bounds[1:]):
+        years = parse_tenor(rd_df["tenor"].iat[lo]) if "tenor" in rd_df.columns else float(maturity)
+        limited = curve.truncate(knot_limit(years))
+
+        # One schedule and one set of discount factors per trade date
+        contracts, contract_of_row = np.unique(positions[lo:hi], return_inverse=True)
+        contract_of_row = contract_of_row.reshape(-1)
+        contract_dates = curve.dates[contracts]
+        schedule = contract_schedules(contract_dates, np.full(len(contracts), years))
+        discount_start = discount_factors(limited, contract_dates, schedule["start"])
+        discount_end = discount_factors(limited, contract_dates, schedule["end"])
+
+        for first in range(lo, hi, chunk_rows):
+            rows = slice(first, min(first + chunk_rows, hi))
+            index = contract_of_row[rows.start - lo : rows.stop - lo]
+            chunk_schedule = {name: values[index] for name, values in schedule.items()}
+            _, rd[rows] = calibrate_hazard(spread[rows], chunk_schedule, discount_start[index], discount_end[index], L)
+    rd_df["RD"] = rd
+
+    rd_df["RD_prev"] = np.nan
+    rd_df["spread_prev"] = np.nan
+    for lo, hi in zip(bounds[:-1], bounds[1:]):
+        block = rd_df.iloc[lo:hi]
+        offsets = ticker_offsets(block)
+        rd_df.iloc[lo:hi, rd_df.columns.get_loc("RD_prev")] = lag_within_ticker(block["RD"], offsets)
+        rd_df.iloc[lo:hi, rd_df.columns.get_loc("spread_prev")] = lag_within_ticker(block["spread"], offsets)
+
+    columns_available = [
+        col for col in ["ticker", "trade_date", "tenor", "spread_prev", "spread", "RD", "RD_prev", "sector"]
+        if col in rd_df.columns
+    ]
+    return window_rows(rd_df[columns_available], start, end)
+
+
+def benchmark(cds_df, curve):
+    """
+    Time the approximate and ISDA RD engines on the same panel and compare their RD.
+    """
+    started = time.perf_counter()
+    approx = calc_RD(cds_df.copy(), rd_discount_table(curve))
+    approx_seconds = time.perf_counter() - started
+    started = time.perf_counter()
+    isda = calc_RD_isda(cds_df.copy(), curve)
+    isda_seconds = time.perf_counter() - started
+
+    relative = (isda["RD"].to_numpy() - approx["RD"].to_numpy()) / approx["RD"].to_numpy()
+    return pd.Series(
+        {
+            "rows": len(isda),
+            "approx_seconds": approx_seconds,
+            "isda_seconds": isda_seconds,
+            "isda_rows_per_second": len(isda) / isda_seconds,
+            "mean_relative_difference": relative.mean(),
+            "max_abs_relative_difference": np.abs(relative).max(initial=0),
+        }
+    )
+
+
+if __name__ == "__main__":
+    from calc_cds_daily_return import DiscountCurve, load_cds_return
+
+    daily = load_cds_return(columns=["ticker", "trade_date", "spread"])
+    print(benchmark(daily, DiscountCurve.load(DATA_DIR / "discount_curve.npz")).to_string())
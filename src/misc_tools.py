@@ -3,13 +3,7 @@ Collection of miscellaneous tools useful in a variety of situations
 (not specific to the current project).
 """
 
-import numpy as np
-import pandas as pd
-from matplotlib import pyplot as plt
-import matplotlib.dates as mdates
-
 from pathlib import Path
-import wrds
 import datetime
 from settings import config
 
@@ -52,7 +46,7 @@ def month_code_to_date(month_code):
 ########################################################################################
 
 
-def pull_from_wrds(query, wrds_username=WRDS_USERNAME):
+def pull_from_wrds(query, wrds_username=WRDS_USERNAME, source=None):
     """
     Retrieve data from WRDS using a SQL query.
 
@@ -61,7 +55,9 @@ def pull_from_wrds(query, wrds_username=WRDS_USERNAME):
     >>> isinstance(df, pd.DataFrame)
     True
     """
-    db = wrds.Connection(wrds_username=wrds_username)
+    from data_sources import get_data_source
+
+    db = (source or get_data_source()).connect_wrds(wrds_username)
     df = db.raw_sql(query)
     db.close()
     return df
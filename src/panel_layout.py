@@ -0,0 +1,157 @@
+"""
+This module defines the canonical in-memory and on-disk layout of the daily CDS panel:
+rows sorted by ticker, then trade date, with a compact index of per-ticker row offsets.
+
+With that layout, per-ticker operations become plain array slicing instead of repeated
+`sort_values` + `groupby(...)` calls:
+- lags (`spread_prev`, `RD_prev`) shift the whole column and blank the first row(s) of each run,
+- first/last-in-group pick rows at the run starts/stops,
+- per-ticker reductions use `ufunc.reduceat` over the run starts.
+
+The offsets index is persisted next to the Parquet file (`<name>.offsets.parquet`) so readers
+can reuse it without re-deriving the ticker grouping.
+
+Functions include:
+- `sort_panel`: Puts a panel into canonical ticker-then-date order (stable sort).
+- `is_canonical`: Checks whether a panel is already in canonical order.
+- `ticker_offsets`: Builds the per-ticker `start`/`stop` row offsets of a canonical panel.
+- `lag_within_ticker`: Lags a column within each ticker run.
+- `first_in_group`, `last_in_group`, `reduce_by_ticker`: Per-ticker selections and reductions.
+- `row_group_ranges`: Maps each ticker run to the Parquet row groups that hold it.
+- `select_window`: Keeps the rows of a date window plus each series' last row before it.
+- `offsets_path`, `write_offsets`, `load_offsets`: Persist the offsets index next to a Parquet file.
+"""
+
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+
+def _ticker_codes(df):
+    return pd.factorize(df["ticker"].to_numpy(), sort=True)
+
+
+def is_canonical(df):
+    """
+    True if rows are sorted by ticker, then trade date.
+    """
+    if len(df) < 2:
+        return True
+    codes, _ = _ticker_codes(df)
+    ticker_step = np.diff(codes)
+    date_step = np.diff(pd.DatetimeIndex(df["trade_date"]).asi8)
+    return bool(((ticker_step > 0) | ((ticker_step == 0) & (date_step >= 0))).all())
+
+
+def sort_panel(df):
+    """
+    Return the panel in canonical ticker-then-date order. A no-op (no copy) if already sorted.
+    """
+    if is_canonical(df):
+        return df
+    return df.sort_values(["ticker", "trade_date"], kind="stable").reset_index(drop=True)
+
+
+def ticker_offsets(df):
+    """
+    Per-ticker row ranges `[start, stop)` of a canonical panel.
+    """
+    if not is_canonical(df):
+        raise ValueError("Panel is not in canonical ticker-then-date order; call sort_panel first.")
+    tickers = df["ticker"].to_numpy()
+    if len(tickers) == 0:
+        return pd.DataFrame({"ticker": pd.Series(dtype=object), "start": [], "stop": []}).astype(
+            {"start": np.int64, "stop": np.int64}
+        )
+    starts = np.flatnonzero(np.r_[True, tickers[1:] != tickers[:-1]])
+    stops = np.r_[starts[1:], len(tickers)]
+    return pd.DataFrame({"ticker": tickers[starts], "start": starts, "stop": stops})
+
+
+def lag_within_ticker(values, offsets, periods=1):
+    """
+    Shift `values` down by `periods` rows within each ticker run (like `groupby("ticker").shift`).
+    """
+    values = np.asarray(values, dtype=float)
+    if periods == 0:
+        return values.copy()
+    lagged = np.full_like(values, np.nan)
+    lagged[periods:] = values[:-periods]
+    starts = offsets["start"].to_numpy()
+    stops = offsets["stop"].to_numpy()
+    for k in range(periods):
+        # Blank the first `periods` rows of every run
+        rows = starts + k
+        lagged[rows[rows < stops]] = np.nan
+    return lagged
+
+
+def first_in_group(values, offsets):
+    return np.asarray(values)[offsets["start"].to_numpy()]
+
+
+def last_in_group(values, offsets):
+    return np.asarray(values)[offsets["stop"].to_numpy() - 1]
+
+
+def reduce_by_ticker(values, offsets, ufunc=np.add):
+    """
+    Reduce `values` over each ticker run with a numpy ufunc (e.g. `np.add`, `np.maximum`).
+    """
+    return ufunc.reduceat(np.asarray(values), offsets["start"].to_numpy())
+
+
+def row_group_ranges(offsets, row_group_size):
+    """
+    Add the `first_row_group`/`last_row_group` of each ticker run for a file written with
+    fixed-size row groups of `row_group_size` rows.
+    """
+    offsets = offsets.copy()
+    offsets["first_row_group"] = offsets["start"] // row_group_size
+    offsets["last_row_group"] = (offsets["stop"] - 1) // row_group_size
+    return offsets
+
+
+def select_window(df, start=None, end=None):
+    """
+    Rows with `start <= trade_date <= end`, plus the last row before `start` of every series
+    (ticker, and tenor and region where present), which date-window runs need for `spread_prev`
+    and `RD_prev`. Rows keep their order.
+    """
+    trade_date = pd.DatetimeIndex(df["trade_date"])
+    keep = np.ones(len(df), dtype=bool)
+    if end is not None:
+        keep &= trade_date <= pd.Timestamp(end)
+    if start is None:
+        return df[keep]
+    before = trade_date < pd.Timestamp(start)
+    keys = [col for col in ["ticker", "tenor", "region"] if col in df.columns]
+    lookback = (
+        pd.DataFrame({"position": np.flatnonzero(before), "trade_date": trade_date[before]})
+        .join(df.iloc[before][keys].reset_index(drop=True))
+        .sort_values("trade_date", kind="stable")
+        .drop_duplicates(keys, keep="last")["position"]
+    )
+    keep &= ~before
+    keep[lookback.to_numpy()] = True
+    return df[keep]
+
+
+def offsets_path(path):
+    path = Path(path)
+    return path.with_name(path.name.replace(".parquet", ".offsets.parquet"))
+
+
+def write_offsets(offsets, path):
+    """
+    Persist the offsets index next to the Parquet file at `path`.
+    """
+    offsets.to_parquet(offsets_path(path), index=False)
+
+
+def load_offsets(path):
+    """
+    Load the offsets index persisted next to the Parquet file at `path`.
+    """
+    return pd.read_parquet(offsets_path(path))
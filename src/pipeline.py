@@ -0,0 +1,319 @@
+"""
+This script runs the whole return pipeline in one process, holding every intermediate in memory.
+
+`calc_cds_daily_return.py` and `create_portfolio.py` hand the daily panel to each other through
+`CDS_daily_return.parquet`, and the portfolio step filters out `spread >= 0.5` only after reading it
+back. A `Pipeline` instead chains the stages
+
+    markit -> rf_data -> risk_free_term -> rd -> daily -> monthly -> portfolio
+
+(`merge_rf_data`, `calc_risk_free_term`, `calc_RD`, `calc_cds_daily_return`, the fused monthly kernel
+and `construct_cds_portfolios`), computes each stage once on first use and keeps its result, so a full
+rebuild pays interpreter startup and serialization once. Stages are configured separately (see
+`DEFAULT_CONFIG`); reconfiguring a stage drops its result and every result downstream of it.
+
+The spread filter of the monthly stage is pushed down to the output of the RD stage. It cannot go
+further towards the source: `RD_prev` and `spread_prev` of a kept row may come from a dropped row.
+Filtered rows are then never turned into daily returns or carried to the monthly stage, and the
+monthly coverage is still measured against the trading days of the unfiltered panel, so the
+portfolios equal those of the two scripts.
+
+Stages named in `checkpoints` are written to `DATA_DIR` as they complete, under the file names the
+scripts use (`discount_curve.npz`, `CDS_daily_return.parquet`, `portfolio_return.parquet`) or as
+`pipeline_<stage>.parquet`. The daily checkpoint must hold the whole panel, so it requires
+`pushdown=False`.
+
+With a `start`/`end` date window, widened to whole months, the pipeline recomputes only that window
+(e.g. 2008Q4): the Markit and rate loaders read the window and each ticker's previous quote, RD and
+daily returns are kept for the window, and the checkpoints replace the window's slice of the saved
+outputs. The minimum-months screen counts a ticker's months outside the window from the saved daily
+returns, so the window's portfolios equal those of a full run.
+
+Classes and functions include:
+- `Pipeline`: Lazily evaluated, configurable chain of the pipeline stages.
+- `write_checkpoint`: Persists one stage's result.
+"""
+
+import argparse
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from settings import config
+from calc_cds_daily_return import (
+    CDS_COMPUTE_DTYPE,
+    CDS_FLOAT32_TOLERANCE,
+    CDS_RD_ENGINE,
+    DiscountCurve,
+    calc_cds_daily_return,
+    calc_panel_RD,
+    check_rd_engine,
+    check_reduced_precision,
+    rd_discount_table,
+    region_rf_data,
+    write_cds_return,
+    write_cds_return_by_tenor,
+    write_cds_return_window,
+)
+from create_portfolio import (
+    calc_monthly_panel,
+    construct_cds_portfolios,
+    filter_tickers_by_min_months,
+    in_months,
+    load_monthly_panel,
+    month_window,
+    write_portfolio,
+    write_portfolio_window,
+)
+from panel_layout import select_window
+from pull_markit import load_markit_data, load_multiple_data
+
+DATA_DIR = Path(config("DATA_DIR"))
+MANUAL_DATA_DIR = Path(config("MANUAL_DATA_DIR"))
+
+STAGES = ("markit", "rf_data", "risk_free_term", "rd", "daily", "monthly", "portfolio")
+
+DEFAULT_CONFIG = {
+    "markit": {"region": "US"},
+    "rf_data": {},
+    # None: the tenors of the Markit panel
+    "risk_free_term": {"tenors": None},
+    "rd": {"engine": CDS_RD_ENGINE, "dtype": CDS_COMPUTE_DTYPE, "tolerance": CDS_FLOAT32_TOLERANCE},
+    "daily": {},
+    # Tenor of a multi-tenor panel that the portfolios are built from
+    "monthly": {"spread_max": 0.5, "tenor": "5Y"},
+    "portfolio": {"min_months": 6},
+}
+
+
+def write_checkpoint(stage, result, data_dir=DATA_DIR, start=None, end=None):
+    """
+    Write the result of `stage` to `data_dir`, where the stand-alone scripts would write it.
+    With a `start`/`end` window, the curve, daily returns and portfolios replace that window of
+    the saved outputs.
+    """
+    window = start is not None or end is not None
+    if stage == "risk_free_term":
+        curve, _ = result
+        path = data_dir / "discount_curve.npz"
+        if window and path.exists():
+            curve = DiscountCurve.load(path).merge(curve)
+        curve.save(path)
+    elif window and stage == "daily":
+        write_cds_return_window(result, start, end, data_dir)
+    elif window and stage == "portfolio":
+        write_portfolio_window(result, start, end, data_dir)
+    elif stage == "daily":
+        if "tenor" in result.columns:
+            write_cds_return_by_tenor(result, data_dir)
+            result = result[result["tenor"] == "5Y"].drop(columns="tenor").reset_index(drop=True)
+            if result.empty:
+                return
+        write_cds_return(result, data_dir)
+    elif stage == "portfolio":
+        write_portfolio(result, data_dir)
+    else:
+        result.to_parquet(data_dir / f"pipeline_{stage}.parquet")
+
+
+class Pipeline:
+    """
+    The return pipeline for one Markit panel, evaluated lazily: `run(stage)` (or `pipeline[stage]`)
+    computes the missing stages up to `stage` and returns its result. `markit` and `rf_data` replace
+    the loading of those inputs from `data_dir`; a supplied `markit` may hold the full history even
+    with a `start`/`end` window.
+    """
+
+    def __init__(
+        self,
+        markit=None,
+        rf_data=None,
+        config=None,
+        checkpoints=(),
+        pushdown=True,
+        data_dir=DATA_DIR,
+        manual_data_dir=MANUAL_DATA_DIR,
+        start=None,
+        end=None,
+    ):
+        unknown = set(checkpoints) - set(STAGES)
+        if unknown:
+            raise ValueError(f"Unknown pipeline stages {sorted(unknown)}; expected some of {STAGES}")
+        if "daily" in checkpoints and pushdown:
+            raise ValueError("The daily checkpoint needs the unfiltered panel; run with pushdown=False.")
+        self.inputs = {"markit": markit, "rf_data": rf_data}
+        self.config = {stage: dict(options) for stage, options in DEFAULT_CONFIG.items()}
+        self.checkpoints = tuple(checkpoints)
+        self.pushdown = pushdown
+        self.start, self.end = month_window(start, end)
+        self.data_dir = Path(data_dir)
+        self.manual_data_dir = Path(manual_data_dir)
+        self.results = {}
+        self.timings = {}
+        for stage, options in (config or {}).items():
+            self.configure(stage, **options)
+
+    def configure(self, stage, **options):
+        """
+        Update the options of `stage` and drop the results that depend on them.
+        """
+        if stage not in STAGES:
+            raise ValueError(f"Unknown pipeline stage {stage!r}; expected one of {STAGES}")
+        unknown = set(options) - set(DEFAULT_CONFIG[stage])
+        if unknown:
+            raise ValueError(f"Unknown options {sorted(unknown)} for stage {stage!r}")
+        self.config[stage].update(options)
+        # The pushed-down spread filter makes the RD stage depend on the monthly options
+        first = "rd" if stage == "monthly" and self.pushdown else stage
+        self.invalidate(first)
+        return self
+
+    def invalidate(self, stage):
+        """
+        Drop the results of `stage` and every later stage.
+        """
+        for name in STAGES[STAGES.index(stage):]:
+            self.results.pop(name, None)
+            self.timings.pop(name, None)
+
+    def run(self, until="portfolio"):
+        """
+        Compute the stages up to `until` that have no result yet, and return the result of `until`.
+        """
+        if until not in STAGES:
+            raise ValueError(f"Unknown pipeline stage {until!r}; expected one of {STAGES}")
+        for stage in STAGES[: STAGES.index(until) + 1]:
+            if stage in self.results:
+                continue
+            started = time.perf_counter()
+            self.results[stage] = getattr(self, f"_{stage}")(**self.config[stage])
+            self.timings[stage] = time.perf_counter() - started
+            if stage in self.checkpoints:
+                write_checkpoint(stage, self.results[stage], self.data_dir, self.start, self.end)
+        return self.results[until]
+
+    def __getitem__(self, stage):
+        return self.run(stage)
+
+    @property
+    def curve(self):
+        return self.run("risk_free_term")[0]
+
+    def _markit(self, region):
+        markit = self.inputs["markit"]
+        if markit is None:
+            if (self.data_dir / "Markit_CDS.parquet").exists():
+                markit = load_markit_data(self.data_dir, start=self.start, end=self.end)
+            else:
+                markit = load_multiple_data(self.data_dir, start=self.start, end=self.end)
+        elif self.start is not None or self.end is not None:
+            markit = select_window(markit, self.start, self.end)
+        if "region" in markit.columns:
+            markit = markit[markit["region"] == region].drop(columns="region")
+        return markit
+
+    def _rf_data(self):
+        if self.inputs["rf_data"] is not None:
+            return self.inputs["rf_data"]
+        return region_rf_data(
+            self.results["markit"], self.config["markit"]["region"], self.data_dir, self.manual_data_dir
+        )
+
+    def _risk_free_term(self, tenors):
+        """
+        The discount curve and its monthly discount table, reaching the longest tenor.
+        """
+        markit = self.results["markit"]
+        if tenors is None and "tenor" in markit.columns:
+            tenors = markit["tenor"].astype("category").cat.categories
+        curve = DiscountCurve.from_rf_data(self.results["rf_data"])
+        return curve, rd_discount_table(curve, tenors)
+
+    def _rd(self, engine, dtype, tolerance):
+        check_rd_engine(engine, dtype)
+        curve, risk_free_term_df = self.results["risk_free_term"]
+        # calc_RD converts trade_date in place; keep the held Markit panel untouched
+        markit = self.results["markit"].copy(deep=False)
+        if engine == "isda":
+            from isda import calc_RD_isda
+
+            rd_df = calc_RD_isda(markit, curve, start=self.start, end=self.end)
+        else:
+            rd_df = calc_panel_RD(markit, risk_free_term_df, dtype=dtype, start=self.start, end=self.end)
+
+        # Trading days of the daily panel the monthly stage would see without the filter
+        panel = rd_df[rd_df["RD_prev"].notna()]
+        if "tenor" in panel.columns:
+            panel = panel[panel["tenor"] == self.config["monthly"]["tenor"]]
+        self._trade_dates = pd.DatetimeIndex(pd.unique(panel["trade_date"]))
+
+        spread_max = self.config["monthly"]["spread_max"]
+        if self.pushdown and spread_max is not None:
+            rd_df = rd_df[rd_df["spread"].to_numpy() < spread_max].reset_index(drop=True)
+        return rd_df
+
+    def _daily(self):
+        # A shallow copy: the daily_return column is not added to the held RD table
+        daily = calc_cds_daily_return(self.results["rd"].copy(deep=False))
+        options = self.config["rd"]
+        if options["engine"] == "approx" and np.dtype(options["dtype"]) != np.float64:
+            check_reduced_precision(
+                self.results["markit"].copy(deep=False),
+                self.results["risk_free_term"][1],
+                daily,
+                tolerance=options["tolerance"],
+                spread_max=self.config["monthly"]["spread_max"] if self.pushdown else None,
+                start=self.start,
+                end=self.end,
+            )
+        return daily
+
+    def _monthly(self, spread_max, tenor):
+        daily = self.results["daily"]
+        if "tenor" in daily.columns:
+            daily = daily[daily["tenor"] == tenor].drop(columns="tenor")
+        monthly = calc_monthly_panel(daily, spread_max=spread_max)
+        if self.pushdown:
+            # Coverage is relative to every trading day of the panel, including filtered ones
+            dates = self._trade_dates
+            trading_days = pd.Series(dates.year * 100.0 + dates.month).value_counts()
+            monthly["coverage"] = monthly["n_obs"] / trading_days.reindex(monthly["yyyymm"]).to_numpy()
+        return monthly
+
+    def _portfolio(self, min_months):
+        monthly = self.results["monthly"]
+        counted = monthly
+        if (self.start is not None or self.end is not None) and (self.data_dir / "CDS_daily_return.parquet").exists():
+            # A ticker's months outside the window count towards min_months, as in a full run
+            history = load_monthly_panel(self.data_dir, spread_max=self.config["monthly"]["spread_max"])
+            history = history[~in_months(history["yyyymm"], self.start, self.end)]
+            counted = pd.concat([history[["ticker", "yyyymm"]], monthly[["ticker", "yyyymm"]]], ignore_index=True)
+        valid = filter_tickers_by_min_months(counted, min_months=min_months)["ticker"].unique()
+        # Portfolio breakpoints use every ticker's first-day spread, as before the filter
+        return construct_cds_portfolios(monthly[monthly["ticker"].isin(valid)], monthly, self.start, self.end)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compute CDS daily returns and portfolios in one process.")
+    parser.add_argument(
+        "--checkpoint", nargs="*", default=["risk_free_term", "portfolio"], choices=STAGES,
+        help="Stages whose results are written to DATA_DIR",
+    )
+    parser.add_argument(
+        "--no-pushdown", action="store_true",
+        help="Keep rows above the spread cap up to the monthly stage (required to checkpoint the daily panel)",
+    )
+    parser.add_argument("--start", default=None, help="First date of a window to recompute (widened to its month)")
+    parser.add_argument("--end", default=None, help="Last date of a window to recompute (widened to its month)")
+    args = parser.parse_args()
+
+    pipeline = Pipeline(checkpoints=args.checkpoint, pushdown=not args.no_pushdown, start=args.start, end=args.end)
+    pipeline.run()
+    for stage, seconds in pipeline.timings.items():
+        print(f"{stage:>15}: {seconds:8.2f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,69 +2,81 @@
 This file defines functions for cleaning and merging data related to the construction of risk-free rates.
 
 Functions:
-1. `pull_fed_yield_curve(start_year)`:
-   Downloads and processes the latest Federal Reserve yield curve data, filtered by a specified start year.
+1. `pull_fed_yield_curve(start_year, max_maturity)`:
+   Downloads and processes the latest Federal Reserve yield curve data, filtered by a specified start year,
+   keeping the 1-year to `max_maturity`-year zero rates (5 years by default, more for longer CDS tenors).
 
 2. `pull_swap_rates(start_year)`:
    Downloads and processes 3-month and 6-month swap rate data from FRED, merges them, and filters by the start year.
 
-3. `load_fed_yield_curve(data_dir)`:
-   Loads pre-saved Federal Reserve yield curve data from a Parquet file.
+3. `load_fed_yield_curve(data_dir, start, end)`:
+   Loads pre-saved Federal Reserve yield curve data from a Parquet file, optionally only the dates from `start` to `end`.
 
-4. `load_fred_data(data_dir)`:
-   Loads pre-saved swap rate data from a Parquet file.
+4. `load_fred_data(data_dir, start, end)`:
+   Loads pre-saved swap rate data from a Parquet file, optionally only the dates from `start` to `end`.
+
+5. `load_region_curve(region, manual_data_dir)`:
+   Loads a non-US zero curve from `MANUAL_DATA_DIR/discount_curve_<region>.csv` (a `Date` column plus one
+   column per tenor in years, rates in decimals), the local stand-in for regions without a public download.
+
+Both downloads go through the configured data source (`DATA_SOURCE_MODE`, see `data_sources.py`),
+so they can be recorded once and replayed offline.
 
 Main Process:
 - The script fetches and saves yield curve and swap rate data to Parquet files for further use.
 """
 
 
+import math
+
 import pandas as pd
-import requests
 from io import BytesIO
 from pathlib import Path
-import settings
 import io
 
 from settings import config
+from data_sources import get_data_source
 
 
 DATA_DIR = Path(config("DATA_DIR"))
+MANUAL_DATA_DIR = Path(config("MANUAL_DATA_DIR"))
 WRDS_USERNAME = config("WRDS_USERNAME")
 START_YEAR = config("START_YEAR")
 END_YEAR = config("END_YEAR")
 
-def pull_fed_yield_curve(start_year = START_YEAR):
+FED_YIELD_CURVE_URL = "https://www.federalreserve.gov/data/yield-curve-tables/feds200628.csv"
+SWAP_RATE_URLS = {
+    "DGS6MO": "https://fred.stlouisfed.org/graph/fredgraph.csv?bgcolor=%23ebf3fb&chart_type=line&drp=0&fo=open%20sans&graph_bgcolor=%23ffffff&height=450&mode=fred&recession_bars=on&txtcolor=%23444444&ts=12&tts=12&width=803&nt=0&thu=0&trc=0&show_legend=yes&show_axis_titles=yes&show_tooltip=yes&id=DGS6MO&scale=left&cosd=1981-09-01&coed=2025-03-12&line_color=%230073e6&link_values=false&line_style=solid&mark_type=none&mw=3&lw=3&ost=-99999&oet=99999&mma=0&fml=a&fq=Daily&fam=avg&fgst=lin&fgsnd=2020-02-01&line_index=1&transformation=lin&vintage_date=2025-03-14&revision_date=2025-03-14&nd=1981-09-01",
+    "DGS3MO": "https://fred.stlouisfed.org/graph/fredgraph.csv?bgcolor=%23ebf3fb&chart_type=line&drp=0&fo=open%20sans&graph_bgcolor=%23ffffff&height=450&mode=fred&recession_bars=on&txtcolor=%23444444&ts=12&tts=12&width=803&nt=0&thu=0&trc=0&show_legend=yes&show_axis_titles=yes&show_tooltip=yes&id=DGS3MO&scale=left&cosd=1981-09-01&coed=2025-03-12&line_color=%230073e6&link_values=false&line_style=solid&mark_type=none&mw=3&lw=3&ost=-99999&oet=99999&mma=0&fml=a&fq=Daily&fam=avg&fgst=lin&fgsnd=2020-02-01&line_index=1&transformation=lin&vintage_date=2025-03-14&revision_date=2025-03-14&nd=1981-09-01"
+}
+
+
+def pull_fed_yield_curve(start_year = START_YEAR, max_maturity = 5, source = None):
     """
     Download the latest yield curve from the Federal Reserve
     
     This is the published data using Gurkaynak, Sack, and Wright (2007) model
     """
-    
-    url = "https://www.federalreserve.gov/data/yield-curve-tables/feds200628.csv"
-    response = requests.get(url)
-    pdf_stream = BytesIO(response.content)
+    source = source or get_data_source()
+
+    pdf_stream = BytesIO(source.http_get(FED_YIELD_CURVE_URL))
     df = pd.read_csv(pdf_stream, skiprows=9, index_col=0, parse_dates=True)
     df.index = pd.to_datetime(df.index)
     df = df[start_year:]
     df = df.dropna(axis=0)
     df = df/100
-    cols = ['SVENY' + str(i).zfill(2) for i in range(1, 6)]
+    cols = ['SVENY' + str(i).zfill(2) for i in range(1, int(max_maturity) + 1)]
     return df[cols]
 
     
-def pull_swap_rates(start_year = START_YEAR):
-    urls = {
-        "DGS6MO": "https://fred.stlouisfed.org/graph/fredgraph.csv?bgcolor=%23ebf3fb&chart_type=line&drp=0&fo=open%20sans&graph_bgcolor=%23ffffff&height=450&mode=fred&recession_bars=on&txtcolor=%23444444&ts=12&tts=12&width=803&nt=0&thu=0&trc=0&show_legend=yes&show_axis_titles=yes&show_tooltip=yes&id=DGS6MO&scale=left&cosd=1981-09-01&coed=2025-03-12&line_color=%230073e6&link_values=false&line_style=solid&mark_type=none&mw=3&lw=3&ost=-99999&oet=99999&mma=0&fml=a&fq=Daily&fam=avg&fgst=lin&fgsnd=2020-02-01&line_index=1&transformation=lin&vintage_date=2025-03-14&revision_date=2025-03-14&nd=1981-09-01",
-        "DGS3MO": "https://fred.stlouisfed.org/graph/fredgraph.csv?bgcolor=%23ebf3fb&chart_type=line&drp=0&fo=open%20sans&graph_bgcolor=%23ffffff&height=450&mode=fred&recession_bars=on&txtcolor=%23444444&ts=12&tts=12&width=803&nt=0&thu=0&trc=0&show_legend=yes&show_axis_titles=yes&show_tooltip=yes&id=DGS3MO&scale=left&cosd=1981-09-01&coed=2025-03-12&line_color=%230073e6&link_values=false&line_style=solid&mark_type=none&mw=3&lw=3&ost=-99999&oet=99999&mma=0&fml=a&fq=Daily&fam=avg&fgst=lin&fgsnd=2020-02-01&line_index=1&transformation=lin&vintage_date=2025-03-14&revision_date=2025-03-14&nd=1981-09-01"
-    }
+def pull_swap_rates(start_year = START_YEAR, source = None):
+    source = source or get_data_source()
 
     dataframes = {}
-    for key, url in urls.items():
-        response = requests.get(url)
-        response.raise_for_status()  
+    for key, url in SWAP_RATE_URLS.items():
+        text = source.http_get(url).decode()
         
-        df = pd.read_csv(io.StringIO(response.text), parse_dates=["observation_date"])
+        df = pd.read_csv(io.StringIO(text), parse_dates=["observation_date"])
         df.columns = ["observation_date", key]  
         dataframes[key] = df
 
@@ -78,20 +90,36 @@ def pull_swap_rates(start_year = START_YEAR):
     return df_merged
 
 
-def load_fed_yield_curve(data_dir=DATA_DIR):
+def load_fed_yield_curve(data_dir=DATA_DIR, start=None, end=None):
     path = data_dir  / "fed_yield_curve.parquet"
     _df = pd.read_parquet(path)
-    return _df
+    return _df.loc[start:end] if start is not None or end is not None else _df
 
-def load_fred_data(data_dir=DATA_DIR):
+def load_fred_data(data_dir=DATA_DIR, start=None, end=None):
     path = data_dir  / "swap_rates.parquet"
     _df = pd.read_parquet(path)
-    return _df
+    return _df.loc[start:end] if start is not None or end is not None else _df
 
 
+def load_region_curve(region, manual_data_dir=MANUAL_DATA_DIR):
+    path = manual_data_dir / f"discount_curve_{region}.csv"
+    if not path.exists():
+        raise FileNotFoundError(f"No discount curve for region {region!r}; expected {path}")
+    _df = pd.read_csv(path, index_col="Date", parse_dates=["Date"])
+    # Columns are tenors in years and become the spline knots, which must be increasing
+    tenors = pd.Index([float(col) for col in _df.columns])
+    if tenors.has_duplicates:
+        raise ValueError(f"Duplicate tenors {sorted(set(tenors[tenors.duplicated()]))} in {path}")
+    _df = _df.iloc[:, tenors.argsort(kind="stable")]
+    return _df.sort_index().dropna(axis=0)
+
 
 if __name__ == "__main__":
-    df = pull_fed_yield_curve()
+    from pull_markit import CDS_TENORS, parse_tenor
+
+    # The discount curve must reach the longest CDS tenor
+    max_maturity = max(5, math.ceil(max(parse_tenor(tenor) for tenor in CDS_TENORS)))
+    df = pull_fed_yield_curve(max_maturity=max_maturity)
     path = Path(DATA_DIR) / "fed_yield_curve.parquet"
     df.to_parquet(path)
 
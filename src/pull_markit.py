@@ -2,8 +2,10 @@
 This script fetches and processes CDS (Credit Default Swap) data from WRDS for the United States.
 
 Functions:
-1. `pull_markit_data(start_year, end_year, wrds_username)`:
+1. `pull_markit_data(start_year, end_year, wrds_username, tenors)`:
    Fetches 5-year tenor CDS spread data for a given year range, averaging by ticker and trade date.
+   With `tenors` (e.g. `["1Y", "3Y", "5Y"]`) all requested tenors are pulled in the same
+   query per year and returned with a categorical `tenor` column.
 
 2. `pull_markit_sector(start_year, end_year, wrds_username)`:
    Retrieves unique sector-ticker combinations for 5-year tenor CDS contracts.
@@ -17,63 +19,354 @@ Functions:
 5. `load_multiple_data(data_dir)`:
    Loads and combines CDS data from multiple years into one dataframe.
 
+   `pull_markit_data` and both loaders take an optional `start`/`end` date window. They then read
+   only the window, plus each ticker's last observation in the `WINDOW_LOOKBACK_DAYS` before it
+   (for `spread_prev`/`RD_prev`; see `panel_layout.select_window`).
+
+6. `parse_tenor(tenor)`:
+   Converts a Markit tenor label (`6M`, `5Y`) to years.
+
+7. `markit_spread_query(table, tenors, regions, start_date, end_date)`:
+   Builds the per-year spread query for the configured tenors, regions and dates.
+
+8. `extract_markit_years(start_year, end_year, data_dir, ...)`:
+   Resumable, verified extraction of the yearly files, tracked in `markit_extract_manifest.json`.
+
+All queries go through the configured data source (`DATA_SOURCE_MODE`, see `data_sources.py`), so a
+pull can be recorded once and replayed offline.
+
 Main Process:
 - The script pulls and saves CDS data and sector-ticker link tables for each year in the specified range as Parquet files.
+  Completed years are recorded in a manifest, so an interrupted run resumes where it stopped; set
+  `MARKIT_MONTHS_PER_CHUNK` (e.g. 3) to checkpoint within a year as well.
+- Set `CDS_TENORS` (e.g. `CDS_TENORS=1Y,3Y,5Y,7Y,10Y`) to pull several tenors in one scan; the default
+  `5Y` keeps the single-tenor files of the paper.
+- Set `CDS_REGIONS` (e.g. `CDS_REGIONS=US,EU,JP`) to pull every configured country in the same scan, with a
+  `region` column (see `REGION_COUNTRIES`); the default `US` keeps the paper's United States filter.
 """
 
+import hashlib
+import json
+import os
+import shutil
 from datetime import datetime
 from pathlib import Path
 
 import numpy as np
 import pandas as pd
-import wrds
 
 from settings import config
+from data_sources import get_data_source
+from panel_layout import select_window
 
 DATA_DIR = Path(config("DATA_DIR"))
 WRDS_USERNAME = config("WRDS_USERNAME")
 START_YEAR = config("START_YEAR")
 END_YEAR = config("END_YEAR")
+EXTRACT_MANIFEST = "markit_extract_manifest.json"
+CDS_TENORS = [tenor.strip() for tenor in config("CDS_TENORS", default="5Y").split(",") if tenor.strip()]
+CDS_REGIONS = [region.strip() for region in config("CDS_REGIONS", default="US").split(",") if region.strip()]
+# How far before a date window to look for each ticker's previous quote
+WINDOW_LOOKBACK_DAYS = config("WINDOW_LOOKBACK_DAYS", default=92, cast=int)
 
+# Markit reference-entity countries pulled for each region
+REGION_COUNTRIES = {
+    "US": ["United States"],
+    "EU": [
+        "Austria", "Belgium", "Denmark", "Finland", "France", "Germany", "Ireland", "Italy",
+        "Luxembourg", "Netherlands", "Norway", "Portugal", "Spain", "Sweden", "Switzerland", "United Kingdom",
+    ],
+    "JP": ["Japan"],
+}
 
-def pull_markit_data(start_year=START_YEAR, end_year=END_YEAR, wrds_username=WRDS_USERNAME):
-    """Fetch Markit CDS data from WRDS, ensuring column consistency across years."""
-    db = wrds.Connection(wrds_username=wrds_username)
-    df_list = []
-    
-    for year in range(int(start_year), int(end_year) + 1):
-        print(f"Pulling Year {year}")
-        table = f"markit.cds{year}"
-        query = f"""
+
+def parse_tenor(tenor):
+    """Convert a Markit tenor label such as `6M` or `5Y` to years."""
+    unit, length = tenor[-1].upper(), float(tenor[:-1])
+    if unit == "Y":
+        return length
+    if unit == "M":
+        return length / 12
+    raise ValueError(f"Unknown tenor {tenor!r}")
+
+
+def _sql_list(values):
+    return ", ".join("'" + str(value).replace("'", "''") + "'" for value in values)
+
+
+def region_countries(regions):
+    """Markit `country` values covered by `regions`, e.g. `["US", "JP"]`."""
+    unknown = [region for region in regions if region not in REGION_COUNTRIES]
+    if unknown:
+        raise ValueError(f"Unknown regions {unknown}; known regions are {sorted(REGION_COUNTRIES)}")
+    return [country for region in regions for country in REGION_COUNTRIES[region]]
+
+
+def assign_region(df, regions):
+    """Replace the `country` column with a categorical `region` column."""
+    country_to_region = {country: region for region in regions for country in REGION_COUNTRIES[region]}
+    df["region"] = pd.Categorical(df["country"].map(country_to_region), categories=list(regions))
+    return df.drop(columns="country")
+
+
+def markit_spread_query(table, tenors=None, regions=None, start_date=None, end_date=None):
+    """SQL for daily average par spreads; 5Y/US only unless `tenors` or `regions` are given.
+
+    `start_date` (inclusive) and `end_date` (exclusive) restrict the query to a date range.
+    """
+    select = ["ticker", "date AS trade_date"]
+    group_by = ["ticker", "trade_date"]
+    if tenors is None:
+        where = ["tenor = '5Y'"]
+    else:
+        for tenor in tenors:
+            parse_tenor(tenor)
+        select.append("tenor")
+        group_by.append("tenor")
+        where = [f"tenor IN ({_sql_list(tenors)})"]
+    if regions is None:
+        where.append("country = 'United States'")
+    else:
+        select.append("country")
+        group_by.append("country")
+        where.append(f"country IN ({_sql_list(region_countries(regions))})")
+    if start_date is not None:
+        where.append(f"date >= '{start_date}'")
+    if end_date is not None:
+        where.append(f"date < '{end_date}'")
+    where.append("parspread IS NOT NULL")
+    return f"""
         SELECT 
-            ticker,
-            date AS trade_date,
+            {", ".join(select)},
             AVG(parspread) AS spread
         FROM {table}
-        WHERE tenor = '5Y' 
-        AND country = 'United States'
-        AND parspread IS NOT NULL
-        GROUP BY ticker, trade_date
+        WHERE {" AND ".join(where)}
+        GROUP BY {", ".join(group_by)}
         """
-        
+
+
+def _window_years(start_year, end_year, start, end, lookback_days):
+    """Years of the yearly tables or files that can hold rows of a `start`/`end` window and its lookback."""
+    first, last = int(start_year), int(end_year)
+    if start is not None:
+        first = max(first, (pd.Timestamp(start) - pd.Timedelta(days=lookback_days)).year)
+    if end is not None:
+        last = min(last, pd.Timestamp(end).year)
+    return range(first, last + 1)
+
+
+def _window_filters(start, end, lookback_days, region=None):
+    filters = [("region", "==", region)] if region is not None else []
+    if start is not None:
+        filters.append(("trade_date", ">=", pd.Timestamp(start) - pd.Timedelta(days=lookback_days)))
+    if end is not None:
+        filters.append(("trade_date", "<=", pd.Timestamp(end)))
+    return filters or None
+
+
+def pull_markit_data(
+    start_year=START_YEAR,
+    end_year=END_YEAR,
+    wrds_username=WRDS_USERNAME,
+    tenors=None,
+    regions=None,
+    source=None,
+    start=None,
+    end=None,
+    lookback_days=WINDOW_LOOKBACK_DAYS,
+):
+    """Fetch Markit CDS data from WRDS, ensuring column consistency across years.
+
+    With `tenors=None` only the 5Y tenor is pulled (the paper's panel, no `tenor` column).
+    Otherwise every tenor in `tenors` is pulled in one scan per year and kept in a
+    categorical `tenor` column. Likewise `regions` (keys of `REGION_COUNTRIES`) pulls every
+    configured country in the same scan and adds a categorical `region` column.
+
+    With a `start`/`end` date window (inclusive) only the tables and dates of the window and its
+    lookback are queried, and each series keeps one row before `start`.
+
+    Queries go through `source` (see `data_sources.py`; the `DATA_SOURCE_MODE` backend when None).
+    """
+    source = source or get_data_source()
+    db = source.connect_wrds(wrds_username)
+    df_list = []
+    start_date = end_date = None
+    if start is not None:
+        start_date = (pd.Timestamp(start) - pd.Timedelta(days=lookback_days)).strftime("%Y-%m-%d")
+    if end is not None:
+        end_date = (pd.Timestamp(end) + pd.Timedelta(days=1)).strftime("%Y-%m-%d")
+    
+    for year in _window_years(start_year, end_year, start, end, lookback_days):
+        print(f"Pulling Year {year}")
+        query = markit_spread_query(f"markit.cds{year}", tenors=tenors, regions=regions, start_date=start_date, end_date=end_date)
         new_df = db.raw_sql(query)
         df_list.append(new_df)
     
     db.close()
     
-    df_final = pd.concat(df_list, ignore_index=True)
-    df_final["trade_date"] = pd.to_datetime(df_final["trade_date"])
-    return df_final
+    df = _finalize_spreads(pd.concat(df_list, ignore_index=True), tenors, regions)
+    if start is None and end is None:
+        return df
+    return select_window(df, start, end).reset_index(drop=True)
+
+
+def _finalize_spreads(df, tenors=None, regions=None):
+    df["trade_date"] = pd.to_datetime(df["trade_date"])
+    if tenors is not None:
+        df["tenor"] = pd.Categorical(df["tenor"], categories=list(tenors))
+    if regions is not None:
+        df = assign_region(df, regions)
+    return df
+
+
+def _file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _write_atomic(df, path):
+    """Write Parquet to a temporary file and rename it, so a crash never leaves a partial file."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + ".tmp")
+    df.to_parquet(tmp_path)
+    os.replace(tmp_path, path)
+
+
+def _save_manifest(manifest, path):
+    tmp_path = path.with_name(path.name + ".tmp")
+    tmp_path.write_text(json.dumps(manifest, indent=2, sort_keys=True))
+    os.replace(tmp_path, path)
+
+
+def load_extract_manifest(data_dir=DATA_DIR):
+    path = data_dir / EXTRACT_MANIFEST
+    return json.loads(path.read_text()) if path.exists() else {}
+
+
+def _chunk_bounds(year, months_per_chunk):
+    starts = pd.date_range(f"{year}-01-01", f"{year + 1}-01-01", freq=f"{months_per_chunk}MS")
+    if starts[-1] != pd.Timestamp(f"{year + 1}-01-01"):
+        starts = starts.append(pd.DatetimeIndex([f"{year + 1}-01-01"]))
+    return [(start.strftime("%Y-%m-%d"), end.strftime("%Y-%m-%d")) for start, end in zip(starts[:-1], starts[1:])]
 
-def pull_markit_sector(start_year=START_YEAR, end_year=END_YEAR, wrds_username=WRDS_USERNAME):
-    """Fetch unique sector and ticker combinations for US 5Y tenor CDS."""
-    db = wrds.Connection(wrds_username=wrds_username)
+
+def _pull_verified(db, year, start_date, end_date, tenors=None, regions=None):
+    """
+    Pull one unit and check its row count and spread checksum against the same rows
+    aggregated on the WRDS side. Raises ValueError on mismatch.
+
+    The aggregates are window functions over the extract, returned on every row of the same
+    query, so a unit is scanned once.
+    """
+    query = markit_spread_query(f"markit.cds{year}", tenors, regions, start_date, end_date)
+    df = db.raw_sql(
+        f"SELECT extract.*, COUNT(*) OVER () AS source_rows, SUM(spread) OVER () AS source_spread_sum FROM ({query}) AS extract"
+    )
+    source_rows = int(df["source_rows"].iloc[0]) if len(df) else 0
+    source_sum = float(df["source_spread_sum"].fillna(0).iloc[0]) if len(df) else 0.0
+    df = df.drop(columns=["source_rows", "source_spread_sum"])
+    if len(df) != source_rows or not np.isclose(df["spread"].sum(), source_sum, rtol=1e-9, atol=1e-12):
+        raise ValueError(
+            f"Markit extract of {year} ({start_date or 'start'} to {end_date or 'end'}) failed verification: {len(df)} rows / spread sum "
+            f"{df['spread'].sum():.12g} pulled, {source_rows} rows / {source_sum:.12g} at the source."
+        )
+    return _finalize_spreads(df, tenors, regions), {"source_rows": source_rows, "source_spread_sum": source_sum}
+
+
+def extract_markit_years(
+    start_year=START_YEAR,
+    end_year=END_YEAR,
+    data_dir=DATA_DIR,
+    wrds_username=WRDS_USERNAME,
+    tenors=None,
+    regions=None,
+    months_per_chunk=12,
+    source=None,
+):
+    """Resumable extraction of the yearly `markit_cds<year>.parquet` files.
+
+    Each year (or each `months_per_chunk`-month chunk of a year) is one unit. A unit is
+    verified against a row count and spread checksum computed by WRDS, written atomically
+    (temporary file + rename), and recorded in `markit_extract_manifest.json` with its row
+    count and file SHA-256. On restart, units whose file still matches the manifest are
+    skipped, so the run resumes at the first incomplete unit. Changing `tenors`, `regions`
+    or `months_per_chunk` starts a fresh manifest.
+    """
+    manifest_path = data_dir / EXTRACT_MANIFEST
+    parts_dir = data_dir / "markit_parts"
+    params = {"tenors": tenors, "regions": regions, "months_per_chunk": months_per_chunk}
+    manifest = load_extract_manifest(data_dir)
+    if manifest.get("params") != params:
+        manifest = {"params": params, "years": {}, "chunks": {}}
+
+    def completed(entry, path):
+        return entry is not None and path.exists() and _file_sha256(path) == entry["sha256"]
+
+    source = source or get_data_source()
+    db = None
+    try:
+        for year in range(int(start_year), int(end_year) + 1):
+            path = data_dir / f"markit_cds{year}.parquet"
+            if completed(manifest["years"].get(str(year)), path):
+                continue
+
+            bounds = _chunk_bounds(year, months_per_chunk)
+            if db is None:
+                db = source.connect_wrds(wrds_username)
+            if len(bounds) == 1:
+                # Whole-year unit: the yearly table needs no date filter
+                print(f"Pulling Year {year}")
+                df, checks = _pull_verified(db, year, None, None, tenors, regions)
+            else:
+                parts = []
+                for start_date, end_date in bounds:
+                    chunk_id = f"{start_date}/{end_date}"
+                    part_path = parts_dir / f"markit_cds_{start_date}_{end_date}.parquet"
+                    if not completed(manifest["chunks"].get(chunk_id), part_path):
+                        print(f"Pulling {start_date} to {end_date}")
+                        part, chunk_checks = _pull_verified(db, year, start_date, end_date, tenors, regions)
+                        _write_atomic(part, part_path)
+                        manifest["chunks"][chunk_id] = {"rows": len(part), "sha256": _file_sha256(part_path), **chunk_checks}
+                        _save_manifest(manifest, manifest_path)
+                    parts.append(part_path)
+                df = pd.concat([pd.read_parquet(part_path) for part_path in parts], ignore_index=True)
+                # The year's checks cover every chunk, including those verified before a restart
+                chunks = [manifest["chunks"][f"{start_date}/{end_date}"] for start_date, end_date in bounds]
+                checks = {
+                    "source_rows": sum(chunk["source_rows"] for chunk in chunks),
+                    "source_spread_sum": sum(chunk["source_spread_sum"] for chunk in chunks),
+                }
+
+            _write_atomic(df, path)
+            manifest["years"][str(year)] = {"rows": len(df), "sha256": _file_sha256(path), **checks}
+            for start_date, end_date in bounds:
+                manifest["chunks"].pop(f"{start_date}/{end_date}", None)
+            _save_manifest(manifest, manifest_path)
+            shutil.rmtree(parts_dir, ignore_errors=True)
+    finally:
+        if db is not None:
+            db.close()
+    return manifest
+
+def pull_markit_sector(start_year=START_YEAR, end_year=END_YEAR, wrds_username=WRDS_USERNAME, regions=None, source=None):
+    """Fetch unique sector and ticker combinations for US (or `regions`) 5Y tenor CDS."""
+    source = source or get_data_source()
+
+    if regions is None:
+        country_filter, columns = "country = 'United States'", "ticker, sector"
+    else:
+        country_filter, columns = f"country IN ({_sql_list(region_countries(regions))})", "ticker, sector, country"
+
+    db = source.connect_wrds(wrds_username)
     df_list = []
     
     for year in range(int(start_year), int(end_year) + 1):
         table = f"markit.cds{year}"
         query = f"""
-        SELECT DISTINCT ticker, sector FROM {table} WHERE tenor = '5Y' AND country = 'United States'
+        SELECT DISTINCT {columns} FROM {table} WHERE tenor = '5Y' AND {country_filter}
         """
         new_df = db.raw_sql(query)
         new_df["year"] = year
@@ -83,30 +376,47 @@ def pull_markit_sector(start_year=START_YEAR, end_year=END_YEAR, wrds_username=W
     
     if df_list:
         df_final = pd.concat(df_list, ignore_index=True).drop_duplicates(subset=["sector", "ticker"], keep="first")
+        if regions is not None:
+            df_final = assign_region(df_final, regions)
         return df_final
     return pd.DataFrame()
 
-def load_markit_data(data_dir=DATA_DIR):
+def load_markit_data(data_dir=DATA_DIR, region=None, start=None, end=None, lookback_days=WINDOW_LOOKBACK_DAYS):
     path = data_dir / "Markit_CDS.parquet"
-    return pd.read_parquet(path)
+    df = pd.read_parquet(path, filters=_window_filters(start, end, lookback_days, region))
+    if start is None and end is None:
+        return df
+    return select_window(df, start, end).reset_index(drop=True)
 
 def load_sector_data(data_dir=DATA_DIR):
     path = data_dir / "markit_ticker_sector_link_table.parquet"
     return pd.read_parquet(path)
 
-def load_multiple_data(data_dir=DATA_DIR):
+def load_multiple_data(data_dir=DATA_DIR, region=None, start=None, end=None, lookback_days=WINDOW_LOOKBACK_DAYS):
+    """Load the yearly Markit files; with `region`, only that region's rows are read, and with a
+    `start`/`end` window only the files and rows of the window and its lookback."""
+    filters = _window_filters(start, end, lookback_days, region)
     df_list = []
-    for year in range(int(START_YEAR), int(END_YEAR) + 1):
+    for year in _window_years(START_YEAR, END_YEAR, start, end, lookback_days):
         filename = f"markit_cds{year}.parquet"
         path = data_dir / filename
-        df_list.append(pd.read_parquet(path))
-    return pd.concat(df_list, ignore_index=True)
+        df_list.append(pd.read_parquet(path, filters=filters))
+    df = pd.concat(df_list, ignore_index=True)
+    for column in ["tenor", "region"]:
+        if column in df.columns:
+            # Yearly files may carry different category sets; concat falls back to object
+            df[column] = df[column].astype("category")
+    if start is None and end is None:
+        return df
+    return select_window(df, start, end).reset_index(drop=True)
 
 if __name__ == "__main__":
-    for year in range(int(START_YEAR), int(END_YEAR) + 1):
-        df = pull_markit_data(year, year)
-        filename = f"markit_cds{year}.parquet"
-        df.to_parquet(DATA_DIR / filename)
+    tenors = None if CDS_TENORS == ["5Y"] else CDS_TENORS
+    regions = None if CDS_REGIONS == ["US"] else CDS_REGIONS
+    # Resumes after the last verified year if a previous run was interrupted
+    extract_markit_years(
+        tenors=tenors, regions=regions, months_per_chunk=config("MARKIT_MONTHS_PER_CHUNK", default=12, cast=int)
+    )
     
-    df_sector = pull_markit_sector()
+    df_sector = pull_markit_sector(regions=regions)
     df_sector.to_parquet(DATA_DIR / "markit_ticker_sector_link_table.parquet")
@@ -0,0 +1,311 @@
+"""
+This module runs a long-lived, read-only query service over the computed CDS returns and portfolios,
+so analysts share one memory-resident copy of the panels instead of each notebook loading its own.
+
+The daily return panel is held sorted by ticker and trade date, with a ticker -> row range index
+and per-ticker date arrays for binary search, so a query for a set of tickers and a date range
+touches only the matching rows. Results are returned as Arrow IPC streams over localhost HTTP
+or a Unix domain socket. Before answering a request the service checks the modification time of
+the underlying Parquet files and reloads them when they changed.
+
+Endpoints (all GET):
+- `/returns?tickers=A,B&start=2008-01-01&end=2009-12-31`: Daily returns for a set of tickers.
+- `/portfolios?portfolios=1,20&start=200801&end=200912`: Monthly portfolio returns.
+- `/sectors?sectors=Energy&start=2008-01-01&end=2009-12-31`: Average daily return per sector and date.
+- `/health`: Row counts and load time of the current snapshot (JSON).
+
+Functions and classes include:
+- `ReturnStore`: Memory-resident, indexed snapshot of the return panels with hot reload.
+- `make_server`: Builds a threaded HTTP server over TCP or a Unix socket.
+- `read_arrow`, `query`, `query_unix`: Client helpers returning pandas DataFrames.
+"""
+
+import argparse
+import http.client
+import json
+import os
+import socket
+import socketserver
+import threading
+import time
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+import pandas as pd
+
+from settings import config
+from calc_cds_daily_return import load_cds_return
+from create_portfolio import load_portfolio
+from pull_markit import load_sector_data
+from panel_layout import sort_panel, ticker_offsets
+
+DATA_DIR = Path(config("DATA_DIR"))
+
+ARROW_STREAM_TYPE = "application/vnd.apache.arrow.stream"
+RETURN_FILE = "CDS_daily_return.parquet"
+PORTFOLIO_FILE = "portfolio_return.parquet"
+SECTOR_FILE = "markit_ticker_sector_link_table.parquet"
+
+
+class ReturnStore:
+    """
+    Indexed, memory-resident snapshot of the daily returns, portfolio returns and sector table.
+    """
+
+    def __init__(self, data_dir=DATA_DIR):
+        self.data_dir = Path(data_dir)
+        self._lock = threading.Lock()
+        self._versions = None
+        self.refresh()
+
+    def _file_versions(self):
+        versions = {}
+        for name in [RETURN_FILE, PORTFOLIO_FILE, SECTOR_FILE]:
+            path = self.data_dir / name
+            versions[name] = (path.stat().st_mtime_ns, path.stat().st_size) if path.exists() else None
+        return versions
+
+    def refresh(self):
+        """
+        Reload the panels if any underlying Parquet file changed. Returns True on reload.
+        """
+        versions = self._file_versions()
+        if versions == self._versions:
+            return False
+        with self._lock:
+            if versions == self._versions:
+                return False
+            self._load()
+            self._versions = versions
+        return True
+
+    def _load(self):
+        # The file is written in canonical order, so sort_panel is normally a no-op
+        daily = sort_panel(load_cds_return(self.data_dir)).reset_index(drop=True)
+        offsets = ticker_offsets(daily)
+
+        portfolio_path = self.data_dir / PORTFOLIO_FILE
+        sector_path = self.data_dir / SECTOR_FILE
+        if portfolio_path.exists():
+            portfolio = load_portfolio(self.data_dir)
+        else:
+            portfolio = pd.DataFrame({"yyyymm": [], "portfolio": pd.Series([], dtype=np.int64), "daily_return": []})
+        sector = load_sector_data(self.data_dir) if sector_path.exists() else pd.DataFrame(columns=["ticker", "sector"])
+
+        # Swap the whole snapshot at once so readers never see a half-loaded state
+        self.snapshot = {
+            "daily": daily,
+            "trade_date": daily["trade_date"].to_numpy(),
+            "ticker_index": dict(zip(offsets["ticker"], zip(offsets["start"], offsets["stop"]))),
+            "portfolio": portfolio.sort_values(["portfolio", "yyyymm"]).reset_index(drop=True),
+            "sector": sector[["ticker", "sector"]].drop_duplicates(),
+            "loaded_at": time.time(),
+        }
+
+    def _ticker_rows(self, snapshot, ticker, start, end):
+        if ticker not in snapshot["ticker_index"]:
+            return np.array([], dtype=np.int64)
+        lo, hi = snapshot["ticker_index"][ticker]
+        dates = snapshot["trade_date"][lo:hi]
+        first = lo + (np.searchsorted(dates, np.datetime64(start), "left") if start is not None else 0)
+        last = lo + (np.searchsorted(dates, np.datetime64(end), "right") if end is not None else hi - lo)
+        return np.arange(first, last)
+
+    def returns(self, tickers=None, start=None, end=None):
+        """
+        Daily returns for `tickers` (all when None) between `start` and `end` inclusive.
+        """
+        snapshot = self.snapshot
+        daily = snapshot["daily"]
+        if tickers is None:
+            mask = np.ones(len(daily), dtype=bool)
+            if start is not None:
+                mask &= snapshot["trade_date"] >= np.datetime64(start)
+            if end is not None:
+                mask &= snapshot["trade_date"] <= np.datetime64(end)
+            return daily[mask].reset_index(drop=True)
+        rows = [self._ticker_rows(snapshot, ticker, start, end) for ticker in tickers]
+        rows = np.concatenate(rows) if rows else np.array([], dtype=np.int64)
+        return daily.iloc[rows].reset_index(drop=True)
+
+    def portfolios(self, portfolios=None, start=None, end=None):
+        """
+        Monthly portfolio returns for `portfolios` (all when None) between yyyymm codes `start` and `end`.
+        """
+        portfolio = self.snapshot["portfolio"]
+        mask = np.ones(len(portfolio), dtype=bool)
+        if portfolios is not None:
+            mask &= portfolio["portfolio"].isin(portfolios).to_numpy()
+        if start is not None:
+            mask &= (portfolio["yyyymm"] >= float(start)).to_numpy()
+        if end is not None:
+            mask &= (portfolio["yyyymm"] <= float(end)).to_numpy()
+        return portfolio[mask].reset_index(drop=True)
+
+    def sector_aggregates(self, sectors=None, start=None, end=None):
+        """
+        Average daily return and number of names per sector and trade date.
+        """
+        daily = self.returns(start=start, end=end)
+        daily = daily.merge(self.snapshot["sector"], on="ticker", how="inner")
+        if sectors is not None:
+            daily = daily[daily["sector"].isin(sectors)]
+        return (
+            daily.groupby(["sector", "trade_date"])["daily_return"]
+            .agg(["mean", "count"])
+            .rename(columns={"mean": "daily_return", "count": "n_names"})
+            .reset_index()
+        )
+
+
+def to_arrow_bytes(df):
+    """
+    Serialize a DataFrame as an Arrow IPC stream.
+    """
+    import pyarrow as pa
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def read_arrow(payload):
+    """
+    Deserialize an Arrow IPC stream into a pandas DataFrame.
+    """
+    import pyarrow as pa
+
+    return pa.ipc.open_stream(payload).read_all().to_pandas()
+
+
+def _split(params, key, cast=str):
+    if key not in params:
+        return None
+    return [cast(item) for value in params[key] for item in value.split(",") if item]
+
+
+def _single(params, key):
+    return params[key][0] if key in params else None
+
+
+def make_handler(store):
+    class QueryHandler(BaseHTTPRequestHandler):
+        def address_string(self):
+            # Unix socket clients have no (host, port) address
+            return self.client_address[0] if isinstance(self.client_address, tuple) else "unix"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send(self, status, payload, content_type):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            params = parse_qs(url.query)
+            try:
+                store.refresh()
+                if url.path == "/returns":
+                    df = store.returns(_split(params, "tickers"), _single(params, "start"), _single(params, "end"))
+                elif url.path == "/portfolios":
+                    df = store.portfolios(
+                        _split(params, "portfolios", int), _single(params, "start"), _single(params, "end")
+                    )
+                elif url.path == "/sectors":
+                    df = store.sector_aggregates(
+                        _split(params, "sectors"), _single(params, "start"), _single(params, "end")
+                    )
+                elif url.path == "/health":
+                    snapshot = store.snapshot
+                    body = {
+                        "daily_rows": len(snapshot["daily"]),
+                        "tickers": len(snapshot["ticker_index"]),
+                        "portfolio_rows": len(snapshot["portfolio"]),
+                        "loaded_at": snapshot["loaded_at"],
+                    }
+                    self._send(200, json.dumps(body).encode(), "application/json")
+                    return
+                else:
+                    self._send(404, f"Unknown endpoint {url.path}".encode(), "text/plain")
+                    return
+            except (ValueError, KeyError) as error:
+                self._send(400, str(error).encode(), "text/plain")
+                return
+            self._send(200, to_arrow_bytes(df), ARROW_STREAM_TYPE)
+
+    return QueryHandler
+
+
+class ThreadingUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def server_bind(self):
+        socketserver.UnixStreamServer.server_bind(self)
+        self.server_name, self.server_port = "localhost", 0
+
+
+def make_server(store, host="127.0.0.1", port=8765, unix_socket=None):
+    """
+    Build a threaded HTTP server over TCP (`host`, `port`) or over a Unix domain socket.
+    """
+    handler = make_handler(store)
+    if unix_socket is not None:
+        if os.path.exists(unix_socket):
+            os.remove(unix_socket)
+        return ThreadingUnixHTTPServer(str(unix_socket), handler)
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def query(url):
+    """
+    Query the service over TCP, e.g. `query("http://127.0.0.1:8765/returns?tickers=AAPL")`.
+    """
+    with urllib.request.urlopen(url) as response:
+        return read_arrow(response.read())
+
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, socket_path):
+        super().__init__("localhost")
+        self.socket_path = str(socket_path)
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(self.socket_path)
+
+
+def query_unix(socket_path, path):
+    """
+    Query the service over a Unix domain socket, e.g. `query_unix("/tmp/cds.sock", "/portfolios")`.
+    """
+    connection = _UnixHTTPConnection(socket_path)
+    try:
+        connection.request("GET", path)
+        response = connection.getresponse()
+        payload = response.read()
+        if response.status != 200:
+            raise ValueError(payload.decode())
+        return read_arrow(payload)
+    finally:
+        connection.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve CDS returns and portfolios over Arrow IPC.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix-socket", default=None)
+    args = parser.parse_args()
+
+    server = make_server(ReturnStore(), args.host, args.port, args.unix_socket)
+    print(f"Serving CDS returns on {args.unix_socket or f'http://{args.host}:{args.port}'}")
+    server.serve_forever()
@@ -0,0 +1,106 @@
+"""
+This script computes CDS daily returns and spread-sorted portfolios for several regions at once.
+
+Markit data pulled with `CDS_REGIONS` (see `pull_markit.py`) carries a `region` column. Each region
+is processed in its own worker process: it reads only its own rows, builds the discount curve from
+its own source (Fed/FRED for the US, `MANUAL_DATA_DIR/discount_curve_<region>.csv` otherwise),
+computes RD and daily returns (per tenor when the panel has several), and forms the 20 portfolios.
+Results are written as region-partitioned Parquet datasets, one `region=<region>` directory per
+region, so a region can be recomputed without touching the others.
+
+Functions include:
+- `process_region`: Computes and writes the daily returns and portfolios of one region.
+- `run_regions`: Runs `process_region` for several regions in parallel worker processes.
+- `load_cds_return_by_region`, `load_portfolio_by_region`: Load the region-partitioned outputs.
+"""
+
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import pandas as pd
+
+from settings import config
+from calc_cds_daily_return import compute_daily_returns, region_rf_data
+from create_portfolio import calc_monthly_panel, construct_cds_portfolios, filter_tickers_by_min_months
+from pull_markit import CDS_REGIONS, load_markit_data, load_multiple_data
+
+DATA_DIR = Path(config("DATA_DIR"))
+MANUAL_DATA_DIR = Path(config("MANUAL_DATA_DIR"))
+
+RETURN_DATASET = "CDS_daily_return_by_region"
+PORTFOLIO_DATASET = "portfolio_return_by_region"
+
+
+def _write_partition(df, dataset_dir, region):
+    """
+    Replace the `region=<region>` partition of a dataset, leaving the other regions untouched.
+    """
+    partition = dataset_dir / f"region={region}"
+    tmp_partition = dataset_dir / f".region={region}.tmp"
+    shutil.rmtree(tmp_partition, ignore_errors=True)
+    tmp_partition.mkdir(parents=True)
+    df.to_parquet(tmp_partition / "part-0.parquet", index=False)
+    shutil.rmtree(partition, ignore_errors=True)
+    os.replace(tmp_partition, partition)
+
+
+def process_region(region, data_dir=DATA_DIR, manual_data_dir=MANUAL_DATA_DIR, spread_max=0.5, min_months=6):
+    """
+    Compute daily returns and portfolios for one region and write its partitions.
+    Returns the number of daily return and portfolio rows written.
+    """
+    if (data_dir / "Markit_CDS.parquet").exists():
+        markit = load_markit_data(data_dir, region=region)
+    else:
+        markit = load_multiple_data(data_dir, region=region)
+    markit = markit.drop(columns="region")
+
+    rf_data = region_rf_data(markit, region, data_dir=data_dir, manual_data_dir=manual_data_dir)
+    curve, daily = compute_daily_returns(markit, rf_data)
+    curve.save(data_dir / f"discount_curve_{region}.npz")
+    _write_partition(daily, data_dir / RETURN_DATASET, region)
+
+    # Portfolios are formed on the paper's 5Y tenor
+    if "tenor" in daily.columns:
+        daily = daily[daily["tenor"] == "5Y"].drop(columns="tenor")
+    monthly = calc_monthly_panel(daily, spread_max=spread_max)
+    filtered = filter_tickers_by_min_months(monthly, min_months=min_months)
+    portfolio = construct_cds_portfolios(filtered, monthly)
+    _write_partition(portfolio, data_dir / PORTFOLIO_DATASET, region)
+    return len(daily), len(portfolio)
+
+
+def run_regions(regions=CDS_REGIONS, data_dir=DATA_DIR, manual_data_dir=MANUAL_DATA_DIR, max_workers=None):
+    """
+    Process `regions` in parallel, one worker process per region. Returns `{region: (n_daily, n_portfolio)}`.
+    """
+    regions = list(regions)
+    max_workers = max_workers or min(len(regions), os.cpu_count() or 1)
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            region: executor.submit(process_region, region, data_dir, manual_data_dir) for region in regions
+        }
+        return {region: future.result() for region, future in futures.items()}
+
+
+def _load_dataset(path, regions=None, columns=None):
+    filters = [("region", "in", list(regions))] if regions is not None else None
+    df = pd.read_parquet(path, columns=columns, filters=filters)
+    if "region" in df.columns:
+        df["region"] = df["region"].cat.remove_unused_categories()
+    return df
+
+
+def load_cds_return_by_region(data_dir=DATA_DIR, regions=None, columns=None):
+    return _load_dataset(data_dir / RETURN_DATASET, regions, columns)
+
+
+def load_portfolio_by_region(data_dir=DATA_DIR, regions=None, columns=None):
+    return _load_dataset(data_dir / PORTFOLIO_DATASET, regions, columns)
+
+
+if __name__ == "__main__":
+    for region, (n_daily, n_portfolio) in run_regions().items():
+        print(f"{region}: {n_daily} daily returns, {n_portfolio} portfolio-months")
@@ -0,0 +1,146 @@
+"""
+This module computes rolling-window correlation and covariance matrices between the replicated CDS
+portfolios and the original He-Kelly-Manela CDS portfolios.
+
+All window lengths are served from one set of prefix sums of the returns and their cross-products,
+so each window position costs O(1) per portfolio pair regardless of the window length, instead of
+re-running `.corr()` on every window. An exponentially weighted variant uses the same sums with a
+recursive decay.
+
+Functions include:
+- `align_portfolio_returns`: Aligns the replicated pivot table with the original series on common months.
+- `rolling_cross_moments`: Rolling covariance and correlation matrices for many window lengths at once.
+- `ewm_cross_moments`: Exponentially weighted covariance and correlation matrices.
+- `matched_correlation`: Extracts the correlation of each replicated portfolio with its original counterpart.
+"""
+
+import numpy as np
+import pandas as pd
+
+from misc_tools import month_code_to_date
+
+
+def align_portfolio_returns(replicated, actual):
+    """
+    Align the replicated pivot table (indexed by yyyymm codes) with the original
+    CDS returns (indexed by dates) on common months with no missing values.
+    """
+    replicated = replicated.copy()
+    replicated.index = pd.to_datetime([month_code_to_date(code) for code in replicated.index])
+    actual = actual.copy()
+    actual.index = pd.to_datetime(actual.index)
+
+    columns = [col for col in replicated.columns if col in actual.columns]
+    common = replicated.index.intersection(actual.index)
+    replicated = replicated.loc[common, columns]
+    actual = actual.loc[common, columns]
+
+    complete = replicated.notna().all(axis=1) & actual.notna().all(axis=1)
+    return replicated[complete], actual[complete]
+
+
+def _cov_to_corr(cov, var_x, var_y):
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return cov / np.sqrt(var_x[..., :, None] * var_y[..., None, :])
+
+
+def rolling_cross_moments(x, y, windows):
+    """
+    Compute rolling covariance and correlation matrices between the columns of `x` (T x N)
+    and `y` (T x M) for every window length in `windows`.
+
+    Returns a dictionary keyed by window length with arrays `"cov"` and `"corr"` of shape
+    (T, N, M). Rows before the first full window are NaN.
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    # Centering by the full-sample mean leaves covariances unchanged and keeps the
+    # prefix sums well conditioned.
+    x = x - x.mean(axis=0)
+    y = y - y.mean(axis=0)
+
+    def prefix(a):
+        return np.concatenate([np.zeros((1,) + a.shape[1:]), np.cumsum(a, axis=0)])
+
+    sum_x, sum_y = prefix(x), prefix(y)
+    sum_xx, sum_yy = prefix(x**2), prefix(y**2)
+    sum_xy = prefix(x[:, :, None] * y[:, None, :])
+
+    n_obs = len(x)
+    results = {}
+    for window in windows:
+        cov = np.full((n_obs, x.shape[1], y.shape[1]), np.nan)
+        corr = np.full_like(cov, np.nan)
+        if window <= n_obs:
+            end = np.arange(window, n_obs + 1)
+            sx = sum_x[end] - sum_x[end - window]
+            sy = sum_y[end] - sum_y[end - window]
+            sxx = sum_xx[end] - sum_xx[end - window]
+            syy = sum_yy[end] - sum_yy[end - window]
+            sxy = sum_xy[end] - sum_xy[end - window]
+
+            window_cov = (sxy - sx[:, :, None] * sy[:, None, :] / window) / (window - 1)
+            var_x = (sxx - sx**2 / window) / (window - 1)
+            var_y = (syy - sy**2 / window) / (window - 1)
+            cov[window - 1:] = window_cov
+            corr[window - 1:] = _cov_to_corr(window_cov, var_x, var_y)
+        results[window] = {"cov": cov, "corr": corr}
+    return results
+
+
+def ewm_cross_moments(x, y, halflife=None, alpha=None, min_periods=2):
+    """
+    Compute exponentially weighted covariance and correlation matrices between the columns
+    of `x` (T x N) and `y` (T x M), matching `pandas.DataFrame.ewm(..., adjust=True)` with
+    the unbiased covariance correction.
+
+    Each step decays the running weighted sums and adds the new observation, so the
+    whole path costs O(T) regardless of the effective window length.
+    """
+    if (halflife is None) == (alpha is None):
+        raise ValueError("Specify exactly one of halflife or alpha.")
+    if alpha is None:
+        alpha = 1 - np.exp(-np.log(2) / halflife)
+    decay = 1 - alpha
+
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    x = x - x.mean(axis=0)
+    y = y - y.mean(axis=0)
+
+    n_obs, n_x, n_y = len(x), x.shape[1], y.shape[1]
+    cov = np.full((n_obs, n_x, n_y), np.nan)
+    corr = np.full_like(cov, np.nan)
+
+    weight, weight_sq = 0.0, 0.0
+    sum_x, sum_y = np.zeros(n_x), np.zeros(n_y)
+    sum_xx, sum_yy = np.zeros(n_x), np.zeros(n_y)
+    sum_xy = np.zeros((n_x, n_y))
+    for t in range(n_obs):
+        weight = decay * weight + 1
+        weight_sq = decay**2 * weight_sq + 1
+        sum_x = decay * sum_x + x[t]
+        sum_y = decay * sum_y + y[t]
+        sum_xx = decay * sum_xx + x[t] ** 2
+        sum_yy = decay * sum_yy + y[t] ** 2
+        sum_xy = decay * sum_xy + np.outer(x[t], y[t])
+        if t + 1 < min_periods:
+            continue
+
+        mean_x, mean_y = sum_x / weight, sum_y / weight
+        bias = weight**2 / (weight**2 - weight_sq)
+        step_cov = (sum_xy / weight - np.outer(mean_x, mean_y)) * bias
+        var_x = (sum_xx / weight - mean_x**2) * bias
+        var_y = (sum_yy / weight - mean_y**2) * bias
+        cov[t] = step_cov
+        corr[t] = _cov_to_corr(step_cov, var_x, var_y)
+    return {"cov": cov, "corr": corr}
+
+
+def matched_correlation(corr, index=None, columns=None):
+    """
+    Extract the diagonal of a (T, N, N) correlation array, i.e. the correlation of each
+    replicated portfolio with the matching original portfolio, as a T x N DataFrame.
+    """
+    diagonal = np.diagonal(corr, axis1=1, axis2=2)
+    return pd.DataFrame(diagonal, index=index, columns=columns)
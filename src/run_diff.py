@@ -0,0 +1,269 @@
+"""
+This script compares the outputs of two pipeline runs and reports which ticker-dates and
+portfolio-months moved, and by how much.
+
+Every write of `CDS_daily_return.parquet` and `portfolio_return.parquet` also writes a content
+manifest next to the file (`<name>.manifest.parquet`): one 64-bit hash per block of rows, a block
+being one ticker (or portfolio) in one calendar year. A block hash is the wrapping sum of the
+row hashes of `pd.util.hash_pandas_object`, so it is computed in one vectorized pass, and the
+hash of a year partition is the sum of its block hashes.
+
+A diff compares the manifests of the two runs first: partitions with equal hashes are skipped,
+and in the remaining ones only the blocks whose hashes differ are read (for the daily returns
+through the per-ticker row-group index, see `load_cds_return`) and diffed row by row. Numeric
+values count as changed when they differ by more than `atol + rtol * |old|`; blocks whose hashes
+differ but whose values are all within the tolerances are reported as such. A missing or stale
+manifest is rebuilt from its file.
+
+Functions include:
+- `build_manifest`, `write_manifest`, `read_manifest`, `load_manifest`: Block content hashes of an output file.
+- `changed_blocks`: Compares two manifests, partitions first.
+- `diff_rows`: Row-level diff of two tables with numeric tolerances.
+- `diff_output`, `format_report`: Diff one output of two runs and summarize the result.
+"""
+
+import argparse
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from settings import config
+
+DATA_DIR = Path(config("DATA_DIR"))
+
+RTOL = 1e-9
+ATOL = 1e-12
+
+# For each output: its file, the column identifying a block within a year, and the row key
+OUTPUTS = {
+    "daily": {"file": "CDS_daily_return.parquet", "block": "ticker", "key": ["ticker", "trade_date"]},
+    "portfolio": {"file": "portfolio_return.parquet", "block": "portfolio", "key": ["yyyymm", "portfolio"]},
+}
+
+
+def manifest_path(path):
+    path = Path(path)
+    return path.with_name(path.name.replace(".parquet", ".manifest.parquet"))
+
+
+def _partition(df):
+    """
+    Calendar year of every row, from `trade_date` or the `yyyymm` month code.
+    """
+    if "trade_date" in df.columns:
+        return pd.DatetimeIndex(df["trade_date"]).year.to_numpy()
+    return (df["yyyymm"].to_numpy() // 100).astype(int)
+
+
+def build_manifest(df, block):
+    """
+    One row per (`block`, partition) with its row count and content hash.
+    """
+    if len(df) == 0:
+        return pd.DataFrame({block: df[block], "partition": [], "rows": [], "hash": np.array([], dtype=np.uint64)})
+    # The block column is constant within a block, and by far the slowest to hash
+    row_hashes = pd.util.hash_pandas_object(df.drop(columns=block), index=False).to_numpy()
+    block_codes, block_labels = pd.factorize(df[block], sort=True)
+    partition = _partition(df)
+    order = np.lexsort((partition, block_codes))
+    block_codes, partition = block_codes[order], partition[order]
+    starts = np.flatnonzero(np.r_[True, (np.diff(block_codes) != 0) | (np.diff(partition) != 0)])
+    return pd.DataFrame(
+        {
+            block: block_labels[block_codes[starts]],
+            "partition": partition[starts],
+            "rows": np.diff(np.r_[starts, len(order)]),
+            # uint64 addition wraps, which keeps the sum a well-mixed 64-bit value
+            "hash": np.add.reduceat(row_hashes[order], starts),
+        }
+    )
+
+
+def write_manifest(df, path, block):
+    """
+    Persist the content manifest of the table just written to `path`.
+    """
+    build_manifest(df, block).to_parquet(manifest_path(path), index=False)
+
+
+def _fresh(path, source):
+    return path.exists() and path.stat().st_mtime_ns >= source.stat().st_mtime_ns
+
+
+def read_manifest(path):
+    """
+    The content manifest written with the file at `path`, or None when it is missing or stale.
+    """
+    path = Path(path)
+    if _fresh(manifest_path(path), path):
+        return pd.read_parquet(manifest_path(path))
+    return None
+
+
+def load_manifest(path, block):
+    """
+    The content manifest of the file at `path`, rebuilt from the file when missing or stale.
+    """
+    manifest = read_manifest(path)
+    if manifest is not None:
+        return manifest
+    return build_manifest(pd.read_parquet(path), block)
+
+
+def changed_blocks(old, new, block):
+    """
+    Blocks that differ between the manifests `old` and `new`, with a `status` of `changed`,
+    `added` or `removed`. Partitions whose summed hashes agree are skipped without looking at
+    their blocks. Returns `(blocks, n_partitions_skipped)`.
+    """
+    partition_hash = lambda manifest: manifest.groupby("partition")["hash"].agg(
+        lambda hashes: np.add.reduce(hashes.to_numpy(dtype=np.uint64))
+    )
+    partitions = pd.concat([partition_hash(old).rename("old"), partition_hash(new).rename("new")], axis=1)
+    same = partitions["old"].eq(partitions["new"])
+    changed = partitions.index[~same]
+
+    old = old[old["partition"].isin(changed)]
+    new = new[new["partition"].isin(changed)]
+    blocks = old.merge(new, on=[block, "partition"], how="outer", suffixes=("_old", "_new"), indicator=True)
+    blocks = blocks[blocks["_merge"].ne("both") | blocks["hash_old"].ne(blocks["hash_new"])]
+    blocks["status"] = blocks["_merge"].map({"both": "changed", "left_only": "removed", "right_only": "added"})
+    blocks = blocks[[block, "partition", "status", "rows_old", "rows_new"]]
+    return blocks.sort_values([block, "partition"]).reset_index(drop=True), int(same.sum())
+
+
+def diff_rows(old, new, key, rtol=RTOL, atol=ATOL):
+    """
+    Long-format differences between `old` and `new` rows matched on `key`: one row per changed
+    numeric value (`column`, `old`, `new`, `abs_diff`), and one per added or removed row (with
+    `column` set to `<added>` or `<removed>`). Values that are NaN in both runs are equal.
+    """
+    merged = old.merge(new, on=key, how="outer", suffixes=("_old", "_new"), indicator=True)
+    numeric = [
+        col for col in old.columns
+        if col not in key and col in new.columns and pd.api.types.is_numeric_dtype(old[col])
+    ]
+
+    parts = []
+    for status, label in [("left_only", "<removed>"), ("right_only", "<added>")]:
+        rows = merged.loc[merged["_merge"] == status, key]
+        parts.append(rows.assign(column=label, old=np.nan, new=np.nan, abs_diff=np.nan))
+
+    both = merged[merged["_merge"] == "both"]
+    for col in numeric:
+        old_values = both[f"{col}_old"].to_numpy(dtype=float)
+        new_values = both[f"{col}_new"].to_numpy(dtype=float)
+        abs_diff = np.abs(new_values - old_values)
+        moved = ~(abs_diff <= atol + rtol * np.abs(old_values)) & ~(np.isnan(old_values) & np.isnan(new_values))
+        parts.append(
+            both.loc[moved, key].assign(
+                column=col, old=old_values[moved], new=new_values[moved], abs_diff=abs_diff[moved]
+            )
+        )
+    return pd.concat(parts, ignore_index=True).sort_values([*key, "column"]).reset_index(drop=True)
+
+
+def _read_blocks(data_dir, output, blocks):
+    """
+    Rows of `output` in `data_dir` that belong to `blocks` (block id and partition).
+    """
+    spec = OUTPUTS[output]
+    path = data_dir / spec["file"]
+    if output == "daily":
+        from calc_cds_daily_return import load_cds_return
+
+        # Only the row groups of the changed tickers are read
+        df = load_cds_return(data_dir, tickers=blocks[spec["block"]].unique())
+    else:
+        df = pd.read_parquet(path)
+    wanted = pd.MultiIndex.from_frame(blocks[[spec["block"], "partition"]])
+    have = pd.MultiIndex.from_arrays([df[spec["block"]].to_numpy(), _partition(df)])
+    return df[have.isin(wanted)].reset_index(drop=True)
+
+
+def diff_output(old_dir, new_dir, output="daily", rtol=RTOL, atol=ATOL):
+    """
+    Diff `output` ("daily" or "portfolio") of the runs in `old_dir` and `new_dir`. Returns a
+    dictionary with the differing `blocks`, the value-level `changes` (see `diff_rows`) and a
+    `summary` Series.
+    """
+    spec = OUTPUTS[output]
+    old_dir, new_dir = Path(old_dir), Path(new_dir)
+    started = time.perf_counter()
+    old_manifest = load_manifest(old_dir / spec["file"], spec["block"])
+    new_manifest = load_manifest(new_dir / spec["file"], spec["block"])
+    blocks, skipped = changed_blocks(old_manifest, new_manifest, spec["block"])
+
+    if blocks.empty:
+        changes = pd.DataFrame(columns=[*spec["key"], "column", "old", "new", "abs_diff"])
+    else:
+        changes = diff_rows(
+            _read_blocks(old_dir, output, blocks), _read_blocks(new_dir, output, blocks), spec["key"], rtol, atol
+        )
+
+    values = changes[~changes["column"].isin(["<added>", "<removed>"])]
+    # Blocks whose hashes differ without any value moving beyond the tolerances
+    moved = pd.MultiIndex.from_arrays([changes[spec["block"]].to_numpy(), _partition(changes)])
+    rehashed = blocks[blocks["status"] == "changed"]
+    within_tolerance = ~pd.MultiIndex.from_frame(rehashed[[spec["block"], "partition"]]).isin(moved)
+    summary = pd.Series(
+        {
+            "partitions": len(set(old_manifest["partition"]) | set(new_manifest["partition"])),
+            "partitions_skipped": skipped,
+            "blocks_differing": len(blocks),
+            "blocks_within_tolerance": int(within_tolerance.sum()),
+            "rows_added": int((changes["column"] == "<added>").sum()),
+            "rows_removed": int((changes["column"] == "<removed>").sum()),
+            "rows_changed": len(values[spec["key"]].drop_duplicates()),
+            "max_abs_diff": values["abs_diff"].max() if len(values) else 0.0,
+            "seconds": time.perf_counter() - started,
+        },
+        name=output,
+        dtype=object,
+    )
+    return {"blocks": blocks, "changes": changes, "summary": summary}
+
+
+def format_report(results, top=10):
+    """
+    Compact text report of `{output: diff_output(...)}`: the summaries, the largest change per
+    column, and the `top` keys with the largest moves.
+    """
+    lines = [pd.DataFrame({name: result["summary"] for name, result in results.items()}).to_string()]
+    for name, result in results.items():
+        changes = result["changes"]
+        values = changes[~changes["column"].isin(["<added>", "<removed>"])]
+        if values.empty:
+            continue
+        key = OUTPUTS[name]["key"]
+        by_column = values.groupby("column")["abs_diff"].agg(["count", "max", "median"])
+        lines.append(f"\n{name}: changed values by column\n{by_column.to_string()}")
+        largest = values.sort_values("abs_diff", ascending=False).head(top)
+        lines.append(f"\n{name}: largest moves\n{largest[[*key, 'column', 'old', 'new', 'abs_diff']].to_string(index=False)}")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Diff the daily returns and portfolios of two pipeline runs.")
+    parser.add_argument("old_dir", help="DATA_DIR of the reference run")
+    parser.add_argument("new_dir", nargs="?", default=DATA_DIR, help="DATA_DIR of the new run (default: DATA_DIR)")
+    parser.add_argument("--outputs", nargs="*", default=list(OUTPUTS), choices=list(OUTPUTS))
+    parser.add_argument("--rtol", type=float, default=RTOL)
+    parser.add_argument("--atol", type=float, default=ATOL)
+    parser.add_argument("--top", type=int, default=10, help="Number of largest moves to list")
+    parser.add_argument("--output", default=None, help="Parquet file for the full table of changed values")
+    args = parser.parse_args()
+
+    results = {
+        output: diff_output(args.old_dir, args.new_dir, output, rtol=args.rtol, atol=args.atol) for output in args.outputs
+    }
+    print(format_report(results, top=args.top))
+    if args.output:
+        changes = pd.concat([result["changes"].assign(output=name) for name, result in results.items()], ignore_index=True)
+        changes.to_parquet(args.output, index=False)
+
+
+if __name__ == "__main__":
+    main()
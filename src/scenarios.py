@@ -0,0 +1,172 @@
+"""
+This script revalues every CDS name under batches of curve and spread scenarios and computes CS01 and DV01.
+
+A scenario shifts the curve inputs of `merge_rf_data` (`DGS3MO`, `DGS6MO`, `SVENY01..05`) in parallel
+and/or as a twist, and bumps the spread. The natural cubic spline is linear in the knot rates, so a
+knot shift moves the zero rate at every grid tenor by a fixed weight matrix applied to the shift, the
+same on every date, and the shocked discount table is the base table times one multiplier per
+scenario and tenor. RD for all rows and scenarios is then
+
+    RD[row, s] = sum_j exp(-t_j * lambda[row, s]) * D[date(row), j] * m[s, j] / 12,
+
+computed in row chunks as one matrix product per distinct spread bump: the base discount table and
+lambda column are built once and reused by every scenario.
+
+Values are per unit notional for a protection seller on a contract with running coupon `coupon`,
+V = (coupon - spread) * RD, so that a spread change gives the `calc_cds_daily_return` return
+-(change in spread) * RD at par.
+
+Functions and classes include:
+- `make_scenarios`: A grid of parallel, twist and spread scenarios.
+- `spline_weights`, `knot_shifts`: Zero-rate response to knot shifts, and the knot shifts of each scenario.
+- `ScenarioEngine`: Shocked RD, scenario P&L, CS01 and DV01 for a panel of ticker-dates.
+"""
+
+import itertools
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from settings import config
+from calc_cds_daily_return import DiscountCurve, calc_lambda, rd_discount_table
+from panel_layout import sort_panel
+
+DATA_DIR = Path(config("DATA_DIR"))
+SCENARIO_CHUNK_BYTES = config("SCENARIO_CHUNK_BYTES", default=256 * 2**20, cast=int)
+
+BASIS_POINT = 1e-4
+SCENARIO_COLUMNS = ["parallel_bp", "twist_bp", "spread_bp"]
+
+
+def make_scenarios(parallel_bp=(0,), twist_bp=(0,), spread_bp=(0,)):
+    """
+    All combinations of parallel curve shifts, twists (change of the 5Y minus 3M rate, pivoting
+    around the middle of the curve) and spread bumps, in basis points.
+    """
+    rows = list(itertools.product(parallel_bp, twist_bp, spread_bp))
+    scenarios = pd.DataFrame(rows, columns=SCENARIO_COLUMNS, dtype=float)
+    scenarios.index = [f"parallel{p:+g}_twist{t:+g}_spread{s:+g}" for p, t, s in rows]
+    scenarios.index.name = "scenario"
+    return scenarios
+
+
+def spline_weights(knots, tenors):
+    """
+    Weights W (n_knots x n_tenors) such that shifting the knot rates by `dy` moves the spline zero
+    rates at `tenors` by `dy @ W`.
+    """
+    knots = np.asarray(knots, dtype=float)
+    unit_shifts = pd.DataFrame(np.eye(len(knots)), index=pd.date_range("2000-01-01", periods=len(knots)))
+    curve = DiscountCurve.from_rf_data(unit_shifts, knots=knots)
+    return curve.zero_rate(curve.dates, tenors)
+
+
+def knot_shifts(scenarios, knots):
+    """
+    Knot rate shifts (n_scenarios x n_knots, in rate units) of each scenario.
+    """
+    knots = np.asarray(knots, dtype=float)
+    slope = (knots - (knots[0] + knots[-1]) / 2) / (knots[-1] - knots[0])
+    parallel = scenarios["parallel_bp"].to_numpy(dtype=float)[:, None]
+    twist = scenarios["twist_bp"].to_numpy(dtype=float)[:, None]
+    return (parallel + twist * slope) * BASIS_POINT
+
+
+class ScenarioEngine:
+    """
+    Scenario revaluation of a panel of ticker-dates (`ticker`, `trade_date`, `spread`) on a `DiscountCurve`.
+    """
+
+    def __init__(self, cds_df, curve, maturity=5, L=0.6):
+        self.L = L
+        self.curve = curve
+        risk_free_term_df = rd_discount_table(curve, [f"{maturity}Y"])
+        self.grid = risk_free_term_df.columns.to_numpy(dtype=float)
+        self.discount = np.ascontiguousarray(risk_free_term_df.to_numpy(dtype=float))
+        self.weights = spline_weights(curve.knots, self.grid)
+
+        # Same rows as calc_RD: curve dates with a spread, in ticker-then-date order
+        panel = cds_df[["ticker", "trade_date", "spread"]].copy()
+        panel["trade_date"] = pd.to_datetime(panel["trade_date"])
+        panel = sort_panel(panel)
+        positions = curve.dates.get_indexer(panel["trade_date"])
+        keep = (positions >= 0) & panel["spread"].notna().to_numpy()
+        self.panel = calc_lambda(panel[keep].reset_index(drop=True))
+        self.positions = positions[keep]
+        self.spread = self.panel["spread"].to_numpy(dtype=float)
+        self.lam = self.panel["lambda"].to_numpy(dtype=float)
+
+    def shocked_rd(self, scenarios, chunk_bytes=SCENARIO_CHUNK_BYTES):
+        """
+        RD of every row under every scenario, an array of shape (n_rows, n_scenarios), computed in
+        row chunks of about `chunk_bytes` of temporaries.
+        """
+        multiplier = np.exp(-(knot_shifts(scenarios, self.curve.knots) @ self.weights) * self.grid / 12)
+        bumps, bump_of_scenario = np.unique(scenarios["spread_bp"].to_numpy(dtype=float), return_inverse=True)
+
+        n_rows, n_scenarios = len(self.spread), len(scenarios)
+        rd = np.empty((n_rows, n_scenarios))
+        rows_per_chunk = max(1, chunk_bytes // (8 * (2 * len(self.grid) + n_scenarios)))
+        for start in range(0, n_rows, rows_per_chunk):
+            rows = slice(start, start + rows_per_chunk)
+            discount = self.discount[self.positions[rows]]
+            for k, bump in enumerate(bumps):
+                if bump == 0:
+                    lam = self.lam[rows]
+                else:
+                    lam = 12 * np.log(1 + (self.spread[rows] + bump * BASIS_POINT) / (12 * self.L))
+                weighted = np.exp(-lam[:, None] * self.grid) * discount
+                columns = np.flatnonzero(bump_of_scenario == k)
+                rd[rows, columns] = weighted @ multiplier[columns].T / 12
+        return rd
+
+    def scenario_pnl(self, scenarios, coupon=0.01, chunk_bytes=SCENARIO_CHUNK_BYTES):
+        """
+        Change in value of every row under every scenario, (coupon - shocked spread) * shocked RD
+        minus the base value, an array of shape (n_rows, n_scenarios).
+        """
+        base = make_scenarios()
+        rd = self.shocked_rd(pd.concat([base, scenarios]), chunk_bytes)
+        shocked_spread = self.spread[:, None] + scenarios["spread_bp"].to_numpy(dtype=float) * BASIS_POINT
+        base_value = (coupon - self.spread) * rd[:, 0]
+        return (coupon - shocked_spread) * rd[:, 1:] - base_value[:, None]
+
+    def sensitivities(self, coupon=0.01, chunk_bytes=SCENARIO_CHUNK_BYTES):
+        """
+        Base RD, CS01 (value change for a 1bp spread widening) and DV01 (value change for a 1bp
+        parallel rise of the curve inputs) of every row.
+        """
+        bumps = pd.DataFrame(
+            [[0, 0, 0], [0, 0, 1], [1, 0, 0]], columns=SCENARIO_COLUMNS, index=["base", "spread+1bp", "parallel+1bp"]
+        )
+        rd = self.shocked_rd(bumps, chunk_bytes)
+        base_value = (coupon - self.spread) * rd[:, 0]
+        return self.panel[["ticker", "trade_date", "spread"]].assign(
+            RD=rd[:, 0],
+            CS01=(coupon - self.spread - BASIS_POINT) * rd[:, 1] - base_value,
+            DV01=(coupon - self.spread) * rd[:, 2] - base_value,
+        )
+
+
+def main():
+    from calc_cds_daily_return import load_cds_return
+
+    daily = load_cds_return(columns=["ticker", "trade_date", "spread"])
+    engine = ScenarioEngine(daily, DiscountCurve.load(DATA_DIR / "discount_curve.npz"))
+    engine.sensitivities().to_parquet(DATA_DIR / "cds_sensitivities.parquet", index=False)
+
+    # Scenario P&L on the latest date, one column per scenario
+    scenarios = make_scenarios(
+        parallel_bp=range(-100, 101, 25), twist_bp=(-50, 0, 50), spread_bp=(-50, -10, 0, 10, 50, 100)
+    )
+    latest = daily[daily["trade_date"] == daily["trade_date"].max()]
+    latest_engine = ScenarioEngine(latest, engine.curve)
+    pnl = pd.DataFrame(latest_engine.scenario_pnl(scenarios), columns=scenarios.index)
+    pnl = pd.concat([latest_engine.panel[["ticker", "trade_date"]], pnl], axis=1)
+    pnl.to_parquet(DATA_DIR / "scenario_pnl.parquet", index=False)
+    print(pnl.drop(columns=["ticker", "trade_date"]).sum().describe())
+
+
+if __name__ == "__main__":
+    main()
@@ -74,6 +74,8 @@ d["START_YEAR"] = _config("START_YEAR", default="2001")
 d["END_YEAR"] = _config("END_YEAR", default="2025")
 d["PIPELINE_DEV_MODE"] = _config("PIPELINE_DEV_MODE", default=True, cast=bool)
 d["PIPELINE_THEME"] = _config("PIPELINE_THEME", default="pipeline")
+# Only needed to talk to WRDS; replayed data sources and the offline test suite run without it
+d["WRDS_USERNAME"] = _config("WRDS_USERNAME", default="")
 
 ## Paths
 d["DATA_DIR"] = if_relative_make_abs(_config('DATA_DIR', default=Path('_data'), cast=Path))
@@ -0,0 +1,103 @@
+"""
+Test suite for the cache-aware artifact renderer:
+1. `test_render_artifacts_skips_unchanged_units`: A second run with identical inputs renders nothing.
+2. `test_render_artifacts_rerenders_affected_units`: Tweaking one portfolio only re-renders units whose slice contains it.
+3. `test_helper_change_rerenders`: Editing a helper module the renderer imports from re-renders the unit.
+"""
+
+import importlib
+
+import pandas as pd
+
+from artifacts import *
+
+
+def write_portfolio_csv(portfolio, name, output_dir):
+    portfolio.to_csv(output_dir / f"{name}.csv", index=False)
+
+
+def _portfolio():
+    return pd.DataFrame(
+        {
+            "yyyymm": [200101.0, 200101.0, 200102.0, 200102.0],
+            "portfolio": [1, 2, 1, 2],
+            "daily_return": [0.01, 0.02, 0.03, 0.04],
+        }
+    )
+
+
+def _units():
+    return [
+        ArtifactUnit(
+            "portfolio_1",
+            write_portfolio_csv,
+            lambda data: (data["portfolio"][data["portfolio"]["portfolio"] == 1],),
+            ["portfolio_1.csv"],
+            kwargs={"name": "portfolio_1"},
+        ),
+        ArtifactUnit(
+            "all_portfolios",
+            write_portfolio_csv,
+            lambda data: (data["portfolio"],),
+            ["all_portfolios.csv"],
+            kwargs={"name": "all_portfolios"},
+        ),
+    ]
+
+
+def test_render_artifacts_skips_unchanged_units(tmp_path):
+    """
+    Units whose input slice and render code are unchanged must be skipped.
+    """
+    data = {"portfolio": _portfolio()}
+    first = render_artifacts(_units(), data, output_dir=tmp_path, max_workers=2)
+    second = render_artifacts(_units(), data, output_dir=tmp_path, max_workers=2)
+
+    assert first == {"portfolio_1": "rendered", "all_portfolios": "rendered"}
+    assert second == {"portfolio_1": "skipped", "all_portfolios": "skipped"}
+    assert (tmp_path / "portfolio_1.csv").exists()
+
+    # A deleted output is re-rendered even though its inputs did not change
+    (tmp_path / "portfolio_1.csv").unlink()
+    third = render_artifacts(_units(), data, output_dir=tmp_path, max_workers=2)
+    assert third["portfolio_1"] == "rendered"
+
+
+def test_render_artifacts_rerenders_affected_units(tmp_path):
+    """
+    Changing portfolio 2 must leave the portfolio-1 unit untouched.
+    """
+    data = {"portfolio": _portfolio()}
+    render_artifacts(_units(), data, output_dir=tmp_path, max_workers=2)
+
+    tweaked = _portfolio()
+    tweaked.loc[tweaked["portfolio"] == 2, "daily_return"] += 0.001
+    status = render_artifacts(_units(), {"portfolio": tweaked}, output_dir=tmp_path, max_workers=2)
+
+    assert status == {"portfolio_1": "skipped", "all_portfolios": "rendered"}
+    output = pd.read_csv(tmp_path / "all_portfolios.csv")
+    assert output["daily_return"].tolist() == tweaked["daily_return"].tolist()
+
+
+def test_helper_change_rerenders(tmp_path, monkeypatch):
+    """
+    A change to a project module the render function calls into must invalidate the unit.
+    """
+    code_dir, output_dir = tmp_path / "code", tmp_path / "output"
+    code_dir.mkdir()
+    (code_dir / "report_helpers.py").write_text("def scale(x):\n    return x * 100\n")
+    (code_dir / "report_render.py").write_text(
+        "from report_helpers import scale\n\n\n"
+        "def write_scaled(portfolio, output_dir):\n"
+        "    scale(portfolio).to_csv(output_dir / 'scaled.csv', index=False)\n"
+    )
+    monkeypatch.syspath_prepend(str(code_dir))
+    render = importlib.import_module("report_render").write_scaled
+    units = [ArtifactUnit("scaled", render, lambda data: (data["portfolio"],), ["scaled.csv"])]
+    data = {"portfolio": _portfolio()}
+
+    assert [path.name for path in code_sources(units[0])] == ["report_helpers.py", "report_render.py"]
+    render_artifacts(units, data, output_dir=output_dir, max_workers=1)
+    assert render_artifacts(units, data, output_dir=output_dir, max_workers=1) == {"scaled": "skipped"}
+    (code_dir / "report_helpers.py").write_text("def scale(x):\n    return x * 10000\n")
+    assert render_artifacts(units, data, output_dir=output_dir, max_workers=1) == {"scaled": "rendered"}
@@ -0,0 +1,69 @@
+"""
+Test suite for the vectorized block bootstrap:
+1. `test_bootstrap_indices`: Block and stationary indices have the right shape, range and block structure.
+2. `test_resample_statistics_matches_loop`: Batched statistics equal a per-resample pandas computation.
+3. `test_bootstrap_is_reproducible_across_workers`: Intervals depend on the seed, not on the number of worker processes.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from bootstrap import *
+
+
+def _returns(n_obs=120, n_portfolios=20, seed=0):
+    rng = np.random.default_rng(seed)
+    common = rng.normal(0.002, 0.01, size=(n_obs, 1))
+    replicated = pd.DataFrame(
+        common + rng.normal(0, 0.005, size=(n_obs, n_portfolios)),
+        columns=[f"CDS_{k}" for k in range(1, n_portfolios + 1)],
+    )
+    actual = replicated + rng.normal(0, 0.003, size=replicated.shape)
+    return replicated, actual
+
+
+def test_bootstrap_indices():
+    rng = np.random.default_rng(0)
+    block = block_bootstrap_indices(rng, 100, 50, block_length=7)
+    assert block.shape == (50, 100)
+    assert block.min() >= 0 and block.max() < 100
+    # Within a block, indices advance by one (modulo the sample length)
+    steps = (np.diff(block[:, :98].reshape(50, 14, 7), axis=2)) % 100
+    assert (steps == 1).all()
+
+    stationary = stationary_bootstrap_indices(rng, 200, 2_000, mean_block_length=5)
+    assert stationary.shape == (2_000, 200)
+    assert stationary.min() >= 0 and stationary.max() < 200
+    breaks = (np.diff(stationary, axis=1) % 200) != 1
+    assert 200 / (1 + breaks.sum(axis=1).mean()) == pytest.approx(5, rel=0.1)
+
+
+def test_resample_statistics_matches_loop():
+    replicated, actual = _returns(n_obs=60, n_portfolios=4)
+    indices = block_bootstrap_indices(np.random.default_rng(1), 60, 3, block_length=6)
+    stats = resample_statistics(replicated.to_numpy(), indices, actual.to_numpy())
+
+    for r, rows in enumerate(indices):
+        sample, benchmark = replicated.iloc[rows].reset_index(drop=True), actual.iloc[rows].reset_index(drop=True)
+        np.testing.assert_allclose(stats["mean"][r], sample.mean().to_numpy())
+        np.testing.assert_allclose(stats["sharpe"][r], (sample.mean() / sample.std() * np.sqrt(12)).to_numpy())
+        np.testing.assert_allclose(stats["correlation"][r], sample.corrwith(benchmark).to_numpy())
+        np.testing.assert_allclose(stats["average_correlation"][r], sample.mean(axis=1).corr(benchmark.mean(axis=1)))
+
+
+def test_bootstrap_is_reproducible_across_workers():
+    replicated, actual = _returns()
+    kwargs = dict(n_resamples=2_500, batch_size=1_000, block_length=6, seed=7)
+    serial = bootstrap_portfolio_statistics(replicated, actual, max_workers=1, **kwargs)
+    parallel = bootstrap_portfolio_statistics(replicated, actual, max_workers=2, **kwargs)
+    pd.testing.assert_frame_equal(serial, parallel)
+
+    assert len(serial) == 3 * 20 + 1
+    assert set(serial["statistic"]) == {"mean", "sharpe", "correlation", "average_correlation"}
+    assert (serial["lower"] <= serial["estimate"]).all() and (serial["estimate"] <= serial["upper"]).all()
+
+    block = bootstrap_portfolio_statistics(replicated, actual, method="block", max_workers=1, **kwargs)
+    assert not np.allclose(block["lower"], serial["lower"])
+    with pytest.raises(ValueError):
+        bootstrap_portfolio_statistics(replicated, method="iid")
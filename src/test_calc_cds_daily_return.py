@@ -5,6 +5,7 @@ import pandas as pd
 import numpy as np
 from pandas.testing import assert_frame_equal
 import datetime
+import pytest
 
 from calc_cds_daily_return import *
 
@@ -120,3 +121,275 @@ def test_calc_cds_daily_return():
     assert "daily_return" in output.columns
     assert not output["daily_return"].isnull().any()
 
+
+
+def test_load_cds_return_memory_map(tmp_path):
+    """
+    The memory-mapped sidecar must return the same values as the Parquet file as an
+    Arrow-backed frame, without allocating a copy of the data, and must be ignored once
+    the Parquet file is newer.
+    """
+    import os
+    import pyarrow as pa
+
+    n = 200_000
+    df = pd.DataFrame(
+        {
+            "ticker": np.repeat(["A", "B"], n // 2),
+            "trade_date": np.tile(pd.date_range("2001-01-01", periods=n // 2, freq="h"), 2),
+            "daily_return": np.linspace(-0.01, 0.01, n),
+        }
+    )
+    write_cds_return(df, data_dir=tmp_path)
+
+    allocated_before = pa.total_allocated_bytes()
+    output = load_cds_return(data_dir=tmp_path, columns=["ticker", "daily_return"], memory_map=True)
+    assert pa.total_allocated_bytes() - allocated_before < df["daily_return"].nbytes
+
+    assert isinstance(output["daily_return"].dtype, pd.ArrowDtype)
+    np.testing.assert_array_equal(output["daily_return"].to_numpy(dtype=float), df["daily_return"].to_numpy())
+    assert output["ticker"].tolist() == df["ticker"].tolist()
+
+    stale = df.assign(daily_return=0.0)
+    stale.to_parquet(tmp_path / "CDS_daily_return.parquet")
+    sidecar = tmp_path / "CDS_daily_return.arrow"
+    os.utime(sidecar, ns=(0, 0))
+    output = load_cds_return(data_dir=tmp_path, memory_map=True)
+    assert (output["daily_return"] == 0.0).all()
+
+
+def test_discount_curve(tmp_path):
+    """
+    DiscountCurve must reproduce scipy's natural cubic spline (including extrapolation
+    beyond the 3M-5Y knots), evaluate per-date tenor batches, and survive a save/load round trip.
+    """
+    from scipy.interpolate import CubicSpline
+
+    rng = np.random.default_rng(0)
+    rf_data = pd.DataFrame(
+        0.02 + rng.normal(0, 0.005, size=(5, 7)),
+        index=pd.DatetimeIndex(pd.bdate_range("2022-01-03", periods=5), name="Date"),
+        columns=["DGS3MO", "DGS6MO", "SVENY01", "SVENY02", "SVENY03", "SVENY04", "SVENY05"],
+    )
+    curve = DiscountCurve.from_rf_data(rf_data)
+    tenors = np.array([1 / 365, 1 / 12, 0.25, 0.7, 2.5, 5.0, 7.0, 10.0])
+
+    output = curve.zero_rate(rf_data.index[[3, 1]], tenors)
+    for row, date in enumerate(rf_data.index[[3, 1]]):
+        spline = CubicSpline([0.25, 0.5, 1, 2, 3, 4, 5], rf_data.loc[date].values, bc_type="natural")
+        np.testing.assert_allclose(output[row], spline(tenors), rtol=1e-12, atol=1e-14)
+
+    per_date = curve.discount_factor(rf_data.index[:2], np.array([[1.0, 2.0], [3.0, 4.0]]))
+    np.testing.assert_allclose(per_date[1], curve.discount_factor(rf_data.index[1], [3.0, 4.0])[0])
+
+    curve.save(tmp_path / "curve.npz")
+    loaded = DiscountCurve.load(tmp_path / "curve.npz")
+    assert loaded.dates.equals(curve.dates)
+    np.testing.assert_array_equal(loaded.discount_factor(rf_data.index, tenors), curve.discount_factor(rf_data.index, tenors))
+
+    with pytest.raises(KeyError):
+        curve.zero_rate(pd.Timestamp("1999-01-01"), tenors)
+
+
+def test_calc_RD_by_tenor():
+    """
+    Multi-tenor RD over one shared discount table must equal the single-tenor `calc_RD`
+    with each tenor's own maturity, and keep the lags within (tenor, ticker).
+    """
+    rng = np.random.default_rng(0)
+    dates = pd.bdate_range("2022-01-03", periods=6)
+    n_months = 84
+    discount = pd.DataFrame(
+        np.exp(-0.03 * np.arange(1, n_months + 1) / 12) * (1 + rng.normal(0, 1e-3, size=(len(dates), 1))),
+        index=dates,
+        columns=np.linspace(1 / 12, n_months / 12, n_months),
+    )
+    panel = pd.DataFrame(
+        [(ticker, date, tenor) for tenor in ["7Y", "1Y", "3Y"] for ticker in ["B", "A"] for date in dates[::-1]],
+        columns=["ticker", "trade_date", "tenor"],
+    )
+    panel["spread"] = rng.uniform(0.005, 0.05, len(panel))
+    panel["tenor"] = pd.Categorical(panel["tenor"], categories=["1Y", "3Y", "7Y"])
+
+    output = calc_RD_by_tenor(panel.copy(), discount)
+
+    assert output["tenor"].tolist() == sorted(output["tenor"].tolist(), key=["1Y", "3Y", "7Y"].index)
+    for tenor, maturity in [("1Y", 1), ("3Y", 3), ("7Y", 7)]:
+        single = panel[panel["tenor"] == tenor].drop(columns="tenor")
+        expected = calc_RD(single.copy(), discount, maturity=maturity).reset_index(drop=True)
+        result = output[output["tenor"] == tenor].drop(columns="tenor").reset_index(drop=True)
+        assert_frame_equal(result, expected[result.columns], check_exact=False, rtol=1e-12)
+
+    # A date window keeps the lags from the rows before it, and both of its bounds
+    window = calc_RD_by_tenor(panel.copy(), discount, start=dates[2], end=dates[4])
+    assert window["trade_date"].min() == dates[2] and window["trade_date"].max() == dates[4]
+    in_window = output[output["trade_date"].between(dates[2], dates[4])].reset_index(drop=True)
+    assert_frame_equal(window, in_window)
+
+    with pytest.raises(ValueError):
+        calc_RD_by_tenor(panel.copy(), discount.iloc[:, :60])
+
+
+def test_write_cds_return_is_atomic(tmp_path, monkeypatch):
+    """
+    A write that fails part-way must leave the previous return file, its offsets index,
+    manifest and sidecar in place and consistent.
+    """
+    from pyarrow import feather
+
+    from run_diff import read_manifest
+
+    dates = pd.bdate_range("2022-01-03", periods=20)
+    df = pd.DataFrame([(t, d) for t in ["A", "B"] for d in dates], columns=["ticker", "trade_date"])
+    df["daily_return"] = np.random.default_rng(0).normal(0, 0.001, len(df))
+    write_cds_return(df, data_dir=tmp_path)
+    before = load_cds_return(tmp_path, tickers=["B"])
+
+    def fail(*args, **kwargs):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(feather, "write_feather", fail)
+    with pytest.raises(OSError):
+        write_cds_return(df.assign(daily_return=0.0), data_dir=tmp_path)
+
+    assert_frame_equal(load_cds_return(tmp_path, tickers=["B"]), before)
+    mapped = load_cds_return(tmp_path, memory_map=True)
+    np.testing.assert_array_equal(mapped["daily_return"].to_numpy(dtype=float), df["daily_return"].to_numpy())
+    assert read_manifest(tmp_path / "CDS_daily_return.parquet") is not None
+
+
+def test_load_cds_return_point_lookup(tmp_path):
+    """
+    Ticker/date lookups must read only the row groups holding the requested tickers and
+    return exactly the rows a full read followed by a filter would.
+    """
+    dates = pd.bdate_range("2007-01-01", periods=500)
+    tickers = [f"T{i:03d}" for i in range(300)]
+    df = pd.DataFrame({"ticker": np.repeat(tickers, len(dates)), "trade_date": np.tile(dates, len(tickers))})
+    df["daily_return"] = np.random.default_rng(0).normal(0, 0.001, len(df))
+    write_cds_return(df.sample(frac=1, random_state=0), data_dir=tmp_path)
+
+    groups = cds_return_row_groups(tmp_path, tickers=["T150"], start="2008-01-01", end="2008-12-31")
+    assert 0 < len(groups) <= 2
+
+    full = load_cds_return(data_dir=tmp_path)
+    for lookup in [
+        {"tickers": ["T150"], "start": "2008-01-01", "end": "2008-12-31"},
+        {"tickers": ["T000", "T299", "missing"]},
+        {"start": "2008-06-02", "end": "2008-06-02"},
+    ]:
+        mask = np.ones(len(full), dtype=bool)
+        if "tickers" in lookup:
+            mask &= full["ticker"].isin(lookup["tickers"])
+        if "start" in lookup:
+            mask &= (full["trade_date"] >= lookup["start"]) & (full["trade_date"] <= lookup["end"])
+        expected = full[mask]
+
+        output = load_cds_return(data_dir=tmp_path, columns=["daily_return"], **lookup)
+        assert output.columns.tolist() == ["daily_return"]
+        np.testing.assert_array_equal(output["daily_return"].to_numpy(), expected["daily_return"].to_numpy())
+
+        mapped = load_cds_return(data_dir=tmp_path, memory_map=True, **lookup)
+        np.testing.assert_array_equal(mapped["daily_return"].to_numpy(dtype=float), expected["daily_return"].to_numpy())
+
+
+def test_float32_compute_mode():
+    """
+    The float32 RD path stays within tolerance of float64, returns float64 columns,
+    and the run-time check rejects a tolerance the reduced precision cannot meet.
+    """
+    rng = np.random.default_rng(0)
+    dates = pd.bdate_range("2022-01-03", "2022-04-29")
+    tenors = [0.25, 0.5, 1, 2, 3, 4, 5]
+    rates = 0.02 + 0.002 * np.arange(len(tenors)) + rng.normal(0, 1e-4, size=(len(dates), len(tenors)))
+    rf_data = pd.DataFrame(rates, index=pd.DatetimeIndex(dates, name="Date"), columns=tenors)
+    markit = pd.DataFrame([(t, d) for t in ["A", "B", "C", "D"] for d in dates], columns=["ticker", "trade_date"])
+    markit["spread"] = rng.uniform(0.002, 0.2, len(markit))
+
+    _, expected = compute_daily_returns(markit.copy(), rf_data, dtype="float64")
+    _, result = compute_daily_returns(markit.copy(), rf_data, dtype="float32", tolerance=1e-6)
+    assert (result.dtypes == expected.dtypes).all()
+    np.testing.assert_allclose(result["RD"], expected["RD"], rtol=1e-5)
+    assert np.abs(result["daily_return"] - expected["daily_return"]).max() < 1e-6
+
+    risk_free_term_df = rd_discount_table(DiscountCurve.from_rf_data(rf_data))
+    deviations = check_reduced_precision(markit, risk_free_term_df, result, tolerance=1e-6)
+    assert 0 < deviations["daily_return"] < 1e-6
+    with pytest.raises(ValueError, match="deviates from float64"):
+        check_reduced_precision(markit, risk_free_term_df, result, tolerance=1e-15)
+
+
+def test_region_rf_data_keeps_5y_knots(tmp_path):
+    """
+    A Fed table saved out to 10 years (for longer CDS tenors) must not change the 5Y RD: a 5Y
+    panel is priced off the 1-5 year knots only, a multi-tenor panel off the knots it needs.
+    """
+    rng = np.random.default_rng(0)
+    dates = pd.bdate_range("2022-01-03", periods=8)
+    fed = pd.DataFrame(
+        0.02 + 0.002 * np.arange(1, 11) + rng.normal(0, 1e-3, size=(len(dates), 10)),
+        index=pd.DatetimeIndex(dates, name="Date"),
+        columns=[f"SVENY{i:02d}" for i in range(1, 11)],
+    )
+    fred = pd.DataFrame({"DGS3MO": 0.015, "DGS6MO": 0.017}, index=pd.DatetimeIndex(dates, name="Date"))
+    fed.to_parquet(tmp_path / "fed_yield_curve.parquet")
+    fred.to_parquet(tmp_path / "swap_rates.parquet")
+    markit = pd.DataFrame([(t, d) for t in ["A", "B"] for d in dates], columns=["ticker", "trade_date"])
+    markit["spread"] = rng.uniform(0.005, 0.05, len(markit))
+
+    rf_data = region_rf_data(markit, "US", data_dir=tmp_path)
+    assert list(rf_data.columns) == ["DGS3MO", "DGS6MO", *[f"SVENY{i:02d}" for i in range(1, 6)]]
+    _, daily = compute_daily_returns(markit.copy(), rf_data)
+    _, pinned = compute_daily_returns(markit.copy(), merge_rf_data(fed.iloc[:, :5], fred, markit))
+    assert_frame_equal(daily, pinned)
+
+    by_tenor = pd.concat([markit.assign(tenor="5Y"), markit.assign(tenor="7Y")], ignore_index=True)
+    assert region_rf_data(by_tenor, "US", data_dir=tmp_path).columns[-1] == "SVENY07"
+
+
+def test_5y_returns_ignore_longer_tenors(tmp_path):
+    """
+    The 5Y returns of a multi-tenor run (the slice written to `CDS_daily_return.parquet`) must be
+    identical to a 5Y-only run, although the curve then reaches 10 years: each tenor is priced
+    off the knots up to its own maturity.
+    """
+    from pipeline import Pipeline
+
+    rng = np.random.default_rng(1)
+    dates = pd.bdate_range("2022-01-03", "2022-03-31")
+    fed = pd.DataFrame(
+        0.02 + 0.002 * np.arange(1, 11) + rng.normal(0, 1e-3, size=(len(dates), 10)),
+        index=pd.DatetimeIndex(dates, name="Date"),
+        columns=[f"SVENY{i:02d}" for i in range(1, 11)],
+    )
+    fred = pd.DataFrame({"DGS3MO": 0.015, "DGS6MO": 0.017}, index=pd.DatetimeIndex(dates, name="Date"))
+    fed.to_parquet(tmp_path / "fed_yield_curve.parquet")
+    fred.to_parquet(tmp_path / "swap_rates.parquet")
+    markit = pd.DataFrame([(t, d) for t in ["A", "B", "C"] for d in dates], columns=["ticker", "trade_date"])
+    markit["spread"] = rng.uniform(0.005, 0.05, len(markit))
+    by_tenor = pd.concat([markit.assign(tenor=tenor) for tenor in ["1Y", "5Y", "7Y", "10Y"]], ignore_index=True)
+    by_tenor["tenor"] = by_tenor["tenor"].astype("category")
+
+    rf_5y = region_rf_data(markit, "US", data_dir=tmp_path)
+    rf_10y = region_rf_data(by_tenor, "US", data_dir=tmp_path)
+    assert rf_10y.columns[-1] == "SVENY10"
+    for engine in RD_ENGINES:
+        _, expected = compute_daily_returns(markit.copy(), rf_5y, engine=engine)
+        _, daily = compute_daily_returns(by_tenor.copy(), rf_10y, engine=engine)
+        five = daily[daily["tenor"] == "5Y"].drop(columns="tenor").reset_index(drop=True)
+        assert_frame_equal(five, expected.reset_index(drop=True), check_exact=True)
+
+    # The 5Y file and portfolios the pipeline writes
+    for name, panel, rf_data in [("5y", markit, rf_5y), ("by_tenor", by_tenor, rf_10y)]:
+        (tmp_path / name).mkdir()
+        Pipeline(panel, rf_data, checkpoints=("daily", "portfolio"), pushdown=False, data_dir=tmp_path / name).run()
+    assert_frame_equal(
+        load_cds_return(tmp_path / "by_tenor").reset_index(drop=True),
+        load_cds_return(tmp_path / "5y").reset_index(drop=True),
+        check_exact=True,
+    )
+    assert_frame_equal(
+        pd.read_parquet(tmp_path / "by_tenor" / "portfolio_return.parquet"),
+        pd.read_parquet(tmp_path / "5y" / "portfolio_return.parquet"),
+        check_exact=True,
+    )
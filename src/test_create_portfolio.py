@@ -1,6 +1,7 @@
 """Test suite for validating functions related to portfolio creation, including month assignment, 
 monthly return computation, portfolio construction, and reshaping data into wide format."""
 
+import numpy as np
 import pandas as pd
 from pathlib import Path
 
@@ -109,3 +110,62 @@ def test_pivot_table():
 
     output_df = pivot_table(input_df)
     pd.testing.assert_frame_equal(output_df, expected_output, check_dtype=False)
+
+
+def test_calc_monthly_panel():
+    """
+    The fused kernel must match create_yyyymm_col + calc_cds_monthly_return + groupby.first
+    on an unsorted panel, and report observation counts and month coverage.
+    """
+    daily = pd.DataFrame(
+        {
+            "ticker": ["B", "A", "A", "A", "B", "A", "B"],
+            "trade_date": pd.to_datetime(
+                ["2023-01-03", "2023-01-04", "2023-01-03", "2023-02-01", "2023-01-04", "2023-01-05", "2023-02-01"]
+            ),
+            "spread": [0.02, 0.011, 0.01, 0.012, 0.6, 0.013, 0.03],
+            "daily_return": [0.001, 0.002, -0.001, 0.004, 0.003, 0.005, -0.002],
+        }
+    )
+
+    output = calc_monthly_panel(daily, spread_max=0.5)
+
+    filtered = create_yyyymm_col(daily[daily["spread"] < 0.5].copy())
+    expected = calc_cds_monthly_return(filtered)
+    first_spread = filtered.sort_values("trade_date").groupby(["ticker", "yyyymm"])["spread"].first()
+
+    pd.testing.assert_frame_equal(output[["ticker", "yyyymm", "daily_return"]], expected)
+    assert output["spread"].tolist() == first_spread.tolist()
+    assert output["n_obs"].tolist() == [3, 1, 1, 1]
+    # January has three trading days in the panel; B has one usable day (the other is filtered)
+    assert output["coverage"].tolist() == [1.0, 1.0, 1 / 3, 1.0]
+
+
+def test_construct_rebalanced_portfolios():
+    """
+    Vectorized ranking must match a per-date pd.qcut, including ties at breakpoints, and the
+    monthly rebalancing without signal lag must reproduce construct_cds_portfolios.
+    """
+    rng = np.random.default_rng(0)
+    dates = pd.bdate_range("2023-01-02", "2023-06-30")
+    tickers = [f"T{k:02d}" for k in range(45)]
+    daily = pd.DataFrame([(t, d) for t in tickers for d in dates], columns=["ticker", "trade_date"])
+    daily["spread"] = rng.integers(1, 2400, len(daily)) / 4000
+    daily["daily_return"] = rng.normal(0, 1e-3, len(daily))
+    daily = daily.sample(frac=0.9, random_state=0)
+
+    filtered = daily[daily["spread"] < 0.5].sort_values(["ticker", "trade_date"])
+    signal = filtered.groupby("ticker")["spread"].shift(1)
+    expected = filtered.assign(signal=signal).dropna(subset=["signal"])
+    expected["portfolio"] = expected.groupby("trade_date")["signal"].transform(lambda x: pd.qcut(x, 20, labels=False) + 1)
+    expected = expected.groupby(["trade_date", "portfolio"])["daily_return"].mean().reset_index()
+    output = construct_rebalanced_portfolios(daily, "daily", signal_lag=1, spread_max=0.5)
+    pd.testing.assert_frame_equal(output, expected)
+
+    weekly = construct_rebalanced_portfolios(daily, "weekly", signal_lag=1, spread_max=0.5)
+    assert (weekly["trade_date"].dt.dayofweek == 0).all()
+
+    monthly = calc_monthly_panel(daily, spread_max=0.5)
+    valid = filter_tickers_by_min_months(monthly, min_months=6)
+    output = construct_rebalanced_portfolios(daily, "monthly", signal_lag=0, spread_max=0.5, tickers=valid["ticker"].unique())
+    pd.testing.assert_frame_equal(output, construct_cds_portfolios(valid, monthly), check_exact=True)
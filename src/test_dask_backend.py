@@ -0,0 +1,75 @@
+"""
+Test suite for the Dask backend, run on an in-process `LocalCluster`:
+1. `test_distributed_matches_single_process`: Daily returns, monthly panel and portfolios equal the single-process pipeline,
+   including tickers whose previous observation lies one or more years back.
+2. `test_workers_read_yearly_files`: Partitions read straight from the yearly Markit files give the same returns.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip("dask.distributed")
+
+from calc_cds_daily_return import DiscountCurve, compute_daily_returns
+from create_portfolio import calc_monthly_panel, construct_cds_portfolios, filter_tickers_by_min_months
+from dask_backend import *
+
+
+def _inputs():
+    rng = np.random.default_rng(0)
+    dates = pd.bdate_range("2004-10-01", "2006-03-31")
+    tenors = [0.25, 0.5, 1, 2, 3, 4, 5]
+    rates = 0.02 + 0.002 * np.arange(len(tenors)) + rng.normal(0, 1e-4, size=(len(dates), len(tenors)))
+    rf_data = pd.DataFrame(rates, index=pd.DatetimeIndex(dates, name="Date"), columns=tenors)
+
+    tickers = [f"T{i:02d}" for i in range(45)]
+    markit = pd.DataFrame([(t, d) for t in tickers for d in dates], columns=["ticker", "trade_date"])
+    markit["spread"] = rng.uniform(0.002, 0.05, len(markit))
+    markit = markit[rng.random(len(markit)) > 0.1]
+    # T03 is absent for all of 2005, so its lag in 2006 comes from 2004
+    markit = markit[~((markit["ticker"] == "T03") & (markit["trade_date"].dt.year == 2005))]
+    return markit.reset_index(drop=True), rf_data
+
+
+def _single_process(markit, rf_data):
+    curve, daily = compute_daily_returns(markit.copy(), rf_data)
+    monthly = pd.concat(
+        [calc_monthly_panel(part, spread_max=0.5) for _, part in daily.groupby(daily["trade_date"].dt.year)],
+        ignore_index=True,
+    )
+    portfolio = construct_cds_portfolios(filter_tickers_by_min_months(monthly, min_months=6), monthly)
+    return curve, daily.reset_index(drop=True), monthly, portfolio
+
+
+@pytest.fixture(scope="module")
+def client(tmp_path_factory):
+    with get_client(n_workers=2, processes=False, local_directory=tmp_path_factory.mktemp("dask")) as client:
+        yield client
+
+
+def test_distributed_matches_single_process(client):
+    markit, rf_data = _inputs()
+    curve, daily, monthly, portfolio = _single_process(markit, rf_data)
+
+    assert ticker_ranges(["B", "A", "C", "A"], 2) == [("A", "B"), ("C", "C")]
+    partitions = split_markit(markit, n_buckets=4)
+    assert {year for _, year in partitions} == {2004, 2005, 2006}
+
+    result = compute_returns_distributed(client, partitions, curve)
+    pd.testing.assert_frame_equal(result["daily"], daily[result["daily"].columns], check_exact=False, rtol=1e-12)
+    pd.testing.assert_frame_equal(result["monthly"], monthly, check_exact=False, rtol=1e-12)
+    pd.testing.assert_frame_equal(result["portfolio"], portfolio, check_exact=False, rtol=1e-12)
+
+
+def test_workers_read_yearly_files(client, tmp_path):
+    markit, rf_data = _inputs()
+    for year, part in markit.groupby(markit["trade_date"].dt.year):
+        part.to_parquet(tmp_path / f"markit_cds{year}.parquet", index=False)
+    curve, daily, _, portfolio = _single_process(markit, rf_data)
+
+    specs = markit_read_specs(tmp_path, n_buckets=3, start_year=2004, end_year=2006)
+    assert len(specs) == 9
+    result = compute_returns_distributed(client, specs, curve)
+    np.testing.assert_allclose(result["daily"]["daily_return"], daily["daily_return"], rtol=1e-12)
+    pd.testing.assert_frame_equal(result["portfolio"], portfolio, check_exact=False, rtol=1e-12)
@@ -0,0 +1,95 @@
+"""
+Test suite for the factor regressions:
+1. `test_hkm_cache_projection`: The Parquet cache is built once, rebuilt when the CSV changes, and serves projected columns.
+2. `test_ols_matches_per_target_regressions`: The multi-target solve equals one regression per target.
+3. `test_rolling_betas_match_window_regressions`: Rolling and expanding betas equal direct regressions on each window.
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from factor_pricing import *
+
+
+def _panel(n_obs=90, n_targets=6, seed=0):
+    rng = np.random.default_rng(seed)
+    factors = pd.DataFrame(rng.normal(size=(n_obs, 3)), columns=["mkt_rf", "smb", "hml"])
+    loadings = rng.normal(size=(3, n_targets))
+    targets = pd.DataFrame(
+        0.1 + factors.to_numpy() @ loadings + rng.normal(scale=0.5, size=(n_obs, n_targets)),
+        columns=[f"CDS_{k:02d}" for k in range(1, n_targets + 1)],
+    )
+    return targets, factors
+
+
+def test_hkm_cache_projection(tmp_path):
+    manual_dir = tmp_path / "manual"
+    data_dir = tmp_path / "data"
+    manual_dir.mkdir()
+    data_dir.mkdir()
+    csv = pd.DataFrame(
+        {
+            "yyyymm": [200101, 200102, 200103],
+            "mkt_rf": [0.01, np.nan, 0.03],
+            "smb": [0.1, 0.2, 0.3],
+            "CDS_01": [1.0, 2.0, 3.0],
+        }
+    )
+    csv.to_csv(manual_dir / HKM_FILE, index=False)
+
+    df = load_hkm_columns(["smb"], data_dir, manual_dir)
+    assert list(df.columns) == ["smb"]
+    assert len(df) == 3
+    assert df.index[0] == pd.Timestamp("2001-01-01")
+    # Rows with a missing projected column are dropped
+    assert len(load_hkm_columns(["mkt_rf", "smb"], data_dir, manual_dir)) == 2
+
+    cache = data_dir / HKM_CACHE
+    built = cache.stat().st_mtime_ns
+    load_hkm_columns(["CDS_01"], data_dir, manual_dir)
+    assert cache.stat().st_mtime_ns == built
+
+    csv.assign(smb=[0.4, 0.5, 0.6]).to_csv(manual_dir / HKM_FILE, index=False)
+    os.utime(manual_dir / HKM_FILE, ns=(built + 10**9, built + 10**9))
+    assert load_hkm_columns(["smb"], data_dir, manual_dir)["smb"].tolist() == [0.4, 0.5, 0.6]
+
+
+def test_ols_matches_per_target_regressions():
+    targets, factors = _panel()
+    result = ols(targets, factors)
+    x = np.column_stack([np.ones(len(factors)), factors.to_numpy()])
+    n_obs, n_params = x.shape
+    for target in targets.columns:
+        y = targets[target].to_numpy()
+        beta, _, _, _ = np.linalg.lstsq(x, y, rcond=None)
+        residuals = y - x @ beta
+        sigma2 = residuals @ residuals / (n_obs - n_params)
+        tvalues = beta / np.sqrt(sigma2 * np.diag(np.linalg.inv(x.T @ x)))
+        r2 = 1 - residuals @ residuals / ((y - y.mean()) ** 2).sum()
+        np.testing.assert_allclose(result["params"].loc[target].to_numpy(), beta)
+        np.testing.assert_allclose(result["tvalues"].loc[target].to_numpy(), tvalues)
+        assert result["fit"].loc[target, "r2"] == pytest.approx(r2)
+    assert list(result["params"].columns) == ["const", "mkt_rf", "smb", "hml"]
+
+
+def test_rolling_betas_match_window_regressions():
+    targets, factors = _panel()
+    factor_sets = [["mkt_rf", "smb", "hml"], ["smb"]]
+    betas = rolling_betas(targets, factors, windows=[24, None], factor_sets=factor_sets, min_periods=12)
+    y = targets.to_numpy()
+
+    for factor_set in factor_sets:
+        x = np.column_stack([np.ones(len(factors)), factors[factor_set].to_numpy()])
+        rolling = betas[(tuple(factor_set), 24)]
+        expanding = betas[(tuple(factor_set), None)]
+        assert rolling.shape == (len(y), 1 + len(factor_set), y.shape[1])
+        assert np.isnan(rolling[:23]).all() and np.isnan(expanding[:11]).all()
+        for t in [23, 50, len(y) - 1]:
+            expected, _, _, _ = np.linalg.lstsq(x[t - 23 : t + 1], y[t - 23 : t + 1], rcond=None)
+            np.testing.assert_allclose(rolling[t], expected, atol=1e-10)
+        for t in [11, 60, len(y) - 1]:
+            expected, _, _, _ = np.linalg.lstsq(x[: t + 1], y[: t + 1], rcond=None)
+            np.testing.assert_allclose(expanding[t], expected, atol=1e-10)
@@ -0,0 +1,60 @@
+"""
+Import-time benchmark for the pipeline modules. Every `dodo` action starts a fresh interpreter,
+so module import cost is paid on every step:
+1. `test_import_create_portfolio_budget`: `import create_portfolio` in a fresh interpreter stays under the time budget.
+2. `test_no_heavy_imports_at_module_load`: Library and report modules do not load `wrds`, `matplotlib`, `seaborn`, `scipy` or `requests` on import.
+
+The budget can be tuned with the `IMPORT_TIME_BUDGET` environment variable (seconds).
+"""
+
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+from settings import config
+
+IMPORT_TIME_BUDGET = config("IMPORT_TIME_BUDGET", default=1.5, cast=float)
+HEAVY_MODULES = ["wrds", "matplotlib", "seaborn", "scipy", "requests"]
+SRC_DIR = Path(__file__).absolute().parent
+
+
+def _import_in_fresh_interpreter(module):
+    code = (
+        "import json, sys, time\n"
+        "start = time.perf_counter()\n"
+        f"import {module}\n"
+        "elapsed = time.perf_counter() - start\n"
+        f"print(json.dumps({{'elapsed': elapsed, 'loaded': [m for m in {HEAVY_MODULES!r} if m in sys.modules]}}))\n"
+    )
+    env = dict(os.environ, WRDS_USERNAME=os.environ.get("WRDS_USERNAME", "username"))
+    result = subprocess.run(
+        [sys.executable, "-c", code], cwd=SRC_DIR, env=env, capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def test_import_create_portfolio_budget():
+    """
+    Importing create_portfolio (best of three runs) must stay under the budget.
+    """
+    elapsed = min(_import_in_fresh_interpreter("create_portfolio")["elapsed"] for _ in range(3))
+    assert elapsed < IMPORT_TIME_BUDGET, f"import create_portfolio took {elapsed:.3f}s"
+
+
+def test_no_heavy_imports_at_module_load():
+    """
+    Heavy dependencies must only load when the function that needs them runs.
+    """
+    for module in [
+        "create_portfolio",
+        "calc_cds_daily_return",
+        "misc_tools",
+        "pull_markit",
+        "pull_interest_rates_data",
+        "summary_stats",
+        "generate_latex_files",
+    ]:
+        loaded = _import_in_fresh_interpreter(module)["loaded"]
+        assert loaded == [], f"import {module} loaded {loaded}"
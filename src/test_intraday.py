@@ -0,0 +1,120 @@
+"""
+Test suite for the intraday mark-to-market engine:
+1. `test_ticks_match_end_of_day_batch`: After a day's ticks, RD and daily returns equal the batch calculation for that day.
+2. `test_run_engine_tails_file`: The async loop follows a growing file, publishes snapshots and reports latencies.
+3. `test_run_engine_from_queue_rolls_day`: A tick on a new day turns the latest state into the close.
+4. `test_publisher_runs_during_burst`: Snapshots are published while a long burst of lines is being read.
+"""
+
+import asyncio
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from calc_cds_daily_return import compute_daily_returns
+from intraday import *
+
+
+def _inputs():
+    rng = np.random.default_rng(0)
+    dates = pd.bdate_range("2022-01-03", periods=5)
+    tenors = [0.25, 0.5, 1, 2, 3, 4, 5]
+    rates = 0.02 + 0.002 * np.arange(len(tenors)) + rng.normal(0, 1e-4, size=(len(dates), len(tenors)))
+    rf_data = pd.DataFrame(rates, index=pd.DatetimeIndex(dates, name="Date"), columns=tenors)
+    markit = pd.DataFrame([(t, d) for t in ["A", "B", "C"] for d in dates], columns=["ticker", "trade_date"])
+    markit["spread"] = rng.uniform(0.002, 0.05, len(markit))
+    curve, daily = compute_daily_returns(markit.copy(), rf_data)
+    return markit, curve, daily, dates
+
+
+def test_ticks_match_end_of_day_batch():
+    markit, curve, daily, dates = _inputs()
+    engine = IntradayEngine.from_close(daily[daily["trade_date"] < dates[-1]], curve, capacity=2)
+
+    last_day = markit[markit["trade_date"] == dates[-1]]
+    for k, (ticker, spread) in enumerate(zip(last_day["ticker"], last_day["spread"])):
+        engine.apply(ticker, np.datetime64(dates[-1] + pd.Timedelta(hours=10, minutes=k)), spread * 1.1)
+        engine.apply(ticker, np.datetime64(dates[-1] + pd.Timedelta(hours=15, minutes=k)), spread)
+    engine.apply("NEW", np.datetime64(dates[-1] + pd.Timedelta(hours=16)), 0.01)
+
+    snapshot = engine.snapshot().set_index("ticker")
+    expected = daily[daily["trade_date"] == dates[-1]].set_index("ticker")
+    np.testing.assert_allclose(snapshot.loc[expected.index, "RD"], expected["RD"], rtol=1e-12)
+    np.testing.assert_allclose(snapshot.loc[expected.index, "daily_return"], expected["daily_return"], rtol=1e-10)
+    assert snapshot.loc["A", "n_ticks"] == 2
+    # A ticker without a close has no return yet
+    assert np.isnan(snapshot.loc["NEW", "daily_return"]) and snapshot.loc["NEW", "RD"] > 0
+
+
+def test_run_engine_tails_file(tmp_path):
+    markit, curve, daily, dates = _inputs()
+    engine = IntradayEngine.from_close(daily[daily["trade_date"] < dates[-1]], curve)
+    path = tmp_path / "ticks.csv"
+    path.write_text("ticker,timestamp,spread\n")
+    published = []
+
+    async def scenario():
+        task = asyncio.create_task(
+            run_engine(engine, tail_file(path, poll_interval=0.01), lambda s, m: published.append((s, m)), cadence=0.05)
+        )
+        with open(path, "a") as file:
+            for k in range(30):
+                file.write(f"{'ABC'[k % 3]},{dates[-1] + pd.Timedelta(seconds=k):%Y-%m-%dT%H:%M:%S},{0.01 + k * 1e-4}\n")
+                file.flush()
+                await asyncio.sleep(0.005)
+        while engine.n_ticks.sum() < 30:
+            await asyncio.sleep(0.01)
+        await asyncio.sleep(0.1)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(scenario())
+    metrics = [m for _, m in published if m["ticks"]]
+    assert sum(m["ticks"] for m in metrics) == 30
+    assert all(0 <= m["p50_ms"] <= m["p99_ms"] <= m["max_ms"] for m in metrics)
+    assert published[-1][0].set_index("ticker").loc["C", "spread"] == pytest.approx(0.01 + 29e-4)
+
+
+def test_run_engine_from_queue_rolls_day():
+    markit, curve, daily, dates = _inputs()
+    engine = IntradayEngine.from_close(daily[daily["trade_date"] < dates[-2]], curve)
+    published = []
+
+    async def scenario():
+        queue = asyncio.Queue()
+        for tick in [
+            ("A", np.datetime64(dates[-2] + pd.Timedelta(hours=12)), 0.02),
+            ("A", np.datetime64(dates[-1] + pd.Timedelta(hours=12)), 0.03),
+            None,
+        ]:
+            queue.put_nowait(tick)
+        await run_engine(engine, queue_source(queue), lambda s, m: published.append((s, m)), cadence=10)
+
+    asyncio.run(scenario())
+    snapshot, metrics = published[-1]
+    row = snapshot.set_index("ticker").loc["A"]
+    assert metrics["ticks"] == 2
+    assert row["close_spread"] == 0.02 and row["n_ticks"] == 1
+    assert row["daily_return"] == pytest.approx(-(0.02 / 250 + 0.01 * row["close_RD"]))
+    assert engine.day == dates[-1]
+
+
+def test_publisher_runs_during_burst(tmp_path):
+    markit, curve, daily, dates = _inputs()
+    engine = IntradayEngine.from_close(daily[daily["trade_date"] < dates[-1]], curve)
+    path = tmp_path / "ticks.csv"
+    n_ticks = 30_000
+    start = dates[-1] + pd.Timedelta(hours=10)
+    with open(path, "w") as file:
+        for k in range(n_ticks):
+            file.write(f"{'ABC'[k % 3]},{np.datetime64(start + pd.Timedelta(milliseconds=k))},{0.01 + k * 1e-8}\n")
+    published = []
+
+    asyncio.run(
+        run_engine(engine, tail_file(path, follow=False), lambda s, m: published.append(m["ticks"]), cadence=0.001)
+    )
+    # Snapshots were published while the file was still being read, not only once at the end
+    assert sum(published) == n_ticks
+    assert len([ticks for ticks in published if 0 < ticks < n_ticks]) >= 2
@@ -0,0 +1,123 @@
+"""
+Test suite for the ISDA standard model RD engine:
+1. `test_imm_dates`: IMM date arithmetic around and on the 20th of quarter months.
+2. `test_calibration_matches_quadrature`: Calibrated legs agree with a day-by-day numerical integration
+   of the same model, and the model par spread reproduces the quoted spread.
+3. `test_discount_factors`: Premium period discount factors are continuously compounded in years, checked by hand.
+4. `test_isda_engine_in_pipeline`: The engine is selectable in `compute_daily_returns` and keeps its output layout,
+   and rejects a reduced-precision dtype.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from calc_cds_daily_return import DiscountCurve, compute_daily_returns
+from pipeline import Pipeline
+from isda import *
+
+
+def _inputs():
+    rng = np.random.default_rng(0)
+    dates = pd.bdate_range("2022-03-14", periods=10)
+    knots = [0.25, 0.5, 1, 2, 3, 4, 5]
+    rates = 0.02 + 0.003 * np.arange(len(knots)) + rng.normal(0, 1e-4, size=(len(dates), len(knots)))
+    rf_data = pd.DataFrame(rates, index=pd.DatetimeIndex(dates, name="Date"), columns=knots)
+    panel = pd.DataFrame([(t, d) for t in ["A", "B", "C"] for d in dates], columns=["ticker", "trade_date"])
+    panel["spread"] = rng.uniform(0.002, 0.08, len(panel))
+    return rf_data, panel
+
+
+def test_imm_dates():
+    dates = pd.to_datetime(["2022-03-19", "2022-03-20", "2022-01-05", "2022-12-31"])
+    assert list(imm_dates(quarter_index(dates))) == list(
+        np.array(["2021-12-20", "2022-03-20", "2021-12-20", "2022-12-20"], dtype="datetime64[D]")
+    )
+    assert list(imm_dates(quarter_index(dates, after=True))) == list(
+        np.array(["2022-03-20", "2022-06-20", "2022-03-20", "2023-03-20"], dtype="datetime64[D]")
+    )
+
+    schedule = contract_schedules(pd.to_datetime(["2022-01-05"]), [5])
+    # Accrual from 2021-12-20, maturity 2027-03-20: 21 quarterly periods
+    assert schedule["mask"].sum() == 21
+    assert schedule["accrued"][0, 0] == pytest.approx(16 / 360)
+    assert schedule["end"][0, 20] == pytest.approx((pd.Timestamp("2027-03-20") - pd.Timestamp("2022-01-05")).days / 365)
+
+
+def test_calibration_matches_quadrature():
+    rf_data, panel = _inputs()
+    curve = DiscountCurve.from_rf_data(rf_data)
+    L = 0.6
+    trade_date = rf_data.index[[0]]
+    schedule = contract_schedules(trade_date, [5])
+    discount_start = discount_factors(curve, trade_date, schedule["start"])
+    discount_end = discount_factors(curve, trade_date, schedule["end"])
+    spread = np.array([0.01])
+    hazard, annuity = calibrate_hazard(spread, schedule, discount_start, discount_end, L)
+
+    # Day-by-day integration with log-linear discounting inside each period
+    protection = accrual_on_default = premium = 0.0
+    for k in np.flatnonzero(schedule["mask"][0]):
+        a, b = schedule["start"][0, k], schedule["end"][0, k]
+        t = np.linspace(a, b, 2001)
+        forward = np.log(discount_start[0, k] / discount_end[0, k]) / (b - a)
+        density = discount_start[0, k] * np.exp(-forward * (t - a)) * hazard[0] * np.exp(-hazard[0] * t)
+        accrued = schedule["accrued"][0, k] + (t - a) * 365 / 360
+        protection += L * np.trapz(density, t)
+        accrual_on_default += np.trapz(accrued * density, t)
+        premium += schedule["accrual"][0, k] * discount_end[0, k] * np.exp(-hazard[0] * b)
+
+    clean = premium + accrual_on_default - schedule["accrued"][0, 0]
+    assert annuity[0] == pytest.approx(clean, rel=1e-6)
+    assert protection / annuity[0] == pytest.approx(spread[0], rel=1e-6)
+    # Credit triangle, with premiums accruing ACT/360
+    assert hazard[0] == pytest.approx(spread[0] / L * 365 / 360, rel=0.01)
+
+
+def test_discount_factors():
+    from scipy.interpolate import CubicSpline
+
+    rf_data, _ = _inputs()
+    curve = DiscountCurve.from_rf_data(rf_data)
+    trade_date = rf_data.index[[0]]
+    schedule = contract_schedules(trade_date, [5])
+    last = np.flatnonzero(schedule["mask"][0])[-1]
+    t = schedule["end"][0, last]
+
+    # By hand: natural cubic spline through the day's zero rates, continuously compounded over t years
+    zero = CubicSpline(rf_data.columns.to_numpy(dtype=float), rf_data.iloc[0].to_numpy(), bc_type="natural")(t)
+    expected = np.exp(-zero * t)
+    assert discount_factors(curve, trade_date, schedule["end"])[0, last] == pytest.approx(expected, rel=1e-12)
+    assert expected < 0.85
+
+
+def test_isda_engine_in_pipeline():
+    rf_data, panel = _inputs()
+    _, approx = compute_daily_returns(panel.copy(), rf_data, engine="approx")
+    _, isda = compute_daily_returns(panel.copy(), rf_data, engine="isda")
+
+    assert list(isda.columns) == list(approx.columns)
+    assert (isda[["ticker", "trade_date"]].to_numpy() == approx[["ticker", "trade_date"]].to_numpy()).all()
+    np.testing.assert_allclose(isda["RD"], approx["RD"], rtol=0.1)
+    # Chunking does not change the calibration
+    curve = DiscountCurve.from_rf_data(rf_data)
+    np.testing.assert_allclose(
+        calc_RD_isda(panel.copy(), curve, chunk_rows=7)["RD"], calc_RD_isda(panel.copy(), curve)["RD"], rtol=1e-14
+    )
+
+    # A date window keeps both of its bounds, with or without chunking and tenors
+    full = calc_RD_isda(panel.copy(), curve)
+    in_window = full[full["trade_date"].between(rf_data.index[3], rf_data.index[6])].reset_index(drop=True)
+    for chunk_rows in [7, 100_000]:
+        window = calc_RD_isda(panel.copy(), curve, chunk_rows=chunk_rows, start=rf_data.index[3], end=rf_data.index[6])
+        assert window["trade_date"].min() == rf_data.index[3]
+        pd.testing.assert_frame_equal(window, in_window, check_exact=False, rtol=1e-14)
+    by_tenor = calc_RD_isda(panel.assign(tenor="5Y"), curve, start=rf_data.index[3], end=rf_data.index[6])
+    assert by_tenor["trade_date"].min() == rf_data.index[3] and len(by_tenor) == len(in_window)
+
+    with pytest.raises(ValueError, match="Unknown RD engine"):
+        compute_daily_returns(panel.copy(), rf_data, engine="exact")
+    with pytest.raises(ValueError, match="float64 only"):
+        compute_daily_returns(panel.copy(), rf_data, dtype="float32", engine="isda")
+    with pytest.raises(ValueError, match="float64 only"):
+        Pipeline(panel, rf_data, config={"rd": {"engine": "isda", "dtype": "float32"}}).run("rd")
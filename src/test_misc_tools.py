@@ -2,7 +2,7 @@
 Test suite for utility functions to ensure correct functionality of date conversions and data retrieval:
 1. `test_generate_month_code`: Verifies the correct conversion of a date to a YYYYMM format.
 2. `test_month_code_to_date`: Ensures proper conversion from YYYYMM to a `datetime.date` object.
-3. `test_pull_from_wrds`: Confirms that data retrieval from WRDS returns a pandas DataFrame.
+3. `test_pull_from_wrds`: Confirms that data retrieval from WRDS returns a pandas DataFrame (through the configured data source, see `conftest.py`).
 
 These tests help ensure the correctness and reliability of date-related transformations and data retrieval logic.
 """
@@ -10,6 +10,7 @@ These tests help ensure the correctness and reliability of date-related transfor
 
 import pandas as pd
 import datetime
+import pytest
 from misc_tools import *
 
 def test_generate_month_code():
@@ -31,6 +32,7 @@ def test_month_code_to_date():
 
 
 
+@pytest.mark.external_source
 def test_pull_from_wrds():
     """
     Test pull_from_wrds() to check if it returns a DataFrame.
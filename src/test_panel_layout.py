@@ -0,0 +1,85 @@
+"""
+Test suite for the canonical ticker-then-date panel layout:
+1. `test_sort_panel_and_offsets`: Sorting is a no-op on canonical input and offsets cover every ticker run.
+2. `test_lag_within_ticker_matches_groupby_shift`: Offset-based lags equal `groupby("ticker").shift`.
+3. `test_group_selections_and_reductions`: First/last-in-group and `reduceat` reductions match groupby.
+4. `test_offsets_round_trip`: The offsets index persisted next to a Parquet file reloads unchanged.
+5. `test_select_window`: A date window keeps its rows plus one lookback row per ticker and tenor.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from panel_layout import *
+
+
+def _panel():
+    dates = pd.to_datetime(["2020-01-03", "2020-01-01", "2020-01-02", "2020-01-02", "2020-01-01", "2020-01-01"])
+    return pd.DataFrame(
+        {
+            "ticker": ["B", "B", "B", "A", "A", "C"],
+            "trade_date": dates,
+            "spread": [0.03, 0.01, 0.02, 0.05, 0.04, 0.06],
+        }
+    )
+
+
+def test_sort_panel_and_offsets():
+    panel = _panel()
+    assert not is_canonical(panel)
+    with pytest.raises(ValueError):
+        ticker_offsets(panel)
+
+    canonical = sort_panel(panel)
+    assert is_canonical(canonical)
+    assert sort_panel(canonical) is canonical
+
+    offsets = ticker_offsets(canonical)
+    assert offsets["ticker"].tolist() == ["A", "B", "C"]
+    assert offsets["start"].tolist() == [0, 2, 5]
+    assert offsets["stop"].tolist() == [2, 5, 6]
+
+
+def test_lag_within_ticker_matches_groupby_shift():
+    panel = sort_panel(_panel())
+    offsets = ticker_offsets(panel)
+    for periods in [1, 2]:
+        expected = panel.groupby("ticker")["spread"].shift(periods).to_numpy()
+        np.testing.assert_array_equal(lag_within_ticker(panel["spread"], offsets, periods), expected)
+
+
+def test_group_selections_and_reductions():
+    panel = sort_panel(_panel())
+    offsets = ticker_offsets(panel)
+    grouped = panel.groupby("ticker")["spread"]
+
+    np.testing.assert_array_equal(first_in_group(panel["spread"], offsets), grouped.first().to_numpy())
+    np.testing.assert_array_equal(last_in_group(panel["spread"], offsets), grouped.last().to_numpy())
+    np.testing.assert_allclose(reduce_by_ticker(panel["spread"], offsets), grouped.sum().to_numpy())
+    np.testing.assert_array_equal(reduce_by_ticker(panel["spread"], offsets, np.maximum), grouped.max().to_numpy())
+
+
+def test_offsets_round_trip(tmp_path):
+    panel = sort_panel(_panel())
+    path = tmp_path / "CDS_daily_return.parquet"
+    panel.to_parquet(path)
+    write_offsets(ticker_offsets(panel), path)
+
+    assert offsets_path(path).name == "CDS_daily_return.offsets.parquet"
+    pd.testing.assert_frame_equal(load_offsets(path), ticker_offsets(panel))
+
+
+def test_select_window():
+    panel = _panel()
+    window = select_window(panel, start="2020-01-02", end="2020-01-02")
+    # B and A keep their 2020-01-02 rows and their 2020-01-01 lookback rows; C only has a lookback row
+    assert list(window.index) == [1, 2, 3, 4, 5]
+    assert list(select_window(panel, end="2020-01-01").index) == [1, 4, 5]
+
+    by_tenor = pd.concat([panel.assign(tenor="5Y"), panel.assign(tenor="1Y")], ignore_index=True)
+    window = select_window(by_tenor, start="2020-01-03")
+    assert sorted(zip(window["ticker"], window["tenor"], window["trade_date"].dt.day)) == [
+        ("A", "1Y", 2), ("A", "5Y", 2), ("B", "1Y", 2), ("B", "1Y", 3),
+        ("B", "5Y", 2), ("B", "5Y", 3), ("C", "1Y", 1), ("C", "5Y", 1),
+    ]
@@ -0,0 +1,129 @@
+"""
+Test suite for the in-process pipeline:
+1. `test_pipeline_matches_scripts`: With the spread filter pushed down, the monthly panel (including coverage)
+   and portfolios equal the `calc_cds_daily_return` + `create_portfolio` steps.
+2. `test_configure_and_checkpoints`: Reconfiguring a stage recomputes only it and later stages, and
+   checkpoints are written where the scripts write them.
+3. `test_date_window_replaces_slice`: A date-window run reads one lookback row per ticker and replaces exactly
+   its slice of the saved outputs with the values of a full run.
+4. `test_date_window_relags_next_day`: Revised spreads in the window carry into the lags and return of the
+   first day after it.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from calc_cds_daily_return import DiscountCurve, compute_daily_returns, load_cds_return, write_cds_return
+from create_portfolio import calc_monthly_panel, construct_cds_portfolios, filter_tickers_by_min_months
+from pipeline import *
+
+
+def _inputs():
+    rng = np.random.default_rng(0)
+    dates = pd.bdate_range("2022-01-03", "2022-09-30")
+    knots = [0.25, 0.5, 1, 2, 3, 4, 5]
+    rates = 0.02 + 0.003 * np.arange(len(knots)) + rng.normal(0, 1e-4, size=(len(dates), len(knots)))
+    rf_data = pd.DataFrame(rates, index=pd.DatetimeIndex(dates, name="Date"), columns=knots)
+    tickers = [f"T{k:02d}" for k in range(30)]
+    markit = pd.DataFrame([(t, d) for t in tickers for d in dates], columns=["ticker", "trade_date"])
+    # A few distressed names cross the 0.5 spread cap and back
+    markit["spread"] = rng.uniform(0.002, 0.7, len(tickers)).repeat(len(dates)) * rng.lognormal(0, 0.1, len(markit))
+    return markit.sample(frac=0.9, random_state=0), rf_data
+
+
+def _script_results(markit, rf_data, spread_max=0.5, min_months=6):
+    _, daily = compute_daily_returns(markit.copy(), rf_data)
+    monthly = calc_monthly_panel(daily, spread_max=spread_max)
+    portfolio = construct_cds_portfolios(filter_tickers_by_min_months(monthly, min_months=min_months), monthly)
+    return daily, monthly, portfolio
+
+
+def _sorted(df):
+    return df.sort_values(["ticker", "yyyymm"]).reset_index(drop=True)
+
+
+def test_pipeline_matches_scripts():
+    markit, rf_data = _inputs()
+    daily, monthly, portfolio = _script_results(markit, rf_data)
+    assert (daily["spread"] >= 0.5).any()
+
+    pipeline = Pipeline(markit, rf_data)
+    pd.testing.assert_frame_equal(pipeline.run(), portfolio)
+    pd.testing.assert_frame_equal(_sorted(pipeline["monthly"]), _sorted(monthly))
+    # Filtered rows never reach the daily stage
+    assert (pipeline["daily"]["spread"] < 0.5).all()
+    assert len(pipeline["rd"]) < len(markit)
+    assert set(pipeline.timings) == set(STAGES)
+
+    unfiltered = Pipeline(markit, rf_data, pushdown=False)
+    pd.testing.assert_frame_equal(unfiltered.run(), portfolio)
+    pd.testing.assert_frame_equal(unfiltered["daily"].reset_index(drop=True), daily.reset_index(drop=True))
+
+
+def test_configure_and_checkpoints(tmp_path):
+    markit, rf_data = _inputs()
+    pipeline = Pipeline(markit, rf_data, checkpoints=("risk_free_term", "daily", "portfolio"), pushdown=False, data_dir=tmp_path)
+    pipeline.run()
+    rd = pipeline["rd"]
+    pd.testing.assert_frame_equal(load_cds_return(tmp_path).reset_index(drop=True), pipeline["daily"].reset_index(drop=True))
+    pd.testing.assert_frame_equal(pd.read_parquet(tmp_path / "portfolio_return.parquet"), pipeline["portfolio"])
+    assert (tmp_path / "discount_curve.npz").exists()
+
+    pipeline.configure("portfolio", min_months=8)
+    assert "portfolio" not in pipeline.results and pipeline.results["rd"] is rd
+    _, monthly, portfolio = _script_results(markit, rf_data, min_months=8)
+    pd.testing.assert_frame_equal(pipeline.run(), portfolio)
+
+    pipeline.configure("monthly", spread_max=0.3)
+    _, _, portfolio = _script_results(markit, rf_data, spread_max=0.3, min_months=8)
+    pd.testing.assert_frame_equal(pipeline.run(), portfolio)
+    assert pipeline.results["rd"] is rd
+
+    with pytest.raises(ValueError, match="Unknown options"):
+        pipeline.configure("rd", maturity=3)
+    with pytest.raises(ValueError, match="pushdown=False"):
+        Pipeline(markit, rf_data, checkpoints=("daily",))
+
+
+def test_date_window_replaces_slice(tmp_path):
+    markit, rf_data = _inputs()
+    checkpoints = ("risk_free_term", "daily", "portfolio")
+    Pipeline(markit, rf_data, checkpoints=checkpoints, pushdown=False, data_dir=tmp_path).run()
+    daily = load_cds_return(tmp_path).reset_index(drop=True)
+    portfolio = pd.read_parquet(tmp_path / "portfolio_return.parquet")
+    curve = DiscountCurve.load(tmp_path / "discount_curve.npz")
+
+    # Stale values in the window, and rates only for the window's dates
+    stale = daily.assign(daily_return=np.where(daily["trade_date"].dt.month == 4, 0.0, daily["daily_return"]))
+    write_cds_return(stale, tmp_path)
+    portfolio.assign(daily_return=0.0).iloc[:40].to_parquet(tmp_path / "portfolio_return.parquet")
+    window = Pipeline(
+        markit, rf_data.loc["2022-03-01":"2022-04-30"], checkpoints=checkpoints, pushdown=False,
+        data_dir=tmp_path, start="2022-04-12", end="2022-04-20",
+    )
+    window.run()
+    assert (window.start, window.end) == (pd.Timestamp("2022-04-01"), pd.Timestamp("2022-04-30"))
+    lookback = window["markit"][window["markit"]["trade_date"] < window.start]
+    assert lookback["ticker"].is_unique and len(lookback) == markit["ticker"].nunique()
+    assert (window["daily"]["trade_date"] >= window.start).all()
+
+    pd.testing.assert_frame_equal(load_cds_return(tmp_path).reset_index(drop=True), daily)
+    saved = pd.read_parquet(tmp_path / "portfolio_return.parquet")
+    pd.testing.assert_frame_equal(saved[saved["yyyymm"] == 202204].reset_index(drop=True), window["portfolio"])
+    pd.testing.assert_frame_equal(window["portfolio"], portfolio[portfolio["yyyymm"] == 202204].reset_index(drop=True))
+    assert len(saved) == 40 + len(window["portfolio"])
+    np.testing.assert_array_equal(DiscountCurve.load(tmp_path / "discount_curve.npz").coefficients, curve.coefficients)
+
+
+def test_date_window_relags_next_day(tmp_path):
+    markit, rf_data = _inputs()
+    Pipeline(markit, rf_data, checkpoints=("daily",), pushdown=False, data_dir=tmp_path).run()
+
+    # Revised April spreads; a full run on them is the reference
+    revised = markit.assign(spread=np.where(markit["trade_date"].dt.month == 4, markit["spread"] * 1.1, markit["spread"]))
+    _, expected = compute_daily_returns(revised.copy(), rf_data)
+    Pipeline(revised, rf_data, checkpoints=("daily",), pushdown=False, data_dir=tmp_path, start="2022-04-12", end="2022-04-20").run("daily")
+
+    saved = load_cds_return(tmp_path).reset_index(drop=True)
+    pd.testing.assert_frame_equal(saved, expected.sort_values(["ticker", "trade_date"]).reset_index(drop=True))
@@ -3,10 +3,14 @@ Test suite for the `pull_interest_rates_data` module to ensure correct data load
 1. `test_pull_fed_yield_curve`: Verifies that the `pull_fed_yield_curve` function correctly pulls Federal Reserve yield curve data, contains the expected columns, and does not have missing values.
 2. `test_pull_swap_rates`: Ensures that the `pull_swap_rates` function correctly pulls swap rates data from FRED, contains the required columns, and checks for missing values.
 
+Both pull through the configured data source (`external_source`, see `conftest.py`) and run on the
+committed replay fixtures in CI.
+
 These tests are essential to ensure that the data fetched from external sources (Federal Reserve and FRED) is correctly structured and free from issues such as missing values, which could affect further analysis.
 """
 
 import pandas as pd
+import pytest
 from pathlib import Path
 from settings import config
 import pull_interest_rates_data
@@ -16,6 +20,7 @@ DATA_DIR = Path(config("DATA_DIR"))
 MANUAL_DATA_DIR = Path(config("MANUAL_DATA_DIR"))
 
 
+@pytest.mark.external_source
 def test_pull_fed_yield_curve():
     """Test pulling Federal Reserve yield curve data."""
     df = pull_interest_rates_data.pull_fed_yield_curve()
@@ -31,6 +36,7 @@ def test_pull_fed_yield_curve():
     assert df.isna().sum().sum() == 0
 
 
+@pytest.mark.external_source
 def test_pull_swap_rates():
     """Test pulling swap rates data from FRED."""
     df = pull_interest_rates_data.pull_swap_rates()
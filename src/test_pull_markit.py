@@ -2,22 +2,35 @@
 Test suite for the `pull_markit` module to validate correct data fetching and structure:
 
 1. `test_pull_markit_data`: Ensures that the `pull_markit_data` function pulls the correct Markit data, returns a pandas DataFrame, and contains the expected columns. This test does not check the correctness of data content but ensures the function runs without errors and returns the expected format.
-2. `test_pull_market_sector`: Verifies that the `pull_markit_sector` function retrieves sector data correctly, returns a pandas DataFrame with the expected columns, and matches known characteristics like the number of unique sectors and the total rows in the dataset. It also tests the `load_sector_data` function for data completeness.
+2. `test_pull_market_sector`: Verifies that the `pull_markit_sector` function retrieves sector data correctly and returns a pandas DataFrame with the expected columns.
+3. `test_load_sector_data`: Tests the `load_sector_data` function for data completeness, matching known characteristics like the number of unique sectors and the total rows in the dataset.
+
+4. `test_extract_resumes_after_connection_drop`: Runs the resumable extraction on replayed fixtures; after a failure in the second year, a rerun only pulls the missing units.
+5. `test_extract_rejects_unverified_data`: A row-count mismatch against the source aborts without writing the year.
+
+Tests 1 and 2 pull through the configured data source (`external_source`, see `conftest.py`) and run on the
+committed replay fixtures in CI; test 3 needs the full WRDS extract and only runs in `live` or `record` mode.
 
 These tests are important for confirming the correct functionality of data retrieval functions and ensuring that the resulting data is structured as expected, reducing the risk of errors downstream in the analysis pipeline.
 """
 
 
+import json
+
 import pandas as pd
+import pytest
 from pathlib import Path
 from settings import config
 import pull_markit
+from data_sources import RecordingSource, ReplaySource
+from pull_markit import EXTRACT_MANIFEST, _chunk_bounds, extract_markit_years, markit_spread_query
 
 # Get DATA_DIR from settings
 DATA_DIR = Path(config("DATA_DIR"))
 MANUAL_DATA_DIR = Path(config("MANUAL_DATA_DIR"))
 
 
+@pytest.mark.external_source
 def test_pull_markit_data():
     """Test pulling Markit data.""" 
     # since it takes a long time to pull the data, we will just test if the function runs without error
@@ -31,6 +44,7 @@ def test_pull_markit_data():
     assert all(col in df.columns for col in expected_columns)
 
 
+@pytest.mark.external_source
 def test_pull_market_sector():
     """Test pulling Markit sector data.""" 
     # since it takes a long time to pull the data, we will just test if the function runs without error
@@ -43,10 +57,94 @@ def test_pull_market_sector():
     expected_columns = ["ticker","sector"]
     assert all(col in df.columns for col in expected_columns)
 
+
+@pytest.mark.live_source
+def test_load_sector_data():
+    """Test the sector link table written from the full WRDS pull."""
     df = pull_markit.load_sector_data()
 
     assert(len(df) == 2292)
     assert(df["sector"].nunique() == 11)
 
 
-    
\ No newline at end of file
+    
+
+
+class FlakySource(ReplaySource):
+    """Replay source whose connection drops after `fail_after` queries and counts the queries it serves."""
+
+    def __init__(self, fixture_dir, fail_after=None):
+        super().__init__(fixture_dir)
+        self.fail_after = fail_after
+        self.queries = []
+
+    def connect_wrds(self, wrds_username):
+        source, connection = self, super().connect_wrds(wrds_username)
+
+        class Connection:
+            def raw_sql(self, query):
+                if source.fail_after is not None and len(source.queries) >= source.fail_after:
+                    raise ConnectionError("server closed the connection unexpectedly")
+                source.queries.append(query)
+                return connection.raw_sql(query)
+
+            def close(self):
+                pass
+
+        return Connection()
+
+
+def _record(fixture_dir, years, months_per_chunk, corrupt_count=False):
+    recorder = RecordingSource(fixture_dir)
+    for year in years:
+        bounds = _chunk_bounds(year, months_per_chunk)
+        for start_date, end_date in bounds if len(bounds) > 1 else [(None, None)]:
+            query = markit_spread_query(f"markit.cds{year}", start_date=start_date, end_date=end_date)
+            day = start_date or f"{year}-01-02"
+            df = pd.DataFrame({"ticker": ["A", "B"], "trade_date": [day, day], "spread": [0.01, year / 1e5]})
+            df["source_rows"] = len(df) + int(corrupt_count)
+            df["source_spread_sum"] = df["spread"].sum()
+            recorder.save_sql(
+                f"SELECT extract.*, COUNT(*) OVER () AS source_rows, SUM(spread) OVER () AS source_spread_sum FROM ({query}) AS extract",
+                df,
+            )
+
+
+def test_extract_resumes_after_connection_drop(tmp_path):
+    fixtures, data_dir = tmp_path / "fixtures", tmp_path / "data"
+    data_dir.mkdir()
+    _record(fixtures, [2001, 2002], months_per_chunk=6)
+
+    # One query per chunk: the drop hits the second chunk of 2002
+    flaky = FlakySource(fixtures, fail_after=3)
+    with pytest.raises(ConnectionError):
+        extract_markit_years(2001, 2002, data_dir=data_dir, months_per_chunk=6, source=flaky)
+    manifest = json.loads((data_dir / EXTRACT_MANIFEST).read_text())
+    assert list(manifest["years"]) == ["2001"]
+    assert list(manifest["chunks"]) == ["2002-01-01/2002-07-01"]
+    assert not (data_dir / "markit_cds2002.parquet").exists()
+
+    resumed = FlakySource(fixtures)
+    manifest = extract_markit_years(2001, 2002, data_dir=data_dir, months_per_chunk=6, source=resumed)
+    assert len(resumed.queries) == 1 and "2002-07-01" in resumed.queries[0]
+    assert manifest["years"]["2002"]["rows"] == 4 and manifest["chunks"] == {}
+    # The year's checks sum both chunks, the one pulled before the drop included
+    assert manifest["years"]["2002"]["source_rows"] == 4
+    assert manifest["years"]["2002"]["source_spread_sum"] == pytest.approx(2 * (0.01 + 2002 / 1e5))
+    assert pd.read_parquet(data_dir / "markit_cds2002.parquet")["trade_date"].dt.month.tolist() == [1, 1, 7, 7]
+
+    # A damaged year file no longer matches its checksum and is pulled again
+    (data_dir / "markit_cds2001.parquet").write_bytes(b"truncated")
+    again = FlakySource(fixtures)
+    extract_markit_years(2001, 2002, data_dir=data_dir, months_per_chunk=6, source=again)
+    assert len(again.queries) == 2 and all("cds2001" in query for query in again.queries)
+
+
+def test_extract_rejects_unverified_data(tmp_path):
+    fixtures, data_dir = tmp_path / "fixtures", tmp_path / "data"
+    data_dir.mkdir()
+    _record(fixtures, [2001], months_per_chunk=12, corrupt_count=True)
+
+    with pytest.raises(ValueError, match="failed verification"):
+        extract_markit_years(2001, 2001, data_dir=data_dir, source=ReplaySource(fixtures))
+    assert not (data_dir / "markit_cds2001.parquet").exists()
@@ -0,0 +1,125 @@
+"""
+Test suite for the local read-only query service:
+1. `test_return_store_queries`: Ticker/date, portfolio and sector queries return the matching rows.
+2. `test_http_query_and_hot_reload`: Arrow IPC responses over HTTP, and reload after the Parquet file changes.
+3. `test_unix_socket_query`: The same queries over a Unix domain socket.
+4. `test_store_without_portfolio_file`: The store starts without portfolio returns and serves empty portfolio queries.
+"""
+
+import socket
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from query_service import *
+
+
+def _write_data(data_dir, shift=0.0):
+    dates = pd.bdate_range("2008-01-01", "2009-12-31")
+    tickers = ["AAA", "BBB", "CCC"]
+    daily = pd.DataFrame(
+        {
+            "ticker": np.repeat(tickers, len(dates)),
+            "trade_date": np.tile(dates, len(tickers)),
+            "spread": 0.01,
+            "daily_return": np.arange(len(dates) * len(tickers)) * 1e-5 + shift,
+        }
+    ).sample(frac=1, random_state=0)
+    daily.to_parquet(data_dir / "CDS_daily_return.parquet")
+    portfolio = pd.DataFrame(
+        {
+            "yyyymm": [200801.0, 200801.0, 200802.0, 200802.0],
+            "portfolio": [1, 2, 1, 2],
+            "daily_return": [0.01, 0.02, 0.03, 0.04],
+        }
+    )
+    portfolio.to_parquet(data_dir / "portfolio_return.parquet")
+    pd.DataFrame({"ticker": tickers, "sector": ["Energy", "Energy", "Utilities"], "year": 2008}).to_parquet(
+        data_dir / "markit_ticker_sector_link_table.parquet"
+    )
+    return daily
+
+
+def _serve(server):
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return thread
+
+
+def test_return_store_queries(tmp_path):
+    """
+    Index-based lookups must return exactly the rows a full filter would.
+    """
+    daily = _write_data(tmp_path)
+    store = ReturnStore(tmp_path)
+
+    output = store.returns(["BBB", "AAA"], "2008-03-01", "2008-06-30")
+    expected = daily[
+        daily["ticker"].isin(["AAA", "BBB"]) & daily["trade_date"].between("2008-03-01", "2008-06-30")
+    ]
+    assert len(output) == len(expected)
+    assert output["trade_date"].min() >= pd.Timestamp("2008-03-01")
+    assert output["trade_date"].max() <= pd.Timestamp("2008-06-30")
+    assert store.returns(["ZZZ"]).empty
+
+    assert store.portfolios([2], start=200802).to_dict("list")["daily_return"] == [0.04]
+
+    sectors = store.sector_aggregates(["Energy"], "2008-01-02", "2008-01-02")
+    assert sectors["n_names"].tolist() == [2]
+
+
+def test_http_query_and_hot_reload(tmp_path):
+    """
+    Responses arrive as Arrow IPC; rewriting the Parquet file is picked up on the next request.
+    """
+    _write_data(tmp_path)
+    server = make_server(ReturnStore(tmp_path), port=0)
+    _serve(server)
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    try:
+        first = query(f"{base}/returns?tickers=AAA&start=2008-01-01&end=2008-01-31")
+        assert set(first["ticker"]) == {"AAA"}
+        assert len(first) == len(pd.bdate_range("2008-01-01", "2008-01-31"))
+
+        _write_data(tmp_path, shift=1.0)
+        second = query(f"{base}/returns?tickers=AAA&start=2008-01-01&end=2008-01-31")
+        np.testing.assert_allclose(second["daily_return"], first["daily_return"] + 1.0)
+
+        portfolios = query(f"{base}/portfolios?portfolios=1")
+        assert portfolios["portfolio"].tolist() == [1, 1]
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.mark.skipif(not hasattr(socket, "AF_UNIX"), reason="Unix domain sockets are not available")
+def test_unix_socket_query(tmp_path):
+    """
+    The service answers the same queries over a Unix domain socket.
+    """
+    _write_data(tmp_path)
+    socket_path = tmp_path / "cds.sock"
+    server = make_server(ReturnStore(tmp_path), unix_socket=socket_path)
+    _serve(server)
+    try:
+        sectors = query_unix(socket_path, "/sectors?sectors=Utilities&start=2008-01-02&end=2008-01-04")
+        assert sectors["sector"].unique().tolist() == ["Utilities"]
+        assert len(sectors) == 3
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_store_without_portfolio_file(tmp_path):
+    """
+    Missing portfolio returns must not keep the daily returns from being served.
+    """
+    daily = _write_data(tmp_path)
+    (tmp_path / "portfolio_return.parquet").unlink()
+    store = ReturnStore(tmp_path)
+
+    assert len(store.returns(["AAA"])) == (daily["ticker"] == "AAA").sum()
+    output = store.portfolios([1], start=200801)
+    assert output.empty and list(output.columns) == ["yyyymm", "portfolio", "daily_return"]
@@ -0,0 +1,94 @@
+"""
+Test suite for multi-region processing:
+1. `test_run_regions_matches_single_region_pipeline`: Regions processed in parallel workers, each with its own
+   curve source, give the same returns as the single-region pipeline and land in their own partitions.
+2. `test_process_region_requires_curve`: A region without a local curve file fails with a clear error.
+3. `test_region_curve_sorts_tenors`: Curve columns in any order are sorted into increasing knots; duplicate
+   tenors are rejected.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from calc_cds_daily_return import calc_cds_daily_return, calc_RD, calc_risk_free_term
+from pull_interest_rates_data import load_region_curve
+from regional import *
+
+
+def _write_inputs(data_dir, manual_dir):
+    rng = np.random.default_rng(0)
+    dates = pd.bdate_range("2005-01-03", "2005-08-31")
+    tenors = [0.25, 0.5, 1, 2, 3, 4, 5]
+    base = 0.02 + 0.002 * np.arange(len(tenors)) + rng.normal(0, 1e-4, size=(len(dates), len(tenors)))
+
+    swap = pd.DataFrame(base[:, :2], index=pd.DatetimeIndex(dates, name="Date"), columns=["DGS3MO", "DGS6MO"])
+    fed = pd.DataFrame(base[:, 2:], index=pd.DatetimeIndex(dates, name="Date"), columns=[f"SVENY0{i}" for i in range(1, 6)])
+    swap.to_parquet(data_dir / "swap_rates.parquet")
+    fed.to_parquet(data_dir / "fed_yield_curve.parquet")
+
+    jp_curve = pd.DataFrame(base / 4, index=pd.DatetimeIndex(dates, name="Date"), columns=[str(t) for t in tenors])
+    jp_curve.to_csv(manual_dir / "discount_curve_JP.csv")
+
+    panels = []
+    for region, n_tickers in [("US", 25), ("JP", 22)]:
+        tickers = [f"{region}{i:02d}" for i in range(n_tickers)]
+        panel = pd.DataFrame([(t, d) for t in tickers for d in dates], columns=["ticker", "trade_date"])
+        panel["spread"] = rng.uniform(0.002, 0.05, len(panel))
+        panel["region"] = region
+        panels.append(panel)
+    markit = pd.concat(panels, ignore_index=True)
+    markit["region"] = pd.Categorical(markit["region"], categories=["US", "JP"])
+    markit.to_parquet(data_dir / "Markit_CDS.parquet")
+    return markit, fed, swap, jp_curve
+
+
+def test_run_regions_matches_single_region_pipeline(tmp_path):
+    manual_dir = tmp_path / "manual"
+    manual_dir.mkdir()
+    markit, fed, swap, jp_curve = _write_inputs(tmp_path, manual_dir)
+
+    status = run_regions(["US", "JP"], data_dir=tmp_path, manual_data_dir=manual_dir, max_workers=2)
+    assert set(status) == {"US", "JP"}
+
+    daily = load_cds_return_by_region(tmp_path)
+    assert set(daily["region"]) == {"US", "JP"}
+    assert (tmp_path / "CDS_daily_return_by_region" / "region=JP").is_dir()
+
+    jp_curve.columns = jp_curve.columns.astype(float)
+    curves = {"US": swap.join(fed), "JP": jp_curve}
+    for region, curve in curves.items():
+        panel = markit[markit["region"] == region].drop(columns="region")
+        expected = calc_cds_daily_return(calc_RD(panel, calc_risk_free_term(curve)))
+        result = load_cds_return_by_region(tmp_path, regions=[region])
+        assert set(result["ticker"]) == set(panel["ticker"])
+        np.testing.assert_allclose(
+            result["daily_return"].to_numpy(), expected["daily_return"].to_numpy(), rtol=1e-12
+        )
+
+    portfolio = load_portfolio_by_region(tmp_path, regions=["JP"])
+    assert portfolio["portfolio"].between(1, 20).all()
+    assert set(portfolio["region"]) == {"JP"}
+
+
+def test_process_region_requires_curve(tmp_path):
+    manual_dir = tmp_path / "manual"
+    manual_dir.mkdir()
+    _write_inputs(tmp_path, manual_dir)
+    (manual_dir / "discount_curve_JP.csv").unlink()
+
+    with pytest.raises(FileNotFoundError, match="discount_curve_JP.csv"):
+        process_region("JP", data_dir=tmp_path, manual_data_dir=manual_dir)
+
+
+def test_region_curve_sorts_tenors(tmp_path):
+    _, _, _, jp_curve = _write_inputs(tmp_path, tmp_path)
+    expected = load_region_curve("JP", tmp_path)
+    assert list(expected.columns) == ["0.25", "0.5", "1", "2", "3", "4", "5"]
+
+    jp_curve[["5", "0.5", "2", "0.25", "1", "4", "3"]].to_csv(tmp_path / "discount_curve_JP.csv")
+    pd.testing.assert_frame_equal(load_region_curve("JP", tmp_path), expected)
+
+    jp_curve.assign(**{"1.0": jp_curve["1"]}).to_csv(tmp_path / "discount_curve_JP.csv")
+    with pytest.raises(ValueError, match="Duplicate tenors"):
+        load_region_curve("JP", tmp_path)
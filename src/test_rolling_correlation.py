@@ -0,0 +1,72 @@
+"""
+Test suite for the incremental rolling correlation engine:
+1. `test_rolling_cross_moments`: Rolling covariances and correlations match pandas `.rolling()` for several windows.
+2. `test_ewm_cross_moments`: The exponentially weighted variant matches pandas `.ewm()`.
+3. `test_align_portfolio_returns`: Replicated and original tables are aligned on common, complete months.
+"""
+
+import datetime
+
+import numpy as np
+import pandas as pd
+
+from rolling_correlation import *
+
+
+def _random_returns(seed, n_obs=80, n_cols=4):
+    rng = np.random.default_rng(seed)
+    columns = [f"CDS_{i:02d}" for i in range(1, n_cols + 1)]
+    common = rng.normal(0, 0.01, size=(n_obs, 1))
+    x = pd.DataFrame(common + rng.normal(0, 0.01, size=(n_obs, n_cols)), columns=columns)
+    y = pd.DataFrame(common + rng.normal(0, 0.01, size=(n_obs, n_cols)), columns=columns)
+    return x, y
+
+
+def test_rolling_cross_moments():
+    """
+    Every (x_i, y_j) pair must match pandas' rolling cov/corr for each window length.
+    """
+    x, y = _random_returns(0)
+    output = rolling_cross_moments(x.values, y.values, windows=[12, 36])
+
+    for window in [12, 36]:
+        for i, j in [(0, 0), (1, 3), (3, 2)]:
+            expected_cov = x.iloc[:, i].rolling(window).cov(y.iloc[:, j]).values
+            expected_corr = x.iloc[:, i].rolling(window).corr(y.iloc[:, j]).values
+            np.testing.assert_allclose(output[window]["cov"][:, i, j], expected_cov, atol=1e-12)
+            np.testing.assert_allclose(output[window]["corr"][:, i, j], expected_corr, atol=1e-10)
+
+
+def test_ewm_cross_moments():
+    """
+    The exponentially weighted covariance and correlation must match pandas' ewm.
+    """
+    x, y = _random_returns(1)
+    output = ewm_cross_moments(x.values, y.values, halflife=6)
+
+    for i, j in [(0, 0), (2, 1)]:
+        expected_cov = x.iloc[:, i].ewm(halflife=6).cov(y.iloc[:, j]).values
+        expected_corr = x.iloc[:, i].ewm(halflife=6).corr(y.iloc[:, j]).values
+        np.testing.assert_allclose(output["cov"][1:, i, j], expected_cov[1:], atol=1e-12)
+        np.testing.assert_allclose(output["corr"][1:, i, j], expected_corr[1:], atol=1e-10)
+
+
+def test_align_portfolio_returns():
+    """
+    Only months present in both tables and complete in both should be kept.
+    """
+    replicated = pd.DataFrame(
+        {"CDS_01": [0.01, 0.02, np.nan, 0.04], "CDS_02": [0.0, 0.01, 0.02, 0.03]},
+        index=pd.Index([200101.0, 200102.0, 200103.0, 200104.0], name="yyyymm"),
+    )
+    actual = pd.DataFrame(
+        {"CDS_01": [0.02, 0.03, 0.05], "CDS_02": [0.01, 0.02, 0.04]},
+        index=[datetime.date(2001, 2, 1), datetime.date(2001, 3, 1), datetime.date(2001, 4, 1)],
+    )
+
+    replicated_aligned, actual_aligned = align_portfolio_returns(replicated, actual)
+
+    expected_index = pd.to_datetime(["2001-02-01", "2001-04-01"])
+    assert list(replicated_aligned.index) == list(expected_index)
+    assert list(actual_aligned.index) == list(expected_index)
+    assert list(replicated_aligned.columns) == ["CDS_01", "CDS_02"]
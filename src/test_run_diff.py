@@ -0,0 +1,85 @@
+"""
+Test suite for the run-to-run diff of pipeline outputs:
+1. `test_daily_diff_skips_unchanged_partitions`: Manifests written with the daily returns locate the changed
+   ticker-years; only those are row-diffed, and changes within tolerance are not reported.
+2. `test_portfolio_diff_and_stale_manifest`: Portfolio diffs report changed and added months, and a stale
+   manifest is rebuilt from its file.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from calc_cds_daily_return import write_cds_return
+from create_portfolio import write_portfolio
+from run_diff import *
+
+
+def _daily():
+    rng = np.random.default_rng(0)
+    dates = pd.bdate_range("2019-01-01", "2021-12-31")
+    tickers = ["A", "B", "C", "D"]
+    daily = pd.DataFrame({"ticker": np.repeat(tickers, len(dates)), "trade_date": np.tile(dates, len(tickers))})
+    for col in ["spread_prev", "spread", "RD", "RD_prev", "daily_return"]:
+        daily[col] = rng.random(len(daily))
+    return daily
+
+
+def test_daily_diff_skips_unchanged_partitions(tmp_path):
+    old_dir, new_dir = tmp_path / "old", tmp_path / "new"
+    old_dir.mkdir()
+    new_dir.mkdir()
+    daily = _daily()
+    write_cds_return(daily, old_dir)
+    assert manifest_path(old_dir / "CDS_daily_return.parquet").exists()
+
+    new = daily.copy()
+    moved = (new["ticker"] == "B") & (new["trade_date"] == "2020-03-16")
+    new.loc[moved, "daily_return"] += 0.01
+    # Within tolerance: hashes differ, values do not count as changed
+    new.loc[(new["ticker"] == "C") & (new["trade_date"] == "2020-06-01"), "spread"] += 1e-15
+    new = new[~((new["ticker"] == "D") & (new["trade_date"] == "2020-12-31"))]
+    write_cds_return(new, new_dir)
+
+    result = diff_output(old_dir, new_dir, "daily")
+    summary = result["summary"]
+    assert summary["partitions_skipped"] == 2
+    assert sorted(zip(result["blocks"]["ticker"], result["blocks"]["partition"])) == [("B", 2020), ("C", 2020), ("D", 2020)]
+    assert summary["blocks_within_tolerance"] == 1
+    assert (summary["rows_changed"], summary["rows_removed"], summary["rows_added"]) == (1, 1, 0)
+    assert summary["max_abs_diff"] == pytest.approx(0.01)
+
+    changes = result["changes"].set_index("column")
+    assert changes.loc["daily_return", "ticker"] == "B"
+    assert changes.loc["<removed>", "trade_date"] == pd.Timestamp("2020-12-31")
+    assert "largest moves" in format_report({"daily": result})
+
+    unchanged = diff_output(old_dir, old_dir, "daily")
+    assert unchanged["summary"]["partitions_skipped"] == 3 and unchanged["changes"].empty
+
+
+def test_portfolio_diff_and_stale_manifest(tmp_path):
+    old_dir, new_dir = tmp_path / "old", tmp_path / "new"
+    old_dir.mkdir()
+    new_dir.mkdir()
+    portfolio = pd.DataFrame(
+        {
+            "yyyymm": np.repeat([202011.0, 202012.0, 202101.0], 20),
+            "portfolio": np.tile(np.arange(1, 21), 3),
+            "daily_return": np.linspace(-0.02, 0.02, 60),
+        }
+    )
+    write_portfolio(portfolio, old_dir)
+    write_portfolio(portfolio, new_dir)
+
+    # Rewrite without the manifest hook, leaving the new run's manifest stale
+    new = pd.concat([portfolio, portfolio.tail(20).assign(yyyymm=202102.0)], ignore_index=True)
+    new.loc[(new["yyyymm"] == 202012.0) & (new["portfolio"] == 7), "daily_return"] += 1e-3
+    new.to_parquet(new_dir / "portfolio_return.parquet")
+
+    result = diff_output(old_dir, new_dir, "portfolio")
+    assert result["summary"]["partitions_skipped"] == 0
+    assert result["summary"]["rows_added"] == 20 and result["summary"]["rows_changed"] == 1
+    changed = result["changes"][result["changes"]["column"] == "daily_return"]
+    assert list(changed[["yyyymm", "portfolio"]].itertuples(index=False, name=None)) == [(202012.0, 7)]
+    assert set(result["blocks"]["status"]) == {"changed"}
@@ -0,0 +1,65 @@
+"""
+Test suite for the scenario engine:
+1. `test_shocked_rd_matches_repricing`: Shocked RD equals `calc_RD` rerun on shocked curve inputs and spreads.
+2. `test_chunking_and_sensitivities`: Results do not depend on the chunk size, and CS01/DV01 match bump-and-reprice.
+"""
+
+import numpy as np
+import pandas as pd
+
+from calc_cds_daily_return import DiscountCurve, calc_RD, calc_risk_free_term
+from scenarios import *
+
+
+def _inputs():
+    rng = np.random.default_rng(0)
+    dates = pd.bdate_range("2022-01-03", periods=20)
+    knots = [0.25, 0.5, 1, 2, 3, 4, 5]
+    rates = 0.02 + 0.003 * np.arange(len(knots)) + rng.normal(0, 1e-4, size=(len(dates), len(knots)))
+    rf_data = pd.DataFrame(rates, index=pd.DatetimeIndex(dates, name="Date"), columns=knots)
+    panel = pd.DataFrame([(t, d) for t in ["A", "B", "C"] for d in dates], columns=["ticker", "trade_date"])
+    panel["spread"] = rng.uniform(0.002, 0.05, len(panel))
+    return rf_data, panel
+
+
+def _repriced_rd(rf_data, panel, parallel_bp=0, twist_bp=0, spread_bp=0):
+    knots = rf_data.columns.to_numpy(dtype=float)
+    slope = (knots - (knots[0] + knots[-1]) / 2) / (knots[-1] - knots[0])
+    shocked_rates = rf_data + (parallel_bp + twist_bp * slope) * 1e-4
+    shocked_panel = panel.assign(spread=panel["spread"] + spread_bp * 1e-4)
+    return calc_RD(shocked_panel, calc_risk_free_term(shocked_rates))["RD"].to_numpy()
+
+
+def test_shocked_rd_matches_repricing():
+    rf_data, panel = _inputs()
+    engine = ScenarioEngine(panel, DiscountCurve.from_rf_data(rf_data))
+    scenarios = make_scenarios(parallel_bp=(-50, 0, 100), twist_bp=(0, 30), spread_bp=(0, 25))
+    assert len(scenarios) == 12
+
+    rd = engine.shocked_rd(scenarios)
+    assert rd.shape == (len(panel), 12)
+    for k, (name, scenario) in enumerate(scenarios.iterrows()):
+        np.testing.assert_allclose(rd[:, k], _repriced_rd(rf_data, panel, **scenario), rtol=1e-12, err_msg=name)
+
+
+def test_chunking_and_sensitivities():
+    rf_data, panel = _inputs()
+    engine = ScenarioEngine(panel, DiscountCurve.from_rf_data(rf_data))
+    scenarios = make_scenarios(parallel_bp=(-25, 25), twist_bp=(-10, 10), spread_bp=(-5, 0, 5))
+    np.testing.assert_allclose(engine.shocked_rd(scenarios, chunk_bytes=1), engine.shocked_rd(scenarios))
+
+    coupon = 0.01
+    sensitivities = engine.sensitivities(coupon=coupon)
+    base = _repriced_rd(rf_data, panel)
+    spread = sensitivities["spread"].to_numpy()
+    cs01 = (coupon - spread - 1e-4) * _repriced_rd(rf_data, panel, spread_bp=1) - (coupon - spread) * base
+    dv01 = (coupon - spread) * (_repriced_rd(rf_data, panel, parallel_bp=1) - base)
+    np.testing.assert_allclose(sensitivities["RD"], base, rtol=1e-12)
+    np.testing.assert_allclose(sensitivities["CS01"], cs01, rtol=1e-9)
+    np.testing.assert_allclose(sensitivities["DV01"], dv01, rtol=1e-6)
+    assert (sensitivities["CS01"] < 0).all()
+
+    pnl = engine.scenario_pnl(scenarios, coupon=coupon)
+    assert pnl.shape == (len(panel), len(scenarios))
+    widening = scenarios.index.get_loc("parallel+25_twist+10_spread+5")
+    assert (pnl[:, widening] < 0).all()
@@ -0,0 +1,129 @@
+"""
+Test suite for the streaming statistics engine used by the sector summary table:
+1. `test_quantile_sketch_error_bound`: Sketched quartiles stay within the stated relative error of exact quartiles.
+2. `test_merge_matches_single_pass`: Merging per-partition accumulators matches one accumulator over all data.
+3. `test_sector_monthly_statistics`: The streamed, cached sector table matches `groupby(...).describe()`.
+4. `test_cache_reuses_unchanged_years`: Rewriting the file with new data in one year recomputes only that year's partial.
+"""
+
+import numpy as np
+import pandas as pd
+
+import streaming_stats
+from calc_cds_daily_return import write_cds_return
+from streaming_stats import *
+
+
+def test_quantile_sketch_error_bound():
+    """
+    Every interpolated quantile must be within alpha * max(|x_k|, |x_k+1|) of the exact one.
+    """
+    rng = np.random.default_rng(0)
+    values = rng.standard_t(3, size=20_000) * 0.01
+    summary = StreamingSummary(relative_accuracy=1e-4).update(values)
+
+    ordered = np.sort(values)
+    for q in [0.25, 0.5, 0.75]:
+        exact = np.quantile(values, q)
+        lower = int(np.floor(q * (len(values) - 1)))
+        bound = 1e-4 * max(abs(ordered[lower]), abs(ordered[lower + 1]))
+        assert abs(summary.quantile(q) - exact) <= bound + 1e-15
+
+
+def test_merge_matches_single_pass():
+    """
+    Accumulators built on disjoint chunks and merged equal a single-pass accumulator.
+    """
+    rng = np.random.default_rng(1)
+    values = rng.normal(0.001, 0.02, size=5_000)
+
+    single = StreamingSummary().update(values)
+    merged = StreamingSummary()
+    for chunk in np.array_split(values, 7):
+        merged.merge(StreamingSummary().update(chunk))
+
+    pd.testing.assert_series_equal(single.describe(), merged.describe())
+    assert merged.n == len(values)
+    np.testing.assert_allclose(merged.describe()["std"], values.std(ddof=1))
+
+
+def test_sector_monthly_statistics(tmp_path):
+    """
+    The streamed sector table must match the exact pandas computation within the sketch bound.
+    """
+    rng = np.random.default_rng(2)
+    dates = pd.bdate_range("2001-01-01", "2002-12-31")
+    tickers = [f"T{i}" for i in range(30)]
+    daily = pd.DataFrame(
+        {
+            "ticker": np.repeat(tickers, len(dates)),
+            "trade_date": np.tile(dates, len(tickers)),
+            "daily_return": rng.normal(0, 0.002, size=len(dates) * len(tickers)),
+        }
+    )
+    path = tmp_path / "CDS_daily_return.parquet"
+    daily.to_parquet(path)
+    sector_df = pd.DataFrame({"ticker": tickers, "sector": ["Energy", "Utilities", "Technology"] * 10})
+
+    daily["yyyymm"] = daily["trade_date"].dt.year * 100.0 + daily["trade_date"].dt.month
+    monthly = daily.groupby(["ticker", "yyyymm"])["daily_return"].apply(lambda x: (x + 1).prod() - 1).reset_index()
+    monthly = monthly.merge(sector_df, on="ticker", how="left")
+    expected = monthly.groupby("sector")["daily_return"].describe()
+
+    for _ in range(2):  # second run is served from the per-year cache
+        output, sector_month = sector_monthly_statistics(
+            sector_df, path=path, cache_dir=tmp_path / "cache", start_year=2001, end_year=2002
+        )
+        pd.testing.assert_frame_equal(
+            output[["count", "mean", "std", "min", "max"]], expected[["count", "mean", "std", "min", "max"]]
+        )
+        np.testing.assert_allclose(output[["25%", "50%", "75%"]], expected[["25%", "50%", "75%"]], rtol=2e-4)
+
+    assert len(list((tmp_path / "cache").glob("*.pkl"))) == 2
+    assert len(sector_month) == 3 * 24
+
+
+def test_cache_reuses_unchanged_years(tmp_path, monkeypatch):
+    """
+    Per-year partials are keyed on the content of their year, with or without a manifest.
+    """
+    rng = np.random.default_rng(3)
+    dates = pd.bdate_range("2001-01-01", "2003-12-31")
+    tickers = ["A", "B", "C", "D"]
+    daily = pd.DataFrame(
+        {
+            "ticker": np.repeat(tickers, len(dates)),
+            "trade_date": np.tile(dates, len(tickers)),
+            "daily_return": rng.normal(0, 0.002, size=len(dates) * len(tickers)),
+        }
+    )
+    sector_df = pd.DataFrame({"ticker": tickers, "sector": ["Energy", "Energy", "Utilities", "Utilities"]})
+    path = tmp_path / "CDS_daily_return.parquet"
+
+    computed = []
+    partial = streaming_stats.calc_sector_monthly_partial
+    monkeypatch.setattr(
+        streaming_stats,
+        "calc_sector_monthly_partial",
+        lambda df, *args: computed.append(df["trade_date"].dt.year.iloc[0]) or partial(df, *args),
+    )
+
+    def run():
+        computed.clear()
+        result = sector_monthly_statistics(sector_df, path=path, cache_dir=tmp_path / "cache", start_year=2001, end_year=2003)
+        return sorted(computed), result
+
+    write_cds_return(daily, tmp_path)
+    assert run()[0] == [2001, 2002, 2003]
+    # A window update rewrites the whole file but only changes 2002
+    daily.loc[daily["trade_date"].dt.year == 2002, "daily_return"] += 1e-4
+    write_cds_return(daily, tmp_path)
+    years, (output, _) = run()
+    assert years == [2002]
+
+    # Without a manifest each year is hashed from its rows
+    daily.loc[daily["trade_date"].dt.year == 2003, "daily_return"] += 1e-4
+    daily.to_parquet(path)
+    years, (uncached, _) = run()
+    assert years == [2003]
+    assert output.loc["Energy", "count"] == uncached.loc["Energy", "count"] == 2 * 36